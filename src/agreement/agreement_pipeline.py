@@ -0,0 +1,329 @@
+"""
+agreement_pipeline
+
+    The agreement stages of a story, declared as a pipeline. Each stage consumes the outputs of the stages
+    it depends on (typically the consensual graphs of the previous stage, in which both annotators agreed
+    on the previous subtask), and produces its scores, its micro counts and its own outputs.
+
+    The outputs of each stage are memoized per story pair, so a stage is computed at most once, and only
+    if a selected stage depends on it. With a ResultCache, the results and the outputs (intermediate consensual
+    graphs) of each stage are also stored on disk, so a later run - possibly with other stages selected - resumes
+    from the cached intermediates instead of recomputing the whole chain.
+
+    The wall time, peak memory delta and element counts of each computed stage are recorded (and cached) as well,
+    for the agreement reports.
+"""
+import sys
+import time
+import resource
+sys.path.append('../common')
+
+import numpy as np
+
+from collections import namedtuple
+
+from okr import *
+from profiling import section
+from pos_tags import load_or_tag
+from constants import SUBTASK_METRICS
+from result_cache import hash_strings
+from aggregation import coref_counts_by_metric
+from entity_coref import compute_entity_coref_agreement
+from entity_mention import compute_entity_mention_agreement
+from argument_coref import compute_argument_coref_agreement
+from predicate_coref import compute_predicate_coref_agreement
+from entailment_graph import compute_entailment_graph_agreement
+from argument_mention import compute_argument_mention_agreement
+from predicate_mention import compute_predicate_mention_agreement, compute_predicate_mention_agreement_verbal, \
+    compute_predicate_mention_agreement_non_verbal
+
+# The pseudo stage whose outputs are the annotators' graphs
+LOAD_STAGE = 'load'
+
+# A stage: its name, the names of the stages whose outputs it receives (in order), and the function that
+# computes it. The function receives the outputs of the input stages, and returns the results (a dictionary
+# of metric name to score, and a dictionary of metric name to micro counts) and the outputs (a dictionary)
+Stage = namedtuple('Stage', ['name', 'inputs', 'compute'])
+
+
+def entity_mention_stage(inputs):
+    """
+    Compute agreement for entity mentions and update the graphs to contain only annotations
+    in which both annotators agreed on the entity mentions
+    """
+    score, consensual_graph1, consensual_graph2, counts = compute_entity_mention_agreement(*inputs['graphs'])
+    return ({'Entity mentions': score}, {'Entity mentions': counts}), \
+           {'graphs': (consensual_graph1, consensual_graph2)}
+
+
+def entity_coref_stage(inputs):
+    """
+    Compute agreement for entity coreference and update the graphs to contain only annotations
+    in which both annotators agreed on the entity clusters
+    """
+    results = compute_entity_coref_agreement(*inputs['graphs'])
+    return coref_results('Entity coreference', results[:4], results[6]), {'graphs': results[4:6]}
+
+
+def predicate_mention_stage(inputs):
+    """
+    Compute agreement for predicate mentions and update the graphs to contain only annotations
+    in which both annotators agreed on the predicate mentions
+    """
+    score, consensual_graph1, consensual_graph2, counts = compute_predicate_mention_agreement(*inputs['graphs'])
+    return ({'Predicate mentions': score}, {'Predicate mentions': counts}), \
+           {'graphs': (consensual_graph1, consensual_graph2)}
+
+
+def predicate_mention_verbal_stage(inputs):
+    """
+    Compute agreement for verbal predicate mentions (for analysis purposes)
+    """
+    score, counts = compute_predicate_mention_agreement_verbal(*inputs['graphs'])
+    return ({'Predicate mentions verbal': score}, {'Predicate mentions verbal': counts}), {}
+
+
+def predicate_mention_non_verbal_stage(inputs):
+    """
+    Compute agreement for non-verbal predicate mentions (for analysis purposes)
+    """
+    score, counts = compute_predicate_mention_agreement_non_verbal(*inputs['graphs'])
+    return ({'Predicate mentions non-verbal': score}, {'Predicate mentions non-verbal': counts}), {}
+
+
+def predicate_coref_stage(inputs):
+    """
+    Compute agreement for predicate coreference and update the graphs to contain only annotations
+    in which both annotators agreed on the predicate clusters
+    """
+    results = compute_predicate_coref_agreement(*inputs['graphs'])
+    return coref_results('Predicate coreference', results[:4], results[7]), \
+           {'graphs': results[4:6], 'alignment': results[6]}
+
+
+def argument_mention_stage(inputs):
+    """
+    Compute agreement for argument mention within predicate chains and update the graphs to contain
+    only annotations in which both annotators agreed on the argument mentions
+    """
+    score, consensual_graph1, consensual_graph2, counts = compute_argument_mention_agreement(*inputs['graphs'])
+    return ({'Argument mentions': score}, {'Argument mentions': counts}), \
+           {'graphs': (consensual_graph1, consensual_graph2)}
+
+
+def argument_coref_stage(inputs, predicate_coref_outputs):
+    """
+    Compute coreference scores for the alignment between arguments of the same propositions
+    """
+    graph1, graph2 = inputs['graphs']
+    results = compute_argument_coref_agreement(graph1, graph2, predicate_coref_outputs['alignment'])
+    return coref_results('Argument coreference', results[:4], results[6]), {'graphs': results[4:6]}
+
+
+def entailment_graph_stage(inputs):
+    """
+    Compute agreement for the entailment graph and update the graphs to contain only annotations
+    in which both annotators agreed on the edges (propositions, arguments and entities)
+    """
+    entities_f1, arguments_kappa, propositions_f1, consensual_graph1, consensual_graph2, counts = \
+        compute_entailment_graph_agreement(*inputs['graphs'])
+    return ({'Entailment graph entities F1': entities_f1, 'Entailment graph propositions F1': propositions_f1},
+            {'Entailment graph entities F1': counts[0], 'Entailment graph propositions F1': counts[1]}), \
+           {'graphs': (consensual_graph1, consensual_graph2)}
+
+
+def coref_results(subtask, scores, counts):
+    """
+    Returns the results of a coreference stage
+    :param subtask: the subtask name, e.g. 'Entity coreference'
+    :param scores: the MUC, B-CUBED, CEAF and MELA scores
+    :param counts: the micro counts of MUC, B-CUBED and CEAF
+    :return: a dictionary of metric name to score, and a dictionary of metric name to micro counts
+    """
+    return {subtask + ' ' + metric: score for metric, score in zip(['MUC', 'B^3', 'CEAF_C', 'MELA'], scores)}, \
+           coref_counts_by_metric(subtask, counts)
+
+
+# The agreement stages, in the order of the task
+STAGES = [Stage('entity_mentions', [LOAD_STAGE], entity_mention_stage),
+          Stage('entity_coref', ['entity_mentions'], entity_coref_stage),
+          Stage('predicate_mentions', ['entity_coref'], predicate_mention_stage),
+          Stage('predicate_mentions_verbal', ['entity_coref'], predicate_mention_verbal_stage),
+          Stage('predicate_mentions_non_verbal', ['entity_coref'], predicate_mention_non_verbal_stage),
+          Stage('predicate_coref', ['predicate_mentions'], predicate_coref_stage),
+          Stage('argument_mentions', ['predicate_coref'], argument_mention_stage),
+          Stage('argument_coref', ['argument_mentions', 'predicate_coref'], argument_coref_stage),
+          Stage('entailment_graph', ['argument_coref'], entailment_graph_stage)]
+
+STAGE_NAMES = [stage.name for stage in STAGES]
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+
+
+def parse_stages(stages):
+    """
+    Parse the stage selection
+    :param stages: comma separated stage names, or 'all'
+    :return: the names of the selected stages, in the order of the task
+    """
+    if stages == 'all':
+        return STAGE_NAMES
+
+    selected = set([stage.strip() for stage in stages.split(',')])
+    unknown = selected.difference(STAGE_NAMES)
+    if len(unknown) > 0:
+        raise ValueError('Unknown stages: %s. The stages are: %s' % (', '.join(sorted(unknown)),
+                                                                     ', '.join(STAGE_NAMES)))
+
+    return [name for name in STAGE_NAMES if name in selected]
+
+
+class AgreementPipeline:
+    """
+    The agreement stages of a story pair, with the outputs of each stage memoized
+    """
+
+    def __init__(self, annotator1_file=None, annotator2_file=None, graphs=None, cache=None, pos_tags_dir=None):
+        """
+        :param annotator1_file: the path of the first annotator's graph
+        :param annotator2_file: the path of the second annotator's graph
+        :param graphs: the annotators' graphs, if they were already loaded
+        :param cache: a ResultCache for the results and outputs of the stages (requires the files)
+        :param pos_tags_dir: the directory of the persisted POS tags of the loaded graphs (default: not persisted)
+        """
+        self.files = (annotator1_file, annotator2_file)
+        self.cache = cache
+        self.pos_tags_dir = pos_tags_dir
+        self.cache_key = cache.key(*self.files) if cache is not None else None
+        self.results = {}  # Dictionary of stage name to its results
+        self.outputs = {}  # Dictionary of stage name to its outputs
+        self.stats = {}  # Dictionary of stage name to its statistics (see compute)
+        self.computed = []  # The names of the stages computed (not taken from the cache), in order
+
+        if graphs is not None:
+            self.outputs[LOAD_STAGE] = {'graphs': graphs}
+
+    def run(self, stage_names=None):
+        """
+        Computes the selected stages (and the stages they depend on, unless their outputs are cached)
+        :param stage_names: the names of the selected stages (default: all the stages)
+        :return: the scores, in the order of SUBTASK_METRICS (NaN for metrics of stages that were not selected),
+        and a dictionary of metric name to its micro counts
+        """
+        scores, counts = {}, {}
+
+        for name in stage_names or STAGE_NAMES:
+            stage_scores, stage_counts = self.get_results(name)
+            scores.update(stage_scores)
+            counts.update(stage_counts)
+
+        return [scores.get(name, np.nan) for name in SUBTASK_METRICS], counts
+
+    def get_results(self, name):
+        """
+        Returns the results of a stage, from memory, from the cache or by computing it
+        :param name: the stage name
+        :return: a dictionary of metric name to score, and a dictionary of metric name to micro counts
+        """
+        if name not in self.results:
+            self.results[name] = self.from_cache(name, 'results')
+
+            if self.results[name] is None:
+                self.compute(name)
+
+        return self.results[name]
+
+    def get_outputs(self, name):
+        """
+        Returns the outputs of a stage, from memory, from the cache or by computing it
+        :param name: the stage name
+        :return: the stage outputs
+        """
+        if name not in self.outputs:
+            if name == LOAD_STAGE:
+                self.outputs[name] = {'graphs': tuple([load_graph_from_file(graph_file) for graph_file in self.files])}
+
+                if self.pos_tags_dir is not None:
+                    for graph in self.outputs[name]['graphs']:
+                        load_or_tag(graph, self.pos_tags_dir)
+            else:
+                self.outputs[name] = self.from_cache(name, 'outputs')
+
+                if self.outputs[name] is None:
+                    self.compute(name)
+
+        return self.outputs[name]
+
+    def get_stats(self, name):
+        """
+        Returns the statistics of a stage, from memory or from the cache (the stage is not computed)
+        :param name: the stage name
+        :return: the statistics (see compute), or None if the stage was not computed
+        """
+        if name not in self.stats:
+            self.stats[name] = self.from_cache(name, 'stats')
+
+        return self.stats[name]
+
+    def compute(self, name):
+        """
+        Computes a stage from the outputs of its input stages, and memoizes (and caches) its results, outputs and
+        statistics: the wall time, the increase of the peak memory (in KB) and the number of elements in the input
+        and output graphs (of both annotators)
+        :param name: the stage name
+        """
+        stage = STAGES_BY_NAME[name]
+        inputs = [self.get_outputs(input_name) for input_name in stage.inputs]
+
+        start_time, start_memory = time.time(), peak_memory()
+        with section('agreement ' + name):
+            results, outputs = stage.compute(*inputs)
+        stats = {'wall_time': time.time() - start_time, 'peak_memory_delta': peak_memory() - start_memory,
+                 'input_elements': count_elements(inputs[0]['graphs']),
+                 'output_elements': count_elements(outputs['graphs']) if 'graphs' in outputs else {}}
+
+        self.results[name], self.outputs[name], self.stats[name] = results, outputs, stats
+        self.computed.append(name)
+
+        if self.cache is not None:
+            self.cache.put(self.stage_key(name, 'results'), results)
+            self.cache.put(self.stage_key(name, 'outputs'), outputs)
+            self.cache.put(self.stage_key(name, 'stats'), stats)
+
+    def from_cache(self, name, kind):
+        """
+        Returns the cached results or outputs of a stage, or None if they are not cached
+        :param name: the stage name
+        :param kind: 'results', 'outputs' or 'stats'
+        """
+        return self.cache.get(self.stage_key(name, kind)) if self.cache is not None else None
+
+    def stage_key(self, name, kind):
+        """
+        Returns the cache key of the results or outputs of a stage
+        :param name: the stage name
+        :param kind: 'results', 'outputs' or 'stats'
+        """
+        return hash_strings([self.cache_key, name, kind])
+
+
+def count_elements(graphs):
+    """
+    Count the elements of the graphs
+    :param graphs: the OKR graphs
+    :return: dictionary of element type to its number in all the graphs
+    """
+    prop_mentions = [mention for graph in graphs for prop in graph.propositions.values()
+                     for mention in prop.mentions.values()]
+
+    return {'entities': sum([len(graph.entities) for graph in graphs]),
+            'entity_mentions': sum([len(entity.mentions) for graph in graphs for entity in graph.entities.values()]),
+            'propositions': sum([len(graph.propositions) for graph in graphs]),
+            'predicate_mentions': len(prop_mentions),
+            'argument_mentions': sum([len(mention.argument_mentions) for mention in prop_mentions])}
+
+
+def peak_memory():
+    """
+    Returns the peak memory (resident set size) of the process so far, in KB
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,122 @@
+"""
+agreement_report
+
+    Machine-readable agreement reports: the scores of each stage of each story, with the stage's wall time,
+    peak memory delta and element counts (see agreement_pipeline), written as JSON or CSV.
+"""
+import sys
+sys.path.append('../common')
+
+import csv
+import json
+import numpy as np
+
+from constants import SUBTASK_METRICS
+
+# The element types counted in the stage graphs (see agreement_pipeline.count_elements)
+ELEMENT_TYPES = ['entities', 'entity_mentions', 'propositions', 'predicate_mentions', 'argument_mentions']
+
+
+def story_report(annotator1_file, annotator2_file, pipeline, stage_names):
+    """
+    Returns the report of a story
+    :param annotator1_file: the first annotator's file
+    :param annotator2_file: the second annotator's file
+    :param pipeline: the AgreementPipeline of the story, after computing the stages
+    :param stage_names: the names of the stages to report
+    :return: a dictionary with the story files and the report of each stage
+    """
+    return {'annotator1_file': annotator1_file, 'annotator2_file': annotator2_file,
+            'stages': [stage_report(pipeline, name) for name in stage_names]}
+
+
+def stage_report(pipeline, name):
+    """
+    Returns the report of a stage
+    :param pipeline: the AgreementPipeline of the story, after computing the stage
+    :param name: the stage name
+    :return: a dictionary with the stage's scores and statistics, and whether it was taken from the cache
+    """
+    scores, _ = pipeline.get_results(name)
+    stats = pipeline.get_stats(name) or {}
+
+    return {'stage': name, 'cached': name not in pipeline.computed,
+            'scores': {metric: json_value(score) for metric, score in scores.iteritems()},
+            'wall_time': stats.get('wall_time'), 'peak_memory_delta': stats.get('peak_memory_delta'),
+            'input_elements': stats.get('input_elements', {}), 'output_elements': stats.get('output_elements', {})}
+
+
+def write_report(report_file, story_reports, aggregator):
+    """
+    Write the report, as JSON (with the macro and micro averages) or as CSV (a row for each stage of each story),
+    according to the file extension
+    :param report_file: the report file (.json or .csv)
+    :param story_reports: the reports of the stories (see story_report)
+    :param aggregator: the ScoreAggregator of all the stories
+    """
+    if report_file.endswith('.csv'):
+        write_csv_report(report_file, story_reports)
+    else:
+        write_json_report(report_file, story_reports, aggregator)
+
+
+def write_json_report(report_file, story_reports, aggregator):
+    """
+    Write the report as JSON
+    :param report_file: the report file
+    :param story_reports: the reports of the stories (see story_report)
+    :param aggregator: the ScoreAggregator of all the stories
+    """
+    report = {'stories': story_reports,
+              'macro_average': metric_dict(aggregator.macro_average()),
+              'micro_average': metric_dict(aggregator.micro_average())}
+
+    with open(report_file, 'w') as f_out:
+        json.dump(report, f_out, indent=2, sort_keys=True)
+
+
+def write_csv_report(report_file, story_reports):
+    """
+    Write the report as CSV, with a row for each stage of each story. The columns of the metrics that the stage
+    doesn't compute are empty.
+    :param report_file: the report file
+    :param story_reports: the reports of the stories (see story_report)
+    """
+    element_columns = [prefix + element_type for prefix in ['input_', 'output_'] for element_type in ELEMENT_TYPES]
+
+    with open(report_file, 'wb') as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(['annotator1_file', 'annotator2_file', 'stage', 'cached', 'wall_time', 'peak_memory_delta'] +
+                        element_columns + SUBTASK_METRICS)
+
+        for story in story_reports:
+            for stage in story['stages']:
+                elements = {prefix + element_type: count for prefix in ['input_', 'output_']
+                            for element_type, count in stage[prefix + 'elements'].iteritems()}
+                writer.writerow([story['annotator1_file'], story['annotator2_file'], stage['stage'],
+                                 int(stage['cached']), csv_value(stage['wall_time']),
+                                 csv_value(stage['peak_memory_delta'])] +
+                                [csv_value(elements.get(column)) for column in element_columns] +
+                                [csv_value(stage['scores'].get(metric)) for metric in SUBTASK_METRICS])
+
+
+def metric_dict(scores):
+    """
+    Returns a dictionary of metric name to score, without the metrics of stages that were not computed
+    :param scores: the scores, in the order of SUBTASK_METRICS
+    """
+    return {metric: float(score) for metric, score in zip(SUBTASK_METRICS, scores) if not np.isnan(score)}
+
+
+def json_value(score):
+    """
+    Returns the score as a JSON value (NaN is not valid JSON, so it is written as null)
+    """
+    return None if np.isnan(score) else float(score)
+
+
+def csv_value(value):
+    """
+    Returns the value as a CSV field (an empty field for missing values)
+    """
+    return '' if value is None else value
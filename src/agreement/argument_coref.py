@@ -25,31 +25,13 @@ def compute_argument_coref_agreement(graph1, graph2, optimal_pred_alignment):
     computed by previous stages.
     :return: MUC, B-CUBED, CEAF and MELA scores. Each score is computed twice, each time
     a different annotator is considered as the gold, and the averaged score is returned.
+    In addition, it returns the micro counts of MUC, B-CUBED and CEAF for both directions, summed over
+    the propositions (see coref_scores).
     """
 
-    # Get argument mentions
-    graph1_arg_mentions_dicts = { p_id : [{ arg_id : str(arg) for arg_id, arg in mention.argument_mentions.iteritems() }
-                                            for mention in p.mentions.values()]
-                                  for p_id, p in graph1.propositions.iteritems() }
-
-    graph2_arg_mentions_dicts = { p_id : [{ arg_id : str(arg) for arg_id, arg in mention.argument_mentions.iteritems() }
-                                            for mention in p.mentions.values()]
-                                  for p_id, p in graph2.propositions.iteritems() }
-
     # Clusters of arguments per proposition
-    graph1_arg_mentions = { p_id : [set([mention_dict[str(arg_num)]
-                                         for mention_dict in mention_lst if str(arg_num) in mention_dict])
-                                    for arg_num in range(0, 10)]
-                            for p_id, mention_lst in graph1_arg_mentions_dicts.iteritems()}
-
-    graph2_arg_mentions = { p_id : [set([mention_dict[str(arg_num)]
-                                         for mention_dict in mention_lst if str(arg_num) in mention_dict])
-                                    for arg_num in range(0, 10)]
-                            for p_id, mention_lst in graph2_arg_mentions_dicts.iteritems()}
-
-    # Remove empty arguments
-    graph1_arg_mentions = {k: [s for s in v if len(s) > 0] for k, v in graph1_arg_mentions.iteritems()}
-    graph2_arg_mentions = {k: [s for s in v if len(s) > 0] for k, v in graph2_arg_mentions.iteritems()}
+    graph1_arg_mentions = get_argument_clusters(graph1)
+    graph2_arg_mentions = get_argument_clusters(graph2)
 
     # within each proposition, compute coreference scores:
     # Compute twice, each time considering a different annotator as the gold, and return the average among each measure
@@ -57,6 +39,7 @@ def compute_argument_coref_agreement(graph1, graph2, optimal_pred_alignment):
     bcubed_scores = []
     ceaf_scores = []
     mela_scores = []
+    counts = np.zeros((3, 2, 4))
 
     for prop1, prop2 in optimal_pred_alignment.iteritems():
 
@@ -70,16 +53,14 @@ def compute_argument_coref_agreement(graph1, graph2, optimal_pred_alignment):
         if len(graph1_arg_mentions[prop1]) == 0 or len(graph2_arg_mentions[prop2]) == 0:
             continue
 
-        muc1, bcubed1, ceaf1 = muc(graph1_arg_mentions[prop1], graph2_arg_mentions[prop2]), \
-                               bcubed(graph1_arg_mentions[prop1], graph2_arg_mentions[prop2]), \
-                               ceaf(graph1_arg_mentions[prop1], graph2_arg_mentions[prop2])
+        muc1, bcubed1, ceaf1, counts1 = coref_scores(graph1_arg_mentions[prop1], graph2_arg_mentions[prop2])
         mela1 = np.mean([muc1, bcubed1, ceaf1])
 
-        muc2, bcubed2, ceaf2 = muc(graph2_arg_mentions[prop2], graph1_arg_mentions[prop1]), \
-                               bcubed(graph2_arg_mentions[prop2], graph1_arg_mentions[prop1]), \
-                               ceaf(graph2_arg_mentions[prop2], graph1_arg_mentions[prop1])
+        muc2, bcubed2, ceaf2, counts2 = coref_scores(graph2_arg_mentions[prop2], graph1_arg_mentions[prop1])
         mela2 = np.mean([muc2, bcubed2, ceaf2])
 
+        counts += np.stack([counts1, counts2], axis=1)
+
         muc_scores.append(np.mean([muc1, muc2]))
         bcubed_scores.append(np.mean([bcubed1, bcubed2]))
         ceaf_scores.append(np.mean([ceaf1, ceaf2]))
@@ -94,4 +75,44 @@ def compute_argument_coref_agreement(graph1, graph2, optimal_pred_alignment):
     consensual_graph1 = graph1
     consensual_graph2 = graph2
 
-    return muc_score, bcubed_score, ceaf_score, mela_score, consensual_graph1, consensual_graph2
+    return muc_score, bcubed_score, ceaf_score, mela_score, consensual_graph1, consensual_graph2, counts
+
+
+def get_argument_slot_index(graph):
+    """
+    Index the argument mentions of each proposition by their argument slot (e.g. '0' for the first argument)
+    :param graph: the OKR graph
+    :return: a dictionary of proposition ID to a dictionary of argument slot to the set of argument mentions
+    (in their str format) that fill this slot in the proposition's mentions
+    """
+    slot_index = {}
+
+    for p_id, prop in graph.propositions.iteritems():
+        prop_slots = slot_index[p_id] = {}
+
+        for mention in prop.mentions.values():
+            for arg_id, arg in mention.argument_mentions.iteritems():
+                prop_slots.setdefault(arg_id, set()).add(str(arg))
+
+    return slot_index
+
+
+def get_argument_clusters(graph):
+    """
+    Returns the argument clusters of each proposition: the argument mentions that fill the same slot
+    are coreferring
+    :param graph: the OKR graph
+    :return: a dictionary of proposition ID to a list of argument clusters (sets of argument mentions),
+    ordered by the argument slot
+    """
+    return { p_id : [prop_slots[slot] for slot in sorted(prop_slots.keys(), key=slot_order)]
+             for p_id, prop_slots in get_argument_slot_index(graph).iteritems() }
+
+
+def slot_order(slot):
+    """
+    The sort key of an argument slot: numeric slots are sorted by their number, before any other slot
+    :param slot: the argument slot
+    :return: the sort key
+    """
+    return (0, int(slot), slot) if slot.isdigit() else (1, 0, slot)
@@ -16,15 +16,17 @@ def compute_argument_mention_agreement(graph1, graph2):
     Compute argument mention agreement on two graphs
     :param graph1: the first annotator's graph
     :param graph2: the second annotator's graph
-    :return argument mention accuracy and the consensual graphs
+    :return argument mention accuracy, the consensual graphs and the micro counts
+    (consensual mentions and mentions in each graph)
     """
 
     # Get the consensual mentions and the mentions in each graph
     consensual_mentions, graph1_arg_mentions, graph2_arg_mentions = extract_consensual_mentions(graph1, graph2)
+    counts = mention_counts(consensual_mentions, graph1_arg_mentions, graph2_arg_mentions)
 
     # Compute the accuracy, each time taking one annotator as the gold
     if len(graph1_arg_mentions) == 0 and len(graph2_arg_mentions) == 0:
-        return 1.0
+        return 1.0, graph1, graph2, counts
 
     accuracy1 = len(consensual_mentions) * 1.0 / len(graph1_arg_mentions) if len(graph1_arg_mentions) else 0.0
     accuracy2 = len(consensual_mentions) * 1.0 / len(graph2_arg_mentions) if len(graph2_arg_mentions) else 0.0
@@ -34,7 +36,7 @@ def compute_argument_mention_agreement(graph1, graph2):
     consensual_graph1 = filter_mentions(graph1, consensual_mentions)
     consensual_graph2 = filter_mentions(graph2, consensual_mentions)
 
-    return arg_mention_acc, consensual_graph1, consensual_graph2
+    return arg_mention_acc, consensual_graph1, consensual_graph2, counts
 
 
 def filter_mentions(graph, consensual_mentions):
@@ -81,11 +83,8 @@ def extract_consensual_mentions(graph1, graph2):
     graph2_arg_mentions = set([a for a in graph2_arg_mentions if a.split('[')[0] in common_sentences])
 
     # Exclude ignored_words, for versions 5 and up:
-    if not graph2.ignored_indices == None:
-        graph1_arg_mentions = set([a for a in graph1_arg_mentions if len(overlap_set(a, graph2.ignored_indices)) == 0])
-
-    if not graph1.ignored_indices == None:
-        graph2_arg_mentions = set([a for a in graph2_arg_mentions if len(overlap_set(a, graph1.ignored_indices)) == 0])
+    graph1_arg_mentions = filter_ignored(graph1_arg_mentions, graph2)
+    graph2_arg_mentions = filter_ignored(graph2_arg_mentions, graph1)
 
     consensual_mentions = graph1_arg_mentions.intersection(graph2_arg_mentions)
 
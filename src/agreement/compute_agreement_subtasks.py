@@ -13,20 +13,26 @@ Author: Vered Shwartz
 """
 import os
 import sys
+import itertools
+import multiprocessing
 sys.path.append('../common')
 
 import numpy as np
 
 from okr import *
 from docopt import docopt
-from entity_coref import compute_entity_coref_agreement
-from entity_mention import compute_entity_mention_agreement
-from argument_coref import compute_argument_coref_agreement
-from predicate_coref import compute_predicate_coref_agreement
-from entailment_graph import compute_entailment_graph_agreement
-from argument_mention import compute_argument_mention_agreement
-from predicate_mention import compute_predicate_mention_agreement, compute_predicate_mention_agreement_verbal, \
-    compute_predicate_mention_agreement_non_verbal
+from pos_tags import load_or_tag
+from profiling import enable_profiling, print_report
+from constants import SUBTASK_METRICS
+from bootstrap import print_confidence_intervals
+from result_cache import ResultCache, code_version
+from aggregation import ScoreAggregator
+from shards import select_stories, story_result, write_partial_results, merge_partial_results
+from agreement_report import story_report, write_report
+from agreement_pipeline import AgreementPipeline, STAGE_NAMES, parse_stages
+
+# The graphs of each annotator, shared with the worker processes in pairwise mode
+pairwise_graphs = None
 
 
 def main():
@@ -50,29 +56,251 @@ def main():
     6) Entailment graph
 
     Usage:
-        compute_agreement_subtasks.py <annotator1_dir> <annotator2_dir>
+        compute_agreement_subtasks.py <annotator1_dir> <annotator2_dir> [--bootstrap=<n>] [--confidence=<c>] [--seed=<s>]
+                                      [--cache=<dir>] [--invalidate_cache] [--stages=<s>] [--pos_tags=<dir>]
+                                      [--report=<file>] [--profile] [--shard=<i/n> | --stories=<file>]
+                                      [--partial=<file>]
+        compute_agreement_subtasks.py --merge <partial_file>... [--bootstrap=<n>] [--confidence=<c>] [--seed=<s>]
+                                      [--report=<file>]
+        compute_agreement_subtasks.py --pairwise <annotator_dir>... [--processes=<n>] [--stages=<s>] [--pos_tags=<dir>]
+                                      [--profile]
 
         <annotator1_dir> = the directory containing the annotations of the first annotator
         <annotator2_dir> = the directory containing the annotations of the second annotator
-    """)
+        <annotator_dir> = the directories containing the annotations of each annotator
+        <partial_file> = the partial results files of the shards (see --partial)
+
+    Options:
+        --bootstrap=<n>   number of bootstrap samples over stories for confidence intervals (0 = none) [default: 0]
+        --confidence=<c>  the confidence level of the intervals [default: 0.95]
+        --seed=<s>        the random seed of the bootstrap samples [default: 0]
+        --cache=<dir>     cache the results and the consensual graphs of each stage of each story in this
+                          directory, and recompute only stages whose inputs (or the agreement code) changed
+        --invalidate_cache  remove the cached results before computing the agreement
+        --pairwise        compute the agreement between every pair of annotators
+        --processes=<n>   the number of processes computing the pairwise agreement [default: 1]
+        --stages=<s>      comma separated stages to compute (the stages they depend on are computed or taken
+                          from the cache), the others are reported as nan [default: all]. The stages are:
+                          %s
+        --pos_tags=<dir>  persist the POS tags of the sentences (used by the verbal and non-verbal predicate
+                          mention stages) in this directory, and reuse them in later runs
+        --report=<file>   write the scores, wall time, peak memory delta (KB) and element counts of each stage of
+                          each story to this file, as CSV (for a .csv file) or JSON (with the averages)
+        --profile         print the calls and time of each stage and heavy helper (also enabled by the OKR_PROFILE
+                          environment variable, see profiling)
+        --shard=<i/n>     compute only the i-th of n shards of the stories (0 <= i < n), selected by the hash of
+                          the file name
+        --stories=<file>  compute only the stories whose file names are listed in this file (one per line)
+        --partial=<file>  write the results of each story to this partial results file, to be merged with the
+                          other shards' files by --merge
+        --merge           merge the partial results files of the shards into the results of the full run
+    """ % ', '.join(STAGE_NAMES))
+
+    stage_names = parse_stages(args['--stages'])
+
+    if args['--profile']:
+        enable_profiling()
+
+    if args['--pairwise']:
+        compute_pairwise_agreement(args['<annotator_dir>'], int(args['--processes']), stage_names, args['--pos_tags'])
+        print_report()
+        return
+
+    num_samples = int(args['--bootstrap'])
+    keep_reports = args['--report'] is not None or args['--partial'] is not None
+
+    if args['--merge']:
+        story_results = merged_story_agreements(args['<partial_file>'])
+        num_stories = None
+    else:
+        annotator1_dir = args['<annotator1_dir>']
+        annotator2_dir = args['<annotator2_dir>']
+        annotator1_files = sorted(os.listdir(annotator1_dir))
+        annotator2_files = sorted(os.listdir(annotator2_dir))
+        num_stories = min(len(annotator1_files), len(annotator2_files))
+        stories = select_stories(annotator1_files[:num_stories], args['--shard'], args['--stories'])
+
+        # The cache key depends on the agreement code, so the results are recomputed when the code changes
+        # (the code directories are resolved from this file, not from the working directory)
+        cache = None
+        if args['--cache'] is not None:
+            agreement_dir = os.path.dirname(os.path.abspath(__file__))
+            cache = ResultCache(args['--cache'], code_version([agreement_dir,
+                                                               os.path.join(agreement_dir, '..', 'common')]))
+
+            if args['--invalidate_cache']:
+                cache.invalidate()
+
+        story_results = story_agreements([annotator1_dir + '/' + annotator1_files[story] for story in stories],
+                                         [annotator2_dir + '/' + annotator2_files[story] for story in stories],
+                                         stories, stage_names, cache, args['--pos_tags'], keep_reports)
+
+    # Aggregate the results as each story finishes. The per story results are kept only for the bootstrap,
+    # the report and the partial results.
+    aggregator = ScoreAggregator(SUBTASK_METRICS)
+    kept_results = []
+
+    for result in story_results:
+        aggregator.add(result['scores'], result['counts'])
+
+        if num_samples > 0 or keep_reports:
+            kept_results.append(result)
+
+    if args['--partial'] is not None:
+        write_partial_results(args['--partial'], 'agreement', SUBTASK_METRICS, num_stories, kept_results)
+
+    print '\n\nAverage:\n=========\n'
+    print_scores(aggregator.macro_average())
+
+    print '\n\nMicro average:\n=========\n'
+    print_scores(aggregator.micro_average())
+
+    if num_samples > 0:
+        print_confidence_intervals(SUBTASK_METRICS, aggregator, [result['scores'] for result in kept_results],
+                                   [result['counts'] for result in kept_results], num_samples,
+                                   float(args['--confidence']), int(args['--seed']))
+
+    if args['--report'] is not None:
+        write_report(args['--report'], [result['report'] for result in kept_results], aggregator)
+
+    print_report()
+
+
+def story_agreements(annotator1_files, annotator2_files, stories, stage_names, cache=None, pos_tags_dir=None,
+                     keep_reports=False):
+    """
+    Computes the agreement on each story, and prints its scores
+    :param annotator1_files: the first annotator's file of each story
+    :param annotator2_files: the second annotator's file of each story
+    :param stories: the index of each story in the full run
+    :param stage_names: the names of the stages to compute
+    :param cache: a ResultCache of the stages' results and consensual graphs (default: no cache)
+    :param pos_tags_dir: the directory of the persisted POS tags (default: not persisted)
+    :param keep_reports: whether to return the report of each story
+    :return: a generator of the results of the stories (see shards.story_result), as each story finishes
+    """
+    for annotator1_file, annotator2_file, story in zip(annotator1_files, annotator2_files, stories):
+        print 'Agreement for %s, %s' % (annotator1_file, annotator2_file)
+        pipeline = AgreementPipeline(annotator1_file, annotator2_file, cache=cache, pos_tags_dir=pos_tags_dir)
+        scores, counts = pipeline.run(stage_names)
+
+        if cache is not None and len(pipeline.computed) < len(stage_names):
+            print '(cached: %s)' % ', '.join([name for name in stage_names if name not in pipeline.computed])
+
+        print_scores(scores)
+
+        report = story_report(annotator1_file, annotator2_file, pipeline, stage_names) if keep_reports else None
+        yield story_result(story, [annotator1_file, annotator2_file], scores, counts, report)
+
+
+def merged_story_agreements(partial_files):
+    """
+    Merges the partial results of the shards, and prints the scores of each story
+    :param partial_files: the partial results files of the shards
+    :return: a generator of the results of the stories (see shards.story_result), in the order of the full run
+    """
+    for result in merge_partial_results(partial_files, 'agreement', SUBTASK_METRICS):
+        print 'Agreement for %s, %s' % tuple(result['story'])
+        print_scores(result['scores'])
+        yield result
+
+
+def compute_pairwise_agreement(annotator_dirs, num_processes, stage_names=None, pos_tags_dir=None):
+    """
+    Receives K annotation directories, containing graph annotations of the same stories, and computes the
+    task-level agreement between every pair of annotators. Each graph is loaded once, and the pairs are
+    computed in parallel.
+    :param annotator_dirs: the directories containing the annotations of each annotator
+    :param num_processes: the number of processes
+    :param stage_names: the names of the stages to compute (default: all the stages)
+    :param pos_tags_dir: the directory of the persisted POS tags (default: not persisted)
+    """
+    global pairwise_graphs
 
-    annotator1_dir = args['<annotator1_dir>']
-    annotator2_dir = args['<annotator2_dir>']
+    # Load each graph once, the stories are matched by their order in each directory
+    annotator_files = [sorted(os.listdir(annotator_dir)) for annotator_dir in annotator_dirs]
+    num_stories = min([len(story_files) for story_files in annotator_files])
+    pairwise_graphs = [[load_graph_from_file(annotator_dir + '/' + story_file)
+                        for story_file in story_files[:num_stories]]
+                       for annotator_dir, story_files in zip(annotator_dirs, annotator_files)]
 
-    annotator1_files = sorted(os.listdir(annotator1_dir))
-    annotator2_files = sorted(os.listdir(annotator2_dir))
+    if pos_tags_dir is not None:
+        for graph in itertools.chain(*pairwise_graphs):
+            load_or_tag(graph, pos_tags_dir)
 
-    results = []
-    for annotator1_file, annotator2_file in zip(annotator1_files, annotator2_files):
-        print 'Agreement for %s, %s' % (annotator1_dir + '/' + annotator1_file, annotator2_dir + '/' + annotator2_file)
-        results.append(compute_agreement(annotator1_dir + '/' + annotator1_file, annotator2_dir + '/' + annotator2_file))
+    pairs = list(itertools.combinations(range(len(annotator_dirs)), 2))
+    tasks = [(annotator1, annotator2, story, stage_names) for annotator1, annotator2 in pairs
+             for story in range(num_stories)]
 
-    average = np.mean(results, axis=0)
+    # The worker processes are forked after the graphs are loaded, so they don't need to be sent to them
+    if num_processes > 1:
+        pool = multiprocessing.Pool(num_processes)
+        results = pool.map(compute_pairwise_task, tasks, chunksize=1)
+        pool.close()
+        pool.join()
+    else:
+        results = map(compute_pairwise_task, tasks)
+
+    # Aggregate the results of each pair, and of all the pairs
+    pair_aggregators = {pair: ScoreAggregator(SUBTASK_METRICS) for pair in pairs}
+    for (annotator1, annotator2, _, _), (scores, counts) in zip(tasks, results):
+        pair_aggregators[(annotator1, annotator2)].add(scores, counts)
+
+    aggregator = ScoreAggregator(SUBTASK_METRICS)
+    for pair_aggregator in pair_aggregators.values():
+        aggregator.merge(pair_aggregator)
+
+    # The matrix of each subtask is symmetric, with the macro average agreement of each pair
+    matrices = np.full((len(SUBTASK_METRICS), len(annotator_dirs), len(annotator_dirs)), np.nan)
+    for (annotator1, annotator2), pair_aggregator in pair_aggregators.iteritems():
+        matrices[:, annotator1, annotator2] = matrices[:, annotator2, annotator1] = pair_aggregator.macro_average()
+
+    print 'Annotators:'
+    for index, annotator_dir in enumerate(annotator_dirs):
+        print '%d: %s' % (index + 1, annotator_dir)
+
+    for name, matrix in zip(SUBTASK_METRICS, matrices):
+        print '\n%s:' % name
+        print_agreement_matrix(matrix)
+
+    print '\n\nAverage over all pairs:\n=========\n'
+    print_scores(aggregator.macro_average())
+
+    print '\n\nMicro average over all pairs:\n=========\n'
+    print_scores(aggregator.micro_average())
+
+
+def compute_pairwise_task(task):
+    """
+    Computes the agreement between two annotators on a story (executed by the worker processes)
+    :param task: the indices of the two annotators and of the story in pairwise_graphs, and the names of the stages
+    :return the scores and the micro counts of the story (see compute_graph_agreement)
+    """
+    annotator1, annotator2, story, stage_names = task
+    return compute_graph_agreement(pairwise_graphs[annotator1][story], pairwise_graphs[annotator2][story],
+                                   stage_names)
+
+
+def print_agreement_matrix(matrix):
+    """
+    Print the agreement matrix of a subtask
+    :param matrix: a K x K matrix of the agreement between each pair of annotators (NaN in the diagonal)
+    """
+    print '     ' + ''.join(['%7d' % (index + 1) for index in range(len(matrix))])
+
+    for index, row in enumerate(matrix):
+        print '%5d' % (index + 1) + ''.join(['%7s' % '-' if np.isnan(score) else '%7.3f' % score for score in row])
+
+
+def print_scores(scores):
+    """
+    Print the agreement scores
+    :param scores: the scores, in the order of SUBTASK_METRICS
+    """
     ent_score, ent_muc, ent_b_cube, ent_ceaf_c, ent_mela, \
     pred_score, pred_mention_verbal_score, pred_mention_non_verbal_score, pred_muc, pred_b_cube, pred_ceaf_c, pred_mela, \
-    arg_mention_score, arg_muc, arg_b_cube, arg_ceaf_c, arg_mela, entities_f1, propositions_f1 = average.tolist()
+    arg_mention_score, arg_muc, arg_b_cube, arg_ceaf_c, arg_mela, entities_f1, propositions_f1 = list(scores)
 
-    print '\n\nAverage:\n=========\n'
     print 'Entity mentions: %.3f' % ent_score
     print 'Entity coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % \
           (ent_muc, ent_b_cube, ent_ceaf_c, ent_mela)
@@ -83,10 +311,10 @@ def main():
     print 'Argument mentions: %.3f' % arg_mention_score
     print 'Argument coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % \
           (arg_muc, arg_b_cube, arg_ceaf_c, arg_mela)
-    print 'Entailment graph F1: entities=%.3f,  propositions=%.3f' % (entities_f1, propositions_f1)
+    print 'Entailment graph F1: entities=%.3f, propositions=%.3f' % (entities_f1, propositions_f1)
 
 
-def compute_agreement(annotator1_file, annotator2_file):
+def compute_agreement(annotator1_file, annotator2_file, stage_names=None, cache=None):
     """
     Receives two annotation files about the same story, each annotated by a different annotator,
     and computes the task-level agreement:
@@ -98,65 +326,23 @@ def compute_agreement(annotator1_file, annotator2_file):
     6) Entailment graph
     :param annotator1_file The path for the first graph
     :param annotator2_file The path for the second graph
+    :param stage_names The names of the stages to compute (default: all the stages, see agreement_pipeline)
+    :param cache A ResultCache of the stages' results and consensual graphs (default: no cache)
+    :return the scores, in the order of SUBTASK_METRICS, and a dictionary of metric name to its micro counts
     """
+    return AgreementPipeline(annotator1_file, annotator2_file, cache=cache).run(stage_names)
 
-    # Load the annotation files to OKR objects
-    graph1 = load_graph_from_file(annotator1_file)
-    graph2 = load_graph_from_file(annotator2_file)
-
-    # Compute agreement for entity mentions and update the graphs to contain only annotations
-    # in which both annotators agreed on the entity mentions
-    ent_mention_score, consensual_graph1, consensual_graph2 = compute_entity_mention_agreement(graph1, graph2)
-    print 'Entity mentions: %.3f' % ent_mention_score
-
-    # Compute agreement for entity coreference and update the graphs to contain only annotations
-    # in which both annotators agreed on the entity clusters
-    ent_muc, ent_b_cube, ent_ceaf_c, ent_conll_f1, consensual_graph1, consensual_graph2 = \
-        compute_entity_coref_agreement(consensual_graph1, consensual_graph2)
-    print 'Entity coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (ent_muc, ent_b_cube, ent_ceaf_c, ent_conll_f1)
-
-    # Compute agreement for predicate mentions and update the graphs to contain only annotations
-    # in which both annotators agreed on the predicate mentions
-    # For analysis purposes, compute also verbal and non-verbal
-    pred_mention_non_verbal_score = compute_predicate_mention_agreement_non_verbal(consensual_graph1, consensual_graph2)
-
-    pred_mention_verbal_score = compute_predicate_mention_agreement_verbal(consensual_graph1, consensual_graph2)
 
-    pred_mention_score, consensual_graph1, consensual_graph2 = compute_predicate_mention_agreement(consensual_graph1,
-                                                                                      consensual_graph2)
-
-    print 'Predicate mentions: %.3f, verbal: %.3f, non-verbal: %.3f' % (pred_mention_score,
-                                                                        pred_mention_verbal_score,
-                                                                        pred_mention_non_verbal_score)
-
-    # Compute agreement for predicate coreference and update the graphs to contain only annotations
-    # in which both annotators agreed on the predicate clusters
-    pred_muc, pred_b_cube, pred_ceaf_c, pred_conll_f1, consensual_graph1, consensual_graph2,optimal_alignment = \
-        compute_predicate_coref_agreement(consensual_graph1, consensual_graph2)
-    print 'Predicate coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (pred_muc, pred_b_cube, pred_ceaf_c, pred_conll_f1)
-
-    # Compute agreement for argument mention within predicate chains and update the graphs to contain only annotations
-    # in which both annotators agreed on the argument mentions
-    arg_mention_score, consensual_graph1, consensual_graph2= compute_argument_mention_agreement(consensual_graph1,
-                                                                                                consensual_graph2)
-    print 'Argument mentions: %.3f' % arg_mention_score
-	
-    #Compute coreference scores for alignement between arguments of the same propositions:
-    arg_muc, arg_b_cube, arg_ceaf_c, arg_conll_f1, consensual_graph1, consensual_graph2 = \
-        compute_argument_coref_agreement(consensual_graph1, consensual_graph2,optimal_alignment)
-    print 'Argument coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (arg_muc, arg_b_cube, arg_ceaf_c, arg_conll_f1)
-
-    # Compute agreement for the entailment graph and update the graphs to contain only annotations
-    # in which both annotators agreed on the edges (propositions, arguments and entities)
-    entities_f1, arguments_kappa, propositions_f1, consensual_graph1, consensual_graph2 = \
-        compute_entailment_graph_agreement(consensual_graph1, consensual_graph2)
-    print 'Entailment graph F1: entities=%.3f, propositions=%.3f' % (entities_f1, propositions_f1)
-
-    return [ent_mention_score, ent_muc, ent_b_cube, ent_ceaf_c, ent_conll_f1,
-            pred_mention_score, pred_mention_verbal_score, pred_mention_non_verbal_score,
-            pred_muc, pred_b_cube, pred_ceaf_c, pred_conll_f1,
-            arg_mention_score, arg_muc, arg_b_cube, arg_ceaf_c, arg_conll_f1,
-            entities_f1,  propositions_f1]
+def compute_graph_agreement(graph1, graph2, stage_names=None):
+    """
+    Receives two graphs of the same story, each annotated by a different annotator, and computes the task-level
+    agreement (the graphs are not modified)
+    :param graph1 The first annotator's graph
+    :param graph2 The second annotator's graph
+    :param stage_names The names of the stages to compute (default: all the stages, see agreement_pipeline)
+    :return the scores, in the order of SUBTASK_METRICS, and a dictionary of metric name to its micro counts
+    """
+    return AgreementPipeline(graphs=(graph1, graph2)).run(stage_names)
 
 
 if __name__ == '__main__':
@@ -10,28 +10,32 @@ Author: Vered Shwartz
 
 import numpy as np
 
-from sklearn.metrics import precision_recall_fscore_support
-
 
 def compute_entailment_graph_agreement(graph1, graph2):
     """
     Compute the agreement for the entailment graph: entities, arguments and predicates
     :param graph1: the first annotator's graph
     :param graph2: the second annotator's graph
-    :return:
+    :return: the entities, arguments and propositions F1 scores, the consensual graphs, and the micro counts
+    of the entities and propositions F1 scores for both directions (see entailment_micro_counts)
     """
 
     # Compute the agreement for the entity entailment graph, for each entity, and return the average
     # (remove entities with one mention)
-    entities_1_gold_f1 = compute_entities_f1(graph1, graph2)
-    entities_2_gold_f1 = compute_entities_f1(graph2, graph1)
-    entities_f1 = (entities_1_gold_f1 + entities_2_gold_f1) / 2.0
+    entities_1_gold_counts = compute_entities_counts(graph1, graph2)
+    entities_2_gold_counts = compute_entities_counts(graph2, graph1)
+    entities_f1 = (mean_entailment_f1(entities_1_gold_counts) + mean_entailment_f1(entities_2_gold_counts)) / 2.0
 
     # Compute the agreement for the predicate entailment graph, for each predicate, and return the average
     # (remove predicates with one mention)
-    props_1_gold_f1 = compute_predicate_f1(graph1, graph2)
-    props_2_gold_f1 = compute_predicate_f1(graph2, graph1)
-    propositions_f1 = (props_1_gold_f1 + props_2_gold_f1) / 2.0
+    props_1_gold_counts = compute_predicate_counts(graph1, graph2)
+    props_2_gold_counts = compute_predicate_counts(graph2, graph1)
+    propositions_f1 = (mean_entailment_f1(props_1_gold_counts) + mean_entailment_f1(props_2_gold_counts)) / 2.0
+
+    counts = np.array([[entailment_micro_counts(entities_1_gold_counts),
+                        entailment_micro_counts(entities_2_gold_counts)],
+                       [entailment_micro_counts(props_1_gold_counts),
+                        entailment_micro_counts(props_2_gold_counts)]])
 
     # TODO: implement
     arguments_f1 = 0.0
@@ -40,7 +44,7 @@ def compute_entailment_graph_agreement(graph1, graph2):
     consensual_graph1 = graph1
     consensual_graph2 = graph2
 
-    return entities_f1, arguments_f1, propositions_f1, consensual_graph1, consensual_graph2
+    return entities_f1, arguments_f1, propositions_f1, consensual_graph1, consensual_graph2, counts
 
 
 def compute_entities_f1(gold_graph, pred_graph):
@@ -50,6 +54,16 @@ def compute_entities_f1(gold_graph, pred_graph):
     :param pred_graph: the second annotator's graph
     :return: the entity edges' mean F1 score
     """
+    return mean_entailment_f1(compute_entities_counts(gold_graph, pred_graph))
+
+
+def compute_entities_counts(gold_graph, pred_graph):
+    """
+    Compute the TP/FP/FN counts of the entity entailment graph edges, for each entity
+    :param gold_graph: the first annotator's graph
+    :param pred_graph: the second annotator's graph
+    :return: a (mutual entities x 3) array of TP, FP and FN counts
+    """
 
     # Get all the possible edges in the entity entailment graph
     all_edges = {str(entity): set([(str(m1), str(m2))
@@ -57,28 +71,11 @@ def compute_entities_f1(gold_graph, pred_graph):
                                    for m2 in entity.mentions.values() if m1 != m2])
                  for entity in gold_graph.entities.values() if len(entity.mentions) > 1}
 
-    # Get the binary predictions/gold for these edges
-    str_entities_gold = { entity : str(entity) for entity in gold_graph.entities.values() }
-    entity_entailments_gold = {str_entities_gold[entity]:
-                                [1 if (m1, m2) in set(entity.entailment_graph.mentions_graph) else 0
-                                 for (m1, m2) in all_edges[str_entities_gold[entity]]]
-                            for entity in gold_graph.entities.values() if str_entities_gold[entity] in all_edges.keys()}
-
-    str_entities_pred = { entity : str(entity) for entity in pred_graph.entities.values() }
-    entity_entailments_pred = {str_entities_pred[entity]:
-                                [1 if (m1, m2) in set(entity.entailment_graph.mentions_graph) else 0
-                                 for (m1, m2) in all_edges[str_entities_pred[entity]]]
-                            for entity in pred_graph.entities.values() if str_entities_pred[entity] in all_edges.keys()}
-
-    mutual_entities = list(set(entity_entailments_gold.keys()).intersection(entity_entailments_pred.keys()))
+    # Index the entailment edges of each entity once
+    entity_entailments_gold = get_entailment_edges(gold_graph.entities.values(), all_edges)
+    entity_entailments_pred = get_entailment_edges(pred_graph.entities.values(), all_edges)
 
-    # If both graphs contain no entailments, the score should be one
-    f1 = np.mean([precision_recall_fscore_support(entity_entailments_gold[entity], entity_entailments_pred[entity],
-                                                  average='binary')[2]
-                  if np.sum(entity_entailments_gold[entity]) > 0 or np.sum(entity_entailments_pred[entity]) > 0 else 1.0
-                  for entity in mutual_entities])
-
-    return f1
+    return entailment_counts(all_edges, entity_entailments_gold, entity_entailments_pred)
 
 
 def compute_predicate_f1(gold_graph, pred_graph):
@@ -88,39 +85,93 @@ def compute_predicate_f1(gold_graph, pred_graph):
     :param pred_graph: the second annotator's graph
     :return: the predicates' edges mean F1 score
     """
+    return mean_entailment_f1(compute_predicate_counts(gold_graph, pred_graph))
+
+
+def compute_predicate_counts(gold_graph, pred_graph):
+    """
+    Compute the TP/FP/FN counts of the predicate entailment graph edges, for each predicate
+    :param gold_graph: the first annotator's graph
+    :param pred_graph: the second annotator's graph
+    :return: a (mutual predicates x 3) array of TP, FP and FN counts
+    """
 
     # Use only explicit mentions with more than one proposition
-    str_prop_gold = { prop : str(prop) for prop in gold_graph.propositions.values()
-                   if len(set(map(str, prop.mentions.values()))) > 1 }
-    str_prop_pred = { prop : str(prop) for prop in pred_graph.propositions.values()
-                  if len(set(map(str, prop.mentions.values()))) > 1 }
+    gold_props = [prop for prop in gold_graph.propositions.values()
+                  if len(set(map(str, prop.mentions.values()))) > 1]
+    pred_props = [prop for prop in pred_graph.propositions.values()
+                  if len(set(map(str, prop.mentions.values()))) > 1]
 
-    # Get all the possible edges in the entity entailment graph
+    # Get all the possible edges in the predicate entailment graph
     all_edges = {str(prop) : set([(str(m1), str(m2))
-                                   for m1 in prop.mentions.values()
-                                   for m2 in prop.mentions.values() if str(m1) != str(m2)])
-                 for prop in gold_graph.propositions.values()
-                 if len(set(map(str, prop.mentions.values()))) > 1}
-
-    # Get the binary predictions/gold for these edges
-    prop_entailments_gold = {str_prop_gold[prop]:
-                              [1 if (m1, m2) in set(prop.entailment_graph.mentions_graph) else 0
-                               for (m1, m2) in all_edges[str_prop_gold[prop]]]
-                          for prop in str_prop_gold.keys()
-                          if str_prop_gold[prop] in all_edges.keys()}
-
-    prop_entailments_pred = {str_prop_pred[prop]:
-                              [1 if (m1, m2) in set(prop.entailment_graph.mentions_graph) else 0
-                               for (m1, m2) in all_edges[str_prop_pred[prop]]]
-                          for prop in str_prop_pred.keys()
-                          if str_prop_pred[prop] in all_edges.keys()}
-
-    mutual_props = list(set(prop_entailments_gold.keys()).intersection(prop_entailments_pred.keys()))
+                                  for m1 in prop.mentions.values()
+                                  for m2 in prop.mentions.values() if str(m1) != str(m2)])
+                 for prop in gold_props}
+
+    # Index the entailment edges of each predicate once
+    prop_entailments_gold = get_entailment_edges(gold_props, all_edges)
+    prop_entailments_pred = get_entailment_edges(pred_props, all_edges)
+
+    return entailment_counts(all_edges, prop_entailments_gold, prop_entailments_pred)
+
+
+def get_entailment_edges(nodes, all_edges):
+    """
+    Receives the nodes (entities or propositions) of a graph and returns the set of entailment edges of each node
+    which also appears in the possible edges dictionary
+    :param nodes: the entities or propositions of the graph
+    :param all_edges: a dictionary of node ID to its possible edges
+    :return: a dictionary of node ID (str(node)) to the set of its entailment edges
+    """
+    str_nodes = [(str(node), node) for node in nodes]
+    return {node_str: set(node.entailment_graph.mentions_graph)
+            for node_str, node in str_nodes if node_str in all_edges}
+
+
+def entailment_counts(all_edges, gold_edges, pred_edges):
+    """
+    Compute the TP/FP/FN counts of the predicted entailment edges for each node: the possible edges of each node
+    are intersected once with the gold and predicted edges.
+    :param all_edges: a dictionary of node ID to its possible edges
+    :param gold_edges: a dictionary of node ID to its gold entailment edges
+    :param pred_edges: a dictionary of node ID to its predicted entailment edges
+    :return: a (mutual nodes x 3) array of TP, FP and FN counts
+    """
+    mutual_nodes = list(set(gold_edges.keys()).intersection(pred_edges.keys()))
+
+    # TP/FP/FN counts per node
+    counts = np.zeros((len(mutual_nodes), 3))
+    for i, node in enumerate(mutual_nodes):
+        gold = all_edges[node].intersection(gold_edges[node])
+        pred = all_edges[node].intersection(pred_edges[node])
+        tp = len(gold.intersection(pred))
+        counts[i] = [tp, len(pred) - tp, len(gold) - tp]
+
+    return counts
+
+
+def mean_entailment_f1(counts):
+    """
+    Compute the binary F1 score of the predicted entailment edges for all the nodes at once, and return the average.
+    Equivalent to computing sklearn's precision_recall_fscore_support for each node.
+    :param counts: a (nodes x 3) array of TP, FP and FN counts
+    :return: the nodes' edges mean F1 score
+    """
+    tp, fp, fn = counts[:, 0], counts[:, 1], counts[:, 2]
 
     # If both graphs contain no entailments, the score should be one
-    f1 = np.mean([precision_recall_fscore_support(prop_entailments_gold[entity], prop_entailments_pred[entity],
-                                                  average='binary')[2]
-                  if np.sum(prop_entailments_gold[entity]) > 0 or np.sum(prop_entailments_pred[entity]) > 0 else 1.0
-                  for entity in mutual_props])
+    f1 = np.ones(len(counts))
+    has_edges = (tp + fp + fn) > 0
+    f1[has_edges] = 2.0 * tp[has_edges] / (2.0 * tp[has_edges] + fp[has_edges] + fn[has_edges])
 
-    return f1
+    return np.mean(f1)
+
+
+def entailment_micro_counts(counts):
+    """
+    Sum the TP/FP/FN counts of all the nodes to the micro counts of the F1 score
+    :param counts: a (nodes x 3) array of TP, FP and FN counts
+    :return: the micro counts (recall_num, recall_den, precision_num, precision_den)
+    """
+    tp, fp, fn = np.sum(counts, axis=0)
+    return np.array([tp, tp + fn, tp, tp + fp])
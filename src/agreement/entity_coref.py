@@ -25,6 +25,7 @@ def compute_entity_coref_agreement(graph1, graph2):
     :param graph2: the second annotator's graph
     :return: MUC, B-CUBED, CEAF and MELA scores. Each score is computed twice, each time
     a different annotator is considered as the gold, and the averaged score is returned.
+    In addition, it returns the micro counts of MUC, B-CUBED and CEAF for both directions (see coref_scores).
     """
 
     # Get entity mentions
@@ -33,14 +34,10 @@ def compute_entity_coref_agreement(graph1, graph2):
 
     # Compute twice, each time considering a different annotator as the gold, and return the average among
     # each measure
-    muc1, bcubed1, ceaf1 = muc(graph1_ent_mentions, graph2_ent_mentions), \
-                           bcubed(graph1_ent_mentions, graph2_ent_mentions), \
-                           ceaf(graph1_ent_mentions, graph2_ent_mentions)
+    muc1, bcubed1, ceaf1, counts1 = coref_scores(graph1_ent_mentions, graph2_ent_mentions)
     mela1 = np.mean([muc1, bcubed1, ceaf1])
 
-    muc2, bcubed2, ceaf2 = muc(graph2_ent_mentions, graph1_ent_mentions), \
-                           bcubed(graph2_ent_mentions, graph1_ent_mentions), \
-                           ceaf(graph2_ent_mentions, graph1_ent_mentions)
+    muc2, bcubed2, ceaf2, counts2 = coref_scores(graph2_ent_mentions, graph1_ent_mentions)
     mela2 = np.mean([muc2, bcubed2, ceaf2])
 
     muc_score = np.mean([muc1, muc2])
@@ -50,26 +47,38 @@ def compute_entity_coref_agreement(graph1, graph2):
 
     # Compute the consensual graphs - find the maximum alignment between entity clusters and keep only
     # the intersection between the clusters in each graph's aligned clusters
-    cost = -np.vstack([np.array([len(s1.intersection(s2)) for s1 in graph1_ent_mentions])
-                       for s2 in graph2_ent_mentions])
-    m = Munkres()
-    cost = pad_to_square(cost)
-    indices = m.compute(cost)
-    optimal_alignment = { row : col for row, col in indices }
-    rev_optimal_alignment = { col : row for row, col in indices }
+    optimal_alignment = align_clusters(graph1_ent_mentions, graph2_ent_mentions)
+    graph1_entity_ids, graph2_entity_ids = graph1.entities.keys(), graph2.entities.keys()
 
-    s1_to_s2 = { graph1.entities.keys()[i] : s1.intersection(graph2_ent_mentions[optimal_alignment[i]])
-                 for i, s1 in enumerate(graph1_ent_mentions)
-                 if optimal_alignment[i] < len(graph2_ent_mentions) }
+    s1_to_s2 = { graph1_entity_ids[i] : graph1_ent_mentions[i].intersection(graph2_ent_mentions[j])
+                 for i, j in optimal_alignment.iteritems() }
 
-    s2_to_s1 = { graph2.entities.keys()[i] : s2.intersection(graph1_ent_mentions[rev_optimal_alignment[i]])
-                 for i, s2 in enumerate(graph2_ent_mentions)
-                 if rev_optimal_alignment[i] < len(graph1_ent_mentions) }
+    s2_to_s1 = { graph2_entity_ids[j] : graph2_ent_mentions[j].intersection(graph1_ent_mentions[i])
+                 for i, j in optimal_alignment.iteritems() }
 
     consensual_graph1 = filter_clusters(graph1, s1_to_s2)
     consensual_graph2 = filter_clusters(graph2, s2_to_s1)
 
-    return muc_score, bcubed_score, ceaf_score, mela_score, consensual_graph1, consensual_graph2
+    counts = np.stack([counts1, counts2], axis=1)
+
+    return muc_score, bcubed_score, ceaf_score, mela_score, consensual_graph1, consensual_graph2, counts
+
+
+def coref_scores(gold_mentions, response_mentions):
+    """
+    Compute the MUC, B-CUBED and CEAF scores, along with their micro counts
+    :param gold_mentions: a set of key entities, with each entity comprising one or more mentions
+    :param response_mentions: a set of response entities, with each entity comprising one or more mentions
+    :return: MUC, B-CUBED and CEAF F1 scores, and a 3 x 4 array of their micro counts:
+    (recall_num, recall_den, precision_num, precision_den) for each measure
+    """
+    ceaf_counts = ceaf_micro(gold_mentions, response_mentions)
+    counts = np.array([muc_micro(gold_mentions, response_mentions),
+                       bcubed_micro(gold_mentions, response_mentions),
+                       ceaf_counts], dtype=float)
+
+    return muc(gold_mentions, response_mentions), bcubed(gold_mentions, response_mentions), \
+           f1_from_counts(*ceaf_counts), counts
 
 
 def muc(gold_mentions, response_mentions):
@@ -119,7 +128,7 @@ def muc_micro(gold_mentions, response_mentions):
 
     # No links - both annotators decided to separate all mentions to different clusters
     if len(gold_links) == 0 and len(response_links) == 0:
-        return 1.00
+        return 0, 0, 0, 0
 
     intersection = gold_links.intersection(response_links)
     recall_num = len(intersection)
@@ -220,9 +229,18 @@ def ceaf(gold_mentions, response_mentions):
     :return: The F1 score computed by CEAF
     """
 
-    recall_num, recall_den, precision_num, precision_den = ceaf_micro(gold_mentions, response_mentions)
+    return f1_from_counts(*ceaf_micro(gold_mentions, response_mentions))
 
-    # Compute precision, recall and F1
+
+def f1_from_counts(recall_num, recall_den, precision_num, precision_den):
+    """
+    Compute the F1 score from the recall and precision numerators and denominators
+    :param recall_num: the recall numerator
+    :param recall_den: the recall denominator
+    :param precision_num: the precision numerator
+    :param precision_den: the precision denominator
+    :return: the F1 score
+    """
     recall = recall_num / (1.0 * recall_den) if recall_den > 0 else 0.0
     precision = precision_num / (1.0 * precision_den) if precision_den > 0 else 0.0
     f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
@@ -282,6 +300,120 @@ def entity_similarity(K, R):
     return 2.0 * len(K.intersection(R)) / (len(K) + len(R))
 
 
+def align_clusters(clusters1, clusters2):
+    """
+    Find the maximum alignment between the clusters of two graphs, i.e. the one-to-one alignment with the
+    maximal number of common mentions. Clusters that don't share mentions add nothing to the alignment, so the
+    sparse bipartite graph of overlapping clusters is split into connected components, and the assignment
+    problem is solved separately for each component. Clusters without common mentions are left unaligned.
+    When a component has several alignments with the maximal number of common mentions, the one that Munkres
+    chooses depends on the whole matrix, so the dense assignment problem of all the clusters is solved instead.
+    The alignment is therefore always the one of the dense assignment problem.
+    :param clusters1: the first graph's clusters (sets of mentions)
+    :param clusters2: the second graph's clusters (sets of mentions)
+    :return: dictionary of the index of a cluster in clusters1 to the index of its aligned cluster in clusters2
+    (only aligned clusters with common mentions)
+    """
+
+    # The number of common mentions of every overlapping pair of clusters, using an inverted index of mentions
+    mention_to_clusters2 = {}
+    for j, cluster in enumerate(clusters2):
+        for mention in cluster:
+            mention_to_clusters2.setdefault(mention, []).append(j)
+
+    overlaps = {}
+    for i, cluster in enumerate(clusters1):
+        for mention in cluster:
+            for j in mention_to_clusters2.get(mention, []):
+                overlaps[(i, j)] = overlaps.get((i, j), 0) + 1
+
+    alignment = {}
+
+    for rows, cols in overlap_components(overlaps.keys()):
+
+        # A single pair of overlapping clusters
+        if len(rows) == 1 and len(cols) == 1:
+            alignment[rows[0]] = cols[0]
+            continue
+
+        component_alignment, total = solve_alignment(rows, cols, overlaps)
+
+        if has_tie(rows, cols, overlaps, component_alignment, total):
+            return solve_alignment(range(len(clusters1)), range(len(clusters2)), overlaps)[0]
+
+        alignment.update(component_alignment)
+
+    return alignment
+
+
+def solve_alignment(rows, cols, overlaps, excluded=None):
+    """
+    Solve the assignment problem of some of the clusters of two graphs with Munkres. As in the dense matrix of all
+    the clusters, the rows of the cost matrix are the second graph's clusters and the columns are the first graph's.
+    :param rows: the indices of the first graph's clusters (sorted)
+    :param cols: the indices of the second graph's clusters (sorted)
+    :param overlaps: dictionary of (index in the first graph, index in the second graph) to the number of common
+    mentions, for the overlapping pairs of clusters
+    :param excluded: a pair of clusters that may not be aligned (default: none)
+    :return: the alignment (dictionary of first graph index to second graph index, only pairs with common mentions)
+    and its number of common mentions
+    """
+    cost = -np.array([[overlaps.get((i, j), 0) if (i, j) != excluded else 0 for i in rows] for j in cols])
+    indices = Munkres().compute(pad_to_square(cost))
+    alignment = { rows[col] : cols[row] for row, col in indices
+                  if row < len(cols) and col < len(rows) and (rows[col], cols[row]) in overlaps
+                  and (rows[col], cols[row]) != excluded }
+
+    return alignment, sum([overlaps[(i, j)] for i, j in alignment.iteritems()])
+
+
+def has_tie(rows, cols, overlaps, alignment, total):
+    """
+    Returns whether a component has another alignment with the same number of common mentions. Such an alignment
+    doesn't contain one of the aligned pairs (it can't contain them all and more pairs with common mentions).
+    :param rows: the indices of the first graph's clusters in the component
+    :param cols: the indices of the second graph's clusters in the component
+    :param overlaps: the number of common mentions of the overlapping pairs of clusters
+    :param alignment: the component's alignment
+    :param total: the alignment's number of common mentions
+    """
+    for pair in alignment.iteritems():
+        if solve_alignment(rows, cols, overlaps, excluded=pair)[1] == total:
+            return True
+
+    return False
+
+
+def overlap_components(pairs):
+    """
+    Find the connected components of the bipartite graph of overlapping clusters
+    :param pairs: the (index in the first graph, index in the second graph) pairs of overlapping clusters
+    :return: a list of components, each a (sorted list of first graph indices, sorted list of second graph indices)
+    """
+    # Union-find over the nodes, (0, i) for the first graph's clusters and (1, j) for the second graph's clusters
+    parent = {}
+
+    def find(node):
+        root = node
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+
+        # Path compression
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+
+        return root
+
+    for i, j in pairs:
+        parent[find((0, i))] = find((1, j))
+
+    components = {}
+    for node in parent.keys():
+        components.setdefault(find(node), ([], []))[node[0]].append(node[1])
+
+    return [(sorted(rows), sorted(cols)) for rows, cols in components.values()]
+
+
 def pad_to_square(mat):
     """
     Pad a numpy array/matrix to be square
@@ -314,7 +446,7 @@ def filter_clusters(graph, consensual_clusters):
 
     for entity_id, entity in consensual_graph.entities.iteritems():
 
-        if entity_id not in consensual_clusters.keys():
+        if entity_id not in consensual_clusters:
             removed.append(entity_id)
             continue
 
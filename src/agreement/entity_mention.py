@@ -16,7 +16,8 @@ def compute_entity_mention_agreement(graph1, graph2):
     Compute entity mention agreement on two graphs
     :param graph1: the first annotator's graph
     :param graph2: the second annotator's graph
-    :return entity mention accuracy and the consensual graphs
+    :return entity mention accuracy, the consensual graphs and the micro counts
+    (consensual mentions and mentions in each graph)
     """
 
     # Get the consensual mentions and the mentions in each graph
@@ -31,7 +32,9 @@ def compute_entity_mention_agreement(graph1, graph2):
     consensual_graph1 = filter_mentions(graph1, consensual_mentions)
     consensual_graph2 = filter_mentions(graph2, consensual_mentions)
 
-    return entity_mention_acc, consensual_graph1, consensual_graph2
+    counts = mention_counts(consensual_mentions, graph1_ent_mentions, graph2_ent_mentions)
+
+    return entity_mention_acc, consensual_graph1, consensual_graph2, counts
 
 
 def filter_mentions(graph, consensual_mentions):
@@ -78,11 +81,8 @@ def extract_consensual_mentions(graph1, graph2):
     graph2_ent_mentions = set([a for a in graph2_ent_mentions if a.split('[')[0] in common_sentences])
 
     # Exclude ignored_words, for versions 5 and up:
-    if not graph2.ignored_indices == None:
-        graph1_ent_mentions = set([a for a in graph1_ent_mentions if len(overlap_set(a, graph2.ignored_indices)) == 0])
-
-    if not graph1.ignored_indices == None:
-        graph2_ent_mentions = set([a for a in graph2_ent_mentions if len(overlap_set(a, graph1.ignored_indices)) == 0])
+    graph1_ent_mentions = filter_ignored(graph1_ent_mentions, graph2)
+    graph2_ent_mentions = filter_ignored(graph2_ent_mentions, graph1)
 
     consensual_mentions = graph1_ent_mentions.intersection(graph2_ent_mentions)
 
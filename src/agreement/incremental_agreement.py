@@ -0,0 +1,547 @@
+"""
+incremental_agreement
+
+    Incremental agreement of two annotators on the mentions and coreference of a story (entities or predicates),
+    for refreshing the agreement while one of the annotators edits the story.
+
+    The tracker holds each annotator's clustering of the mentions, the consensual mentions (see
+    extract_consensual_mentions in entity_mention), the contingency counts of the consensual clusters (the number
+    of consensual mentions in each pair of clusters) and the running sums from which the MUC and B-CUBED scores
+    are computed. The CEAF alignment is solved separately for each connected component of the overlap graph of the
+    clusters (see align_clusters in entity_coref), so an edit re-solves only the components of the clusters it
+    touched. The scores are the same as compute_entity_mention_agreement followed by compute_entity_coref_agreement
+    (or their predicate counterparts).
+
+    A mention may belong to more than one cluster of the same annotator. The running sums count such a mention once
+    for each of its clusters, so they are corrected when the scores are computed: MUC counts each link once, and
+    B-CUBED takes the last cluster of the mention, in the order of the graph's nodes (as bcubed does).
+"""
+import sys
+sys.path.append('../common')
+
+import numpy as np
+
+from munkres import Munkres
+from mention_common import first_index
+from entity_coref import f1_from_counts, pad_to_square
+
+
+class IncrementalAgreement:
+    """
+    The agreement of two annotators on the mentions and coreference of a story, updated incrementally.
+    Each mention (in str format "sentence_id[indices_ids]") belongs to one or more clusters of each annotator.
+    """
+
+    def __init__(self, graph1, graph2, subtask='Entity'):
+        """
+        :param graph1: the first annotator's graph
+        :param graph2: the second annotator's graph
+        :param subtask: 'Entity' to track the entities or 'Predicate' to track the propositions
+        """
+        self.subtask = subtask
+        self.ignored_masks = [graph1.ignored_mask, graph2.ignored_mask]
+
+        self.clusters = [{}, {}]  # For each annotator, dictionary of mention to its cluster IDs
+        self.members = [{}, {}]  # For each annotator, dictionary of cluster ID to its mentions
+        self.cluster_order = [{}, {}]  # For each annotator, dictionary of cluster ID to its position
+        self.sentence_mentions = [{}, {}]  # For each annotator, dictionary of sentence ID to its mentions
+        self.mentions = [set(), set()]  # The mentions of each annotator (in common sentences, not ignored)
+        self.consensual_mentions = set()
+        self.shared_mentions = set()  # The mentions in more than one cluster of an annotator
+
+        # The consensual clusters: the contingency counts, and for each annotator, the number of consensual
+        # mentions in each cluster, the sum of the squared contingency counts of each cluster and the clusters
+        # of the other annotator that it overlaps
+        self.overlaps = {}  # Dictionary of (annotator 1's cluster ID, annotator 2's cluster ID) to count
+        self.sizes = [{}, {}]
+        self.squared_overlaps = [{}, {}]
+        self.neighbors = [{}, {}]
+
+        # The running sums: the links in each annotator's clusters, the common links, and the B-CUBED recall
+        # numerator, taking each annotator as the gold
+        self.links = [0, 0]
+        self.common_links = 0
+        self.bcubed_sums = [0.0, 0.0]
+
+        # The CEAF alignment of each connected component of the overlap graph
+        self.component_of = {}  # Dictionary of (annotator, cluster ID) to component ID
+        self.components = {}  # Dictionary of component ID to (nodes, alignment, similarity)
+        self.next_component_id = 0
+        self.total_similarity = 0.0
+        self.dirty = set()  # The (annotator, cluster ID) nodes whose component should be re-solved
+
+        nodes = [graph1.entities, graph2.entities] if subtask == 'Entity' else \
+            [graph1.propositions, graph2.propositions]
+
+        for annotator, graph_nodes in enumerate(nodes):
+            for node_id, node in graph_nodes.iteritems():
+                for mention in node.mentions.values():
+                    self.add_mention(annotator, str(mention), node_id)
+
+    def add_mention(self, annotator, mention, cluster_id):
+        """
+        Add a mention to a cluster (a new cluster ID creates a new cluster). A mention that is already in other
+        clusters is added to this cluster as well.
+        :param annotator: the annotator (0 or 1)
+        :param mention: the mention, in str format ("sentence_id[indices_ids]")
+        :param cluster_id: the ID of the mention's cluster
+        """
+        if mention in self.clusters[annotator]:
+            if cluster_id not in self.clusters[annotator][mention]:
+                self.add_member(annotator, mention, cluster_id)
+            return
+
+        sent_id = mention.split('[')[0]
+        sentence_mentions = self.sentence_mentions[annotator].setdefault(sent_id, set())
+        self.clusters[annotator][mention] = set()
+        self.add_member(annotator, mention, cluster_id)
+        sentence_mentions.add(mention)
+
+        # The first mention of the sentence makes it common (if the other annotator annotated it)
+        if len(sentence_mentions) == 1:
+            self.update_sentence(sent_id)
+        else:
+            self.update_mention(annotator, mention)
+
+    def remove_mention(self, annotator, mention, cluster_id=None):
+        """
+        Remove a mention from a cluster, or from all its clusters
+        :param annotator: the annotator (0 or 1)
+        :param mention: the mention, in str format ("sentence_id[indices_ids]")
+        :param cluster_id: the ID of the cluster to remove the mention from (default: all the mention's clusters)
+        """
+        cluster_ids = list(self.clusters[annotator][mention]) if cluster_id is None else [cluster_id]
+
+        # The mention remains in its other clusters
+        if len(cluster_ids) < len(self.clusters[annotator][mention]):
+            for cluster_id in cluster_ids:
+                self.remove_member(annotator, mention, cluster_id)
+            return
+
+        sent_id = mention.split('[')[0]
+        sentence_mentions = self.sentence_mentions[annotator][sent_id]
+        sentence_mentions.remove(mention)
+
+        if len(sentence_mentions) == 0:
+            self.sentence_mentions[annotator].pop(sent_id)
+
+        self.update_mention(annotator, mention, removed=True)
+
+        for cluster_id in cluster_ids:
+            self.remove_member(annotator, mention, cluster_id)
+
+        self.clusters[annotator].pop(mention)
+
+        # Removing the last mention of the sentence makes it not common
+        if len(sentence_mentions) == 0:
+            self.update_sentence(sent_id)
+
+    def move_mention(self, annotator, mention, cluster_id, from_cluster_id=None):
+        """
+        Move a mention to another cluster (a new cluster ID creates a new cluster)
+        :param annotator: the annotator (0 or 1)
+        :param mention: the mention, in str format ("sentence_id[indices_ids]")
+        :param cluster_id: the ID of the mention's new cluster
+        :param from_cluster_id: the ID of the cluster that the mention leaves (default: all the mention's clusters)
+        """
+        cluster_ids = list(self.clusters[annotator][mention]) if from_cluster_id is None else [from_cluster_id]
+
+        # Add the mention first, so that it doesn't stop being a mention in between
+        if cluster_id not in self.clusters[annotator][mention]:
+            self.add_member(annotator, mention, cluster_id)
+
+        for old_cluster_id in cluster_ids:
+            if old_cluster_id != cluster_id:
+                self.remove_member(annotator, mention, old_cluster_id)
+
+    def merge_clusters(self, annotator, cluster_id, other_cluster_id):
+        """
+        Merge a cluster into another cluster
+        :param annotator: the annotator (0 or 1)
+        :param cluster_id: the ID of the merged cluster
+        :param other_cluster_id: the ID of the cluster that the merged cluster's mentions move to
+        """
+        for mention in list(self.members[annotator].get(cluster_id, [])):
+            self.move_mention(annotator, mention, other_cluster_id, cluster_id)
+
+    def add_member(self, annotator, mention, cluster_id):
+        """
+        Add a mention to a cluster's mentions
+        :param annotator: the annotator (0 or 1)
+        :param mention: the mention
+        :param cluster_id: the ID of the cluster
+        """
+        if cluster_id not in self.cluster_order[annotator]:
+            self.cluster_order[annotator][cluster_id] = len(self.cluster_order[annotator])
+
+        self.clusters[annotator][mention].add(cluster_id)
+        self.members[annotator].setdefault(cluster_id, set()).add(mention)
+        self.update_shared(mention)
+
+        if mention in self.consensual_mentions:
+            self.update_size(annotator, cluster_id, 1)
+            self.update_memberships(mention, [(annotator, cluster_id)], 1)
+
+    def remove_member(self, annotator, mention, cluster_id):
+        """
+        Remove a mention from a cluster's mentions (the cluster is removed when it has no mentions)
+        :param annotator: the annotator (0 or 1)
+        :param mention: the mention
+        :param cluster_id: the ID of the cluster
+        """
+        if mention in self.consensual_mentions:
+            self.update_memberships(mention, [(annotator, cluster_id)], -1)
+            self.update_size(annotator, cluster_id, -1)
+
+        self.clusters[annotator][mention].remove(cluster_id)
+        self.members[annotator][cluster_id].remove(mention)
+        self.update_shared(mention)
+
+        if len(self.members[annotator][cluster_id]) == 0:
+            self.members[annotator].pop(cluster_id)
+
+    def update_shared(self, mention):
+        """
+        Update whether the mention is in more than one cluster of an annotator
+        :param mention: the mention
+        """
+        if any([len(clusters.get(mention, [])) > 1 for clusters in self.clusters]):
+            self.shared_mentions.add(mention)
+        else:
+            self.shared_mentions.discard(mention)
+
+    def update_sentence(self, sent_id):
+        """
+        Update the mentions of a sentence after it became (or stopped being) annotated by both annotators
+        :param sent_id: the sentence ID
+        """
+        for annotator in [0, 1]:
+            for mention in self.sentence_mentions[annotator].get(sent_id, []):
+                self.update_mention(annotator, mention)
+
+    def update_mention(self, annotator, mention, removed=False):
+        """
+        Update whether the annotator's mention counts (it is in a sentence annotated by both annotators and
+        it doesn't overlap with the words ignored by the other annotator), and whether it is consensual
+        :param annotator: the annotator (0 or 1)
+        :param mention: the mention
+        :param removed: whether the mention is being removed
+        """
+        sent_id = mention.split('[')[0]
+        counts = not removed and all([sent_id in sentence_mentions for sentence_mentions in self.sentence_mentions]) \
+                 and not self.is_ignored(mention, self.ignored_masks[1 - annotator])
+
+        if counts:
+            self.mentions[annotator].add(mention)
+        else:
+            self.mentions[annotator].discard(mention)
+
+        self.set_consensual(mention, mention in self.mentions[0] and mention in self.mentions[1])
+
+    def set_consensual(self, mention, consensual):
+        """
+        Add a mention to the consensual mentions (and clusters), or remove it
+        :param mention: the mention
+        :param consensual: whether the mention is consensual
+        """
+        if consensual == (mention in self.consensual_mentions):
+            return
+
+        nodes = [(annotator, cluster) for annotator in [0, 1] for cluster in self.clusters[annotator][mention]]
+
+        # The cluster sizes are updated before the contingency counts when the mention is added, and after them
+        # when it is removed, so that no count exceeds the sizes of its clusters
+        if consensual:
+            self.consensual_mentions.add(mention)
+            for annotator, cluster in nodes:
+                self.update_size(annotator, cluster, 1)
+            self.update_memberships(mention, [node for node in nodes if node[0] == 0], 1)
+        else:
+            self.update_memberships(mention, [node for node in nodes if node[0] == 0], -1)
+            for annotator, cluster in nodes:
+                self.update_size(annotator, cluster, -1)
+            self.consensual_mentions.remove(mention)
+
+    def update_memberships(self, mention, nodes, delta):
+        """
+        Update the contingency counts of a consensual mention's clusters with the mention's clusters of the other
+        annotator
+        :param mention: the mention
+        :param nodes: the (annotator, cluster ID) nodes of the mention's clusters that were added or removed
+        :param delta: 1 for added clusters, -1 for removed clusters
+        """
+        for annotator, cluster in nodes:
+            for other in self.clusters[1 - annotator][mention]:
+                cluster1, cluster2 = (cluster, other) if annotator == 0 else (other, cluster)
+                self.update_overlap(cluster1, cluster2, delta)
+
+    def update_size(self, annotator, cluster, delta):
+        """
+        Update the number of consensual mentions in a cluster, and the running sums of the scores
+        :param annotator: the annotator (0 or 1)
+        :param cluster: the cluster ID
+        :param delta: 1 for a mention added to the cluster, -1 for a mention removed from it
+        """
+        size = self.sizes[annotator].get(cluster, 0)
+        self.links[annotator] -= size * (size - 1)
+        if size > 0:
+            self.bcubed_sums[annotator] -= self.squared_overlaps[annotator][cluster] * 1.0 / size
+
+        size += delta
+        self.links[annotator] += size * (size - 1)
+
+        if size > 0:
+            self.sizes[annotator][cluster] = size
+            self.squared_overlaps[annotator].setdefault(cluster, 0)
+            self.bcubed_sums[annotator] += self.squared_overlaps[annotator][cluster] * 1.0 / size
+        else:
+            self.sizes[annotator].pop(cluster)
+            self.squared_overlaps[annotator].pop(cluster)
+            self.neighbors[annotator].pop(cluster, None)
+
+        self.dirty.add((annotator, cluster))
+
+    def update_overlap(self, cluster1, cluster2, delta):
+        """
+        Update the contingency count of two clusters, and the running sums of the scores
+        :param cluster1: the first annotator's cluster ID
+        :param cluster2: the second annotator's cluster ID
+        :param delta: 1 for a mention added to both clusters, -1 for a mention removed from both
+        """
+        pair = (cluster1, cluster2)
+        nodes = [(0, cluster1), (1, cluster2)]
+
+        # Remove the contributions of the clusters to the running sums
+        for annotator, cluster in nodes:
+            self.bcubed_sums[annotator] -= self.squared_overlaps[annotator][cluster] * 1.0 / \
+                                           self.sizes[annotator][cluster]
+
+        overlap = self.overlaps.get(pair, 0)
+        self.common_links -= overlap * (overlap - 1)
+
+        # Update the counts
+        new_overlap = overlap + delta
+        for annotator, cluster in nodes:
+            self.squared_overlaps[annotator][cluster] += new_overlap ** 2 - overlap ** 2
+
+        if new_overlap > 0:
+            self.overlaps[pair] = new_overlap
+            self.neighbors[0].setdefault(cluster1, set()).add(cluster2)
+            self.neighbors[1].setdefault(cluster2, set()).add(cluster1)
+        else:
+            self.overlaps.pop(pair, None)
+            self.neighbors[0][cluster1].discard(cluster2)
+            self.neighbors[1][cluster2].discard(cluster1)
+
+        # Add the new contributions of the clusters
+        self.common_links += new_overlap * (new_overlap - 1)
+
+        for annotator, cluster in nodes:
+            self.bcubed_sums[annotator] += self.squared_overlaps[annotator][cluster] * 1.0 / \
+                                           self.sizes[annotator][cluster]
+
+        self.dirty.update(nodes)
+
+    def scores(self):
+        """
+        Returns the current scores and micro counts, in the format of the agreement stages' results
+        (see agreement_pipeline)
+        :return: a dictionary of metric name to score, and a dictionary of metric name to micro counts
+        """
+        self.update_alignment()
+        links, common_links, bcubed_sums = self.corrected_sums()
+
+        num_consensual = len(self.consensual_mentions)
+        mention_name = self.subtask + ' mentions'
+        accuracy = [num_consensual * 1.0 / len(self.mentions[annotator]) if len(self.mentions[annotator]) > 0
+                    else 0.0 for annotator in [0, 1]]
+        scores = {mention_name: np.mean(accuracy)}
+        counts = {mention_name: np.array([[num_consensual, len(self.mentions[0])],
+                                          [num_consensual, len(self.mentions[1])]], dtype=float)}
+
+        # Each score is computed twice, each time taking a different annotator as the gold
+        coref_counts = np.zeros((3, 2, 4))
+        coref_scores = np.zeros((3, 2))
+
+        for gold, response in [(0, 1), (1, 0)]:
+
+            # MUC: no links at all means both annotators separated all the mentions
+            if links[gold] == 0 and links[response] == 0:
+                coref_counts[0, gold] = 0, 0, 0, 0
+                coref_scores[0, gold] = 1.0
+            else:
+                coref_counts[0, gold] = common_links, links[gold], common_links, links[response]
+                coref_scores[0, gold] = f1_from_counts(*coref_counts[0, gold])
+
+            # B-CUBED - all the consensual mentions are in both annotators' clusters
+            coref_counts[1, gold] = bcubed_sums[gold], num_consensual, bcubed_sums[response], num_consensual
+            coref_scores[1, gold] = f1_from_counts(*coref_counts[1, gold])
+
+            # CEAF (the entity self-similarity is 1)
+            coref_counts[2, gold] = self.total_similarity, len(self.sizes[response]), \
+                                    self.total_similarity, len(self.sizes[gold])
+            coref_scores[2, gold] = f1_from_counts(*coref_counts[2, gold])
+
+        coref_name = self.subtask + ' coreference '
+        for metric, metric_scores, metric_counts in zip(['MUC', 'B^3', 'CEAF_C'], coref_scores, coref_counts):
+            scores[coref_name + metric] = np.mean(metric_scores)
+            counts[coref_name + metric] = metric_counts
+
+        scores[coref_name + 'MELA'] = np.mean(np.mean(coref_scores, axis=0))
+
+        return scores, counts
+
+    def corrected_sums(self):
+        """
+        Returns the running sums of the MUC links and the B-CUBED numerators, corrected for the consensual mentions
+        in more than one cluster of an annotator: the running sums count each link once for each pair of clusters
+        that contain it, and each such mention once for each pair of its clusters. The correction only visits the
+        pairs of these mentions (a link is counted more than once only if both its mentions are in more than one
+        cluster).
+        :return: the links of each annotator, the common links and the B-CUBED sum of each annotator
+        """
+        links = list(self.links)
+        common_links = self.common_links
+        bcubed_sums = list(self.bcubed_sums)
+
+        shared = [mention for mention in self.shared_mentions if mention in self.consensual_mentions]
+
+        for mention in shared:
+            clusters = [self.clusters[0][mention], self.clusters[1][mention]]
+
+            # B-CUBED takes the mention's last cluster of each annotator
+            last = [max(clusters[annotator], key=self.cluster_order[annotator].get) for annotator in [0, 1]]
+            for cluster1 in clusters[0]:
+                for cluster2 in clusters[1]:
+                    overlap = self.overlaps[(cluster1, cluster2)]
+                    bcubed_sums[0] -= overlap * 1.0 / self.sizes[0][cluster1]
+                    bcubed_sums[1] -= overlap * 1.0 / self.sizes[1][cluster2]
+
+            overlap = self.overlaps[(last[0], last[1])]
+            bcubed_sums[0] += overlap * 1.0 / self.sizes[0][last[0]]
+            bcubed_sums[1] += overlap * 1.0 / self.sizes[1][last[1]]
+
+            # MUC counts each link once
+            for other in shared:
+                if other == mention:
+                    continue
+
+                common = [len(clusters[annotator].intersection(self.clusters[annotator][other]))
+                          for annotator in [0, 1]]
+                for annotator in [0, 1]:
+                    links[annotator] -= max(common[annotator] - 1, 0)
+
+                common_links -= common[0] * common[1] - (1 if min(common) > 0 else 0)
+
+        return links, common_links, bcubed_sums
+
+    def alignment(self):
+        """
+        Returns the current CEAF alignment of the consensual clusters
+        :return: dictionary of the first annotator's cluster ID to its aligned cluster ID of the second annotator
+        """
+        self.update_alignment()
+        return {cluster1: cluster2 for _, alignment, _ in self.components.values()
+                for cluster1, cluster2 in alignment}
+
+    def update_alignment(self):
+        """
+        Re-solve the CEAF alignment of the components that contain clusters changed since the last update
+        """
+        if len(self.dirty) == 0:
+            return
+
+        # The changed clusters and the clusters of their previous components
+        nodes = set(self.dirty)
+        for node in self.dirty:
+            if node in self.component_of:
+                component_id = self.component_of[node]
+                component_nodes, _, similarity = self.components.pop(component_id, ([], [], 0.0))
+                self.total_similarity -= similarity
+                nodes.update(component_nodes)
+
+        for node in nodes:
+            self.component_of.pop(node, None)
+
+        self.dirty = set()
+
+        # Find the new components of these clusters and align each of them
+        for node in nodes:
+            if node in self.component_of or node[1] not in self.sizes[node[0]]:
+                continue
+
+            component_nodes = self.connected_component(node)
+            alignment, similarity = self.align_component(component_nodes)
+
+            component_id = self.next_component_id
+            self.next_component_id += 1
+            self.components[component_id] = (component_nodes, alignment, similarity)
+            self.total_similarity += similarity
+
+            for component_node in component_nodes:
+                self.component_of[component_node] = component_id
+
+    def connected_component(self, node):
+        """
+        Returns the nodes of the connected component of the overlap graph that contains the node
+        :param node: an (annotator, cluster ID) node
+        :return: the (annotator, cluster ID) nodes of the component
+        """
+        component = set([node])
+        stack = [node]
+
+        while len(stack) > 0:
+            annotator, cluster = stack.pop()
+            for neighbor in self.neighbors[annotator].get(cluster, []):
+                if (1 - annotator, neighbor) not in component:
+                    component.add((1 - annotator, neighbor))
+                    stack.append((1 - annotator, neighbor))
+
+        return list(component)
+
+    def align_component(self, component_nodes):
+        """
+        Find the alignment with the maximal entity similarity (Luo, 2005) between the clusters of a component
+        :param component_nodes: the (annotator, cluster ID) nodes of the component
+        :return: the aligned (first annotator's cluster ID, second annotator's cluster ID) pairs, and their
+        total similarity
+        """
+        rows = [cluster for annotator, cluster in component_nodes if annotator == 0]
+        cols = [cluster for annotator, cluster in component_nodes if annotator == 1]
+
+        similarities = np.array([[self.similarity(row, col) for col in cols] for row in rows])
+
+        # A single pair of overlapping clusters
+        if len(rows) == 1 and len(cols) == 1:
+            indices = [(0, 0)]
+        else:
+            indices = Munkres().compute(-pad_to_square(similarities))
+
+        alignment = [(rows[row], cols[col]) for row, col in indices
+                     if row < len(rows) and col < len(cols) and (rows[row], cols[col]) in self.overlaps]
+
+        return alignment, np.sum([similarities[row][col] for row, col in indices
+                                  if row < len(rows) and col < len(cols)])
+
+    def similarity(self, cluster1, cluster2):
+        """
+        The entity similarity of two consensual clusters: 2 * |K intersects R| / (|K| + |R|) (see entity_similarity)
+        :param cluster1: the first annotator's cluster ID
+        :param cluster2: the second annotator's cluster ID
+        """
+        return 2.0 * self.overlaps.get((cluster1, cluster2), 0) / (self.sizes[0][cluster1] + self.sizes[1][cluster2])
+
+    @staticmethod
+    def is_ignored(mention, ignored_mask):
+        """
+        Returns whether the mention overlaps with the ignored words (like filter_ignored, only the first index
+        of the mention is checked)
+        :param mention: the mention, in str format ("sentence_id[indices_ids]")
+        :param ignored_mask: dictionary of sentence ID to a boolean array of the ignored words, or None
+        """
+        if ignored_mask is None:
+            return False
+
+        sentence_mask = ignored_mask.get(int(mention.split('[')[0]))
+        index = first_index(mention)
+        return sentence_mask is not None and 0 <= index < len(sentence_mask) and sentence_mask[index]
@@ -3,6 +3,8 @@ Author: Rachel Wities
 
     Utility methods for mention agreement.
 """
+import numpy as np
+
 
 def str_to_set(str_mention):
     """
@@ -21,4 +23,71 @@ def overlap_set(str_mention1, set1):
     :param set1: a set of mentions
     :return: whether the mention is in the set
     """
-    return str_to_set(str_mention1).intersection(set1)
\ No newline at end of file
+    return str_to_set(str_mention1).intersection(set1)
+
+
+def filter_ignored(mentions, graph):
+    """
+    Receives mentions and a graph and removes the mentions that overlap with the words ignored in the graph.
+    Like overlap_set, only the first index of the mention is compared to the ignored words.
+    :param mentions: a set of mentions in str format ("sentence_id[indices_ids]")
+    :param graph: the graph whose ignored words should be excluded
+    :return: the mentions that don't overlap with the ignored words
+    """
+    if graph.ignored_mask is None:
+        return mentions
+
+    mentions = list(mentions)
+    if len(mentions) == 0 or len(graph.ignored_mask) == 0:
+        return set(mentions)
+
+    sentence_ids, indices = first_token_positions(mentions)
+
+    # Concatenate the masks of the sentences, with the offset and length of each sentence's mask (by sentence ID),
+    # and look up all the mentions at once
+    mask_sentence_ids = graph.ignored_mask.keys()
+    offsets = np.zeros(max(mask_sentence_ids + [sentence_ids.max()]) + 1, dtype=int)
+    lengths = np.zeros(len(offsets), dtype=int)
+    lengths[mask_sentence_ids] = [len(graph.ignored_mask[sent_id]) for sent_id in mask_sentence_ids]
+    offsets[mask_sentence_ids] = np.cumsum(lengths[mask_sentence_ids]) - lengths[mask_sentence_ids]
+    concatenated_mask = np.concatenate([graph.ignored_mask[sent_id] for sent_id in mask_sentence_ids])
+
+    in_sentence = (indices >= 0) & (indices < lengths[sentence_ids])
+    ignored = np.zeros(len(mentions), dtype=bool)
+    ignored[in_sentence] = concatenated_mask[offsets[sentence_ids[in_sentence]] + indices[in_sentence]]
+
+    return set([mention for mention, is_ignored in zip(mentions, ignored) if not is_ignored])
+
+
+def first_token_positions(mentions):
+    """
+    Receives mentions in str format ("sentence_id[indices_ids]") and returns the sentence ID and the first index
+    of each mention (-1 if the mention has no valid first index)
+    :param mentions: the mentions
+    :return: an array of sentence IDs and an array of indices
+    """
+    sentence_ids = np.array([int(mention.split('[')[0]) for mention in mentions], dtype=int)
+    indices = np.array([first_index(mention) for mention in mentions], dtype=int)
+    return sentence_ids, indices
+
+
+def first_index(str_mention):
+    """
+    Returns the first index of a mention in str format ("sentence_id[indices_ids]"), or -1 if there is none
+    :param str_mention: the mention
+    :return: the first index of the mention
+    """
+    index = str_mention[str_mention.index('[') + 1 : str_mention.index(']')].split(',')[0]
+    return int(index) if index.isdigit() else -1
+
+
+def mention_counts(consensual_mentions, graph1_mentions, graph2_mentions):
+    """
+    Returns the micro counts of the mention accuracy, each time taking one annotator as the gold
+    :param consensual_mentions: the mentions that both annotators agreed on
+    :param graph1_mentions: the mentions in the first graph
+    :param graph2_mentions: the mentions in the second graph
+    :return: a 2 x 2 array of (numerator, denominator) for each annotator
+    """
+    return np.array([[len(consensual_mentions), len(graph1_mentions)],
+                     [len(consensual_mentions), len(graph2_mentions)]], dtype=float)
\ No newline at end of file
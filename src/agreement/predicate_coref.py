@@ -12,8 +12,7 @@ Author: Vered Shwartz
 
 import numpy as np
 
-from munkres import *
-from entity_coref import muc, bcubed, ceaf, pad_to_square
+from entity_coref import coref_scores, align_clusters
 
 
 def compute_predicate_coref_agreement(graph1, graph2):
@@ -26,7 +25,8 @@ def compute_predicate_coref_agreement(graph1, graph2):
     :param graph2: the second annotator's graph
     :return: MUC, B-CUBED, CEAF and MELA scores. Each score is computed twice, each time
     a different annotator is considered as the gold, and the averaged score is returned.
-    In addition, it returns the optimal alignment of predicates from graph1 to predicates from graph2.
+    In addition, it returns the optimal alignment of predicates from graph1 to predicates from graph2,
+    and the micro counts of MUC, B-CUBED and CEAF for both directions (see coref_scores).
     """
 
     # Get predicate mentions
@@ -37,14 +37,10 @@ def compute_predicate_coref_agreement(graph1, graph2):
 
     # Compute twice, each time considering a different annotator as the gold, and return the average among
     # each measure
-    muc1, bcubed1, ceaf1 = muc(graph1_pred_mentions, graph2_pred_mentions), \
-                           bcubed(graph1_pred_mentions, graph2_pred_mentions), \
-                           ceaf(graph1_pred_mentions, graph2_pred_mentions)
+    muc1, bcubed1, ceaf1, counts1 = coref_scores(graph1_pred_mentions, graph2_pred_mentions)
     mela1 = np.mean([muc1, bcubed1, ceaf1])
 
-    muc2, bcubed2, ceaf2 = muc(graph2_pred_mentions, graph1_pred_mentions), \
-                           bcubed(graph2_pred_mentions, graph1_pred_mentions), \
-                           ceaf(graph2_pred_mentions, graph1_pred_mentions)
+    muc2, bcubed2, ceaf2, counts2 = coref_scores(graph2_pred_mentions, graph1_pred_mentions)
     mela2 = np.mean([muc2, bcubed2, ceaf2])
 
     muc_score = np.mean([muc1, muc2])
@@ -54,29 +50,23 @@ def compute_predicate_coref_agreement(graph1, graph2):
 
     # Compute the consensual graphs - find the maximum alignment between predicate clusters and keep only
     # the intersection between the clusters in each graph's aligned clusters
-    cost = -np.vstack([np.array([len(s1.intersection(s2)) for s1 in graph1_pred_mentions])
-                       for s2 in graph2_pred_mentions])
-    m = Munkres()
-    cost = pad_to_square(cost)
-    indices = m.compute(cost)
-    rev_optimal_alignment = { row : col for row, col in indices }
-    optimal_alignment = { col : row for row, col in indices }
-    id_alignment= { graph1.propositions.keys()[k] : graph2.propositions.keys()[v]
-                    for k, v in optimal_alignment.iteritems()
-                    if k < len(graph1.propositions) and v < len(graph2.propositions) }
-
-    s1_to_s2 = { graph1.propositions.keys()[i] : s1.intersection(graph2_pred_mentions[optimal_alignment[i]])
-                 for i, s1 in enumerate(graph1_pred_mentions)
-                 if optimal_alignment[i] < len(graph2_pred_mentions) }
-
-    s2_to_s1 = { graph2.propositions.keys()[i] : s2.intersection(graph1_pred_mentions[rev_optimal_alignment[i]])
-                 for i, s2 in enumerate(graph2_pred_mentions)
-                 if rev_optimal_alignment[i] < len(graph1_pred_mentions) }
+    optimal_alignment = align_clusters(graph1_pred_mentions, graph2_pred_mentions)
+    graph1_prop_ids, graph2_prop_ids = graph1.propositions.keys(), graph2.propositions.keys()
+    id_alignment = { graph1_prop_ids[i] : graph2_prop_ids[j] for i, j in optimal_alignment.iteritems() }
+
+    s1_to_s2 = { graph1_prop_ids[i] : graph1_pred_mentions[i].intersection(graph2_pred_mentions[j])
+                 for i, j in optimal_alignment.iteritems() }
+
+    s2_to_s1 = { graph2_prop_ids[j] : graph2_pred_mentions[j].intersection(graph1_pred_mentions[i])
+                 for i, j in optimal_alignment.iteritems() }
 
     consensual_graph1 = filter_clusters(graph1, s1_to_s2)
     consensual_graph2 = filter_clusters(graph2, s2_to_s1)
 
-    return muc_score, bcubed_score, ceaf_score, mela_score, consensual_graph1, consensual_graph2, id_alignment
+    counts = np.stack([counts1, counts2], axis=1)
+
+    return muc_score, bcubed_score, ceaf_score, mela_score, consensual_graph1, consensual_graph2, id_alignment, \
+           counts
 
 
 def filter_clusters(graph, consensual_clusters):
@@ -92,7 +82,7 @@ def filter_clusters(graph, consensual_clusters):
 
     for prop_id, prop in consensual_graph.propositions.iteritems():
 
-        if prop_id not in consensual_clusters.keys():
+        if prop_id not in consensual_clusters:
             removed.append(prop_id)
             continue
 
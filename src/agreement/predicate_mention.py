@@ -18,7 +18,8 @@ def compute_predicate_mention_agreement(graph1, graph2):
     Compute predicate mention agreement on two graphs
     :param graph1: the first annotator's graph
     :param graph2: the second annotator's graph
-    :return predicate mention accuracy and the consensual graphs
+    :return predicate mention accuracy, the consensual graphs and the micro counts
+    (consensual mentions and mentions in each graph)
     """
 
     # Get the consensual mentions and the mentions in each graph
@@ -33,7 +34,9 @@ def compute_predicate_mention_agreement(graph1, graph2):
     consensual_graph1 = filter_mentions(graph1, consensual_mentions)
     consensual_graph2 = filter_mentions(graph2, consensual_mentions)
 
-    return prop_mention_acc, consensual_graph1, consensual_graph2
+    counts = mention_counts(consensual_mentions, graph1_prop_mentions, graph2_prop_mentions)
+
+    return prop_mention_acc, consensual_graph1, consensual_graph2, counts
 
 
 def compute_predicate_mention_agreement_verbal(graph1, graph2):
@@ -41,12 +44,12 @@ def compute_predicate_mention_agreement_verbal(graph1, graph2):
     Compute predicate mention agreement only on verbal predicates
     :param graph1: the first annotator's graph
     :param graph2: the second annotator's graph
-    :return predicate mention accuracy on verbal predicates
+    :return predicate mention accuracy on verbal predicates and its micro counts
     """
     verbal_graph1 = filter_verbal(graph1)
     verbal_graph2 = filter_verbal(graph2)
-    accuracy, _, _ = compute_predicate_mention_agreement(verbal_graph1, verbal_graph2)
-    return accuracy
+    accuracy, _, _, counts = compute_predicate_mention_agreement(verbal_graph1, verbal_graph2)
+    return accuracy, counts
 
 
 def compute_predicate_mention_agreement_non_verbal(graph1, graph2):
@@ -54,12 +57,12 @@ def compute_predicate_mention_agreement_non_verbal(graph1, graph2):
     Compute predicate mention agreement only on non verbal predicates
     :param graph1: the first annotator's graph
     :param graph2: the second annotator's graph
-    :return predicate mention accuracy on non verbal predicates
+    :return predicate mention accuracy on non verbal predicates and its micro counts
     """
     non_verbal_graph1 = filter_non_verbal(graph1)
     non_verbal_graph2 = filter_non_verbal(graph2)
-    accuracy, _, _ = compute_predicate_mention_agreement(non_verbal_graph1, non_verbal_graph2)
-    return accuracy
+    accuracy, _, _, counts = compute_predicate_mention_agreement(non_verbal_graph1, non_verbal_graph2)
+    return accuracy, counts
 
 
 def filter_mentions(graph, consensual_mentions):
@@ -108,11 +111,8 @@ def extract_consensual_mentions(graph1, graph2):
 
     # Exclude ignored words
     # TODO: Rachel - document ignored words
-    if not graph2.ignored_indices == None:
-        graph1_prop_mentions = set([a for a in graph1_prop_mentions if len(overlap_set(a, graph2.ignored_indices)) == 0])
-
-    if not graph1.ignored_indices == None:
-        graph2_prop_mentions = set([a for a in graph2_prop_mentions if len(overlap_set(a, graph1.ignored_indices)) == 0])
+    graph1_prop_mentions = filter_ignored(graph1_prop_mentions, graph2)
+    graph2_prop_mentions = filter_ignored(graph2_prop_mentions, graph1)
 
     # Compute the accuracy, each time treating a different annotator as the gold
     consensual_mentions = graph1_prop_mentions.intersection(graph2_prop_mentions)
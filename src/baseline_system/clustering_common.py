@@ -1,27 +1,231 @@
 """
 Utility script for clustering functions
+
+The mentions are scored against the clusters either by a function of the mention and the cluster, or by a
+ClusterScorer, which keeps sufficient statistics of each cluster (e.g. a histogram of the head lemmas of its
+members), so a mention is scored without scanning the members of every cluster. A Blocker can also restrict the
+clusters that each mention is scored against to those with a mention that shares a key with it.
 """
+import sys
+sys.path.append('../common')
+
+from profiling import profiled
+from collections import Counter, defaultdict
 
+THRESHOLD = 0.5  # A mention is assigned to a cluster if its score is above the threshold
 
-def cluster_mentions(mention_list, score):
+
+@profiled()
+def cluster_mentions(mention_list, score, blocker=None):
     """
     Cluster the predicate mentions in a greedy way: assign each predicate to the first
     cluster with similarity score > 0.5. If no such cluster exists, start a new one.
     :param mention_list: the mentions to cluster
-    :param score: the score function that receives a mention and a cluster and returns a score
+    :param score: the score function that receives a mention and a cluster and returns a score, or a ClusterScorer
+    :param blocker: the Blocker that selects the candidate clusters of each mention (default: all the clusters)
     :return: clusters of mentions
     """
+    scorer = score if isinstance(score, ClusterScorer) else FunctionScorer(score)
     clusters = []
+    statistics = []
 
     for mention in mention_list:
         found_cluster = False
-        for cluster in clusters:
-            if score(mention, cluster) > 0.5:
-                cluster.add(mention)
+        candidates = range(len(clusters)) if blocker is None else blocker.candidates(mention)
+
+        for cluster_index in candidates:
+            cluster, cluster_statistics = clusters[cluster_index], statistics[cluster_index]
+
+            if scorer.exceeds(mention, cluster, cluster_statistics):
+                if mention not in cluster:
+                    cluster.add(mention)
+                    scorer.add(cluster_statistics, mention)
+
                 found_cluster = True
                 break
 
         if not found_cluster:
+            cluster_index = len(clusters)
             clusters.append(set([mention]))
+            statistics.append(scorer.new_statistics(mention))
+
+        if blocker is not None:
+            blocker.add(mention, cluster_index)
 
     return clusters
+
+
+class Blocker:
+    """
+    Candidate generation for the clustering: an inverted index of keys to the clusters of the mentions with
+    the keys. A mention is scored only against the clusters with a mention that shares a key with it, so the
+    clusters are the same as without blocking as long as every two similar mentions share a key (a cluster
+    without similar mentions can't have a score above the threshold).
+    """
+
+    def __init__(self, keys):
+        """
+        :param keys: a function that receives a mention and returns its keys, or None if the mention can be
+        similar to mentions without shared keys (it is then scored against all the clusters, and its cluster
+        is a candidate of every mention)
+        """
+        self.keys = keys
+        self.index = defaultdict(set)  # Dictionary of key to the indices of the clusters with mentions with the key
+        self.unblocked_clusters = set()  # The clusters of mentions without keys
+        self.num_clusters = 0
+
+    def candidates(self, mention):
+        """
+        Returns the candidate clusters of the mention
+        :param mention: the mention
+        :return: the indices of the clusters, in the order in which they were created
+        """
+        keys = self.keys(mention)
+
+        if keys is None:
+            return range(self.num_clusters)
+
+        candidates = set(self.unblocked_clusters)
+        for key in keys:
+            candidates.update(self.index.get(key, ()))
+
+        return sorted(candidates)
+
+    def add(self, mention, cluster_index):
+        """
+        Index a mention that was added to a cluster
+        :param mention: the mention
+        :param cluster_index: the index of the cluster
+        """
+        self.num_clusters = max(self.num_clusters, cluster_index + 1)
+        keys = self.keys(mention)
+
+        if keys is None:
+            self.unblocked_clusters.add(cluster_index)
+        else:
+            for key in keys:
+                self.index[key].add(cluster_index)
+
+
+class ClusterScorer:
+    """
+    The interface of the scorers: scores a mention against a cluster using the cluster's sufficient statistics,
+    which are updated as mentions are added to the cluster. A scorer implements:
+    new_statistics(mention) - returns the statistics of a new cluster with its first mention
+    add(statistics, mention) - updates the statistics of a cluster with a new mention
+    score(mention, cluster, statistics) - returns the similarity score between the mention and the cluster
+    exceeds(mention, cluster, statistics, threshold) - returns whether the score is above the threshold
+    (possibly without computing the whole score)
+    """
+
+
+class FunctionScorer(ClusterScorer):
+    """
+    A score function of the mention and the cluster, without statistics
+    """
+
+    def __init__(self, score):
+        self.score_function = score
+
+    def new_statistics(self, mention):
+        return None
+
+    def add(self, statistics, mention):
+        pass
+
+    def score(self, mention, cluster, statistics):
+        return self.score_function(mention, cluster)
+
+    def exceeds(self, mention, cluster, statistics, threshold=THRESHOLD):
+        return self.score(mention, cluster, statistics) > threshold
+
+
+class HistogramScorer(ClusterScorer):
+    """
+    The fraction of the cluster's mentions with the same key as the mention (e.g. the same head lemma).
+    The statistics are a histogram of the keys in the cluster, so the score is computed in O(1).
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def new_statistics(self, mention):
+        return Counter([self.key(mention)])
+
+    def add(self, statistics, mention):
+        statistics[self.key(mention)] += 1
+
+    def score(self, mention, cluster, statistics):
+        return statistics[self.key(mention)] / (1.0 * len(cluster))
+
+    def exceeds(self, mention, cluster, statistics, threshold=THRESHOLD):
+        return self.score(mention, cluster, statistics) > threshold
+
+
+class SimilarityScorer(ClusterScorer):
+    """
+    The fraction of the cluster's mentions that are similar to the mention, where the similarity depends only
+    on a key of the mentions (e.g. their terms). The statistics are a histogram of the keys in the cluster,
+    so the similarity is computed once for each distinct key, and the threshold decision stops as soon as
+    the similar (or dissimilar) mentions are a majority.
+    The keys can also be compared in batches, by a function that compares many keys to the mention's key at once
+    (e.g. with vectorized string matching), and the decision is then checked after each batch.
+    """
+
+    def __init__(self, key, similar, similar_batch=None, batch_size=32):
+        """
+        :param key: a function that returns the key of a mention
+        :param similar: a function that receives two keys and returns whether they are similar
+        :param similar_batch: a function that receives a list of keys and a key, and returns whether each of them
+        is similar to the key, as similar (default: compare one key at a time)
+        :param batch_size: the number of keys compared together by similar_batch
+        """
+        self.key = key
+        self.similar = similar
+        self.similar_batch = similar_batch
+        self.batch_size = batch_size if similar_batch is not None else 1
+
+    def new_statistics(self, mention):
+        return Counter([self.key(mention)])
+
+    def add(self, statistics, mention):
+        statistics[self.key(mention)] += 1
+
+    def score(self, mention, cluster, statistics):
+        key = self.key(mention)
+        others = statistics.keys()
+        similar = sum([statistics[other] for other, is_similar in zip(others, self.compare(others, key)) if is_similar])
+        return similar / (1.0 * len(cluster))
+
+    def exceeds(self, mention, cluster, statistics, threshold=THRESHOLD):
+        key = self.key(mention)
+        bound = threshold * len(cluster)
+        similar, remaining = 0, len(cluster)
+        others = statistics.keys()
+
+        for start in range(0, len(others), self.batch_size):
+            batch = others[start:start + self.batch_size]
+
+            for other, is_similar in zip(batch, self.compare(batch, key)):
+                remaining -= statistics[other]
+
+                if is_similar:
+                    similar += statistics[other]
+
+            # Decided: above the threshold, or can't get above it with the remaining mentions
+            if similar > bound or similar + remaining <= bound:
+                break
+
+        return similar > bound
+
+    def compare(self, others, key):
+        """
+        Returns whether each of the keys is similar to the key
+        :param others: the keys
+        :param key: the key
+        :return: a list of booleans
+        """
+        if self.similar_batch is None:
+            return [self.similar(other, key) for other in others]
+
+        return self.similar_batch(others, key)
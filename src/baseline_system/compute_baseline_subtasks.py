@@ -12,20 +12,32 @@ Author: Vered Shwartz
     6) Entailment graph
 """
 
+import os
 import sys
+import logging
 
 sys.path.append('../common')
 
+import numpy as np
+
 from okr import *
 from docopt import docopt
-from eval_predicate_mention import *
-from prop_extraction import prop_extraction
-from eval_entity_coref import evaluate_entity_coref
-from eval_entailment_graph import evaluate_entailment
-from eval_argument_coref import evaluate_argument_coref
-from eval_entity_mention import evaluate_entity_mention
-from eval_predicate_coref import evaluate_predicate_coref
-from eval_argument_mention import evaluate_argument_mention
+from collections import namedtuple
+from pos_tags import load_or_tag
+from profiling import section, enable_profiling, print_report
+from constants import SUBTASK_METRICS
+from annotation_cache import set_cache_dir
+from bootstrap import print_confidence_intervals
+from aggregation import ScoreAggregator, coref_counts_by_metric
+from shards import select_stories, story_result, write_partial_results, merge_partial_results
+
+NOM_FILE = './nominalizations/nominalizations.reuters.txt'
+
+# A baseline task: its name, and the function that runs the baseline component on a test graph and evaluates it.
+# The function receives the test graph and the BaselineResources, and returns a dictionary of metric name to score
+# and a dictionary of metric name to micro counts. The evaluation modules are imported by the functions, so only
+# the modules (and the resources) of the selected tasks are loaded.
+Task = namedtuple('Task', ['name', 'evaluate'])
 
 
 def main():
@@ -49,60 +61,350 @@ def main():
     6) Entailment graph
 
     Usage:
-        compute_baseline_subtasks.py <val_set_folder> <test_set_folder>
+        compute_baseline_subtasks.py <val_set_folder> <test_set_folder> [--bootstrap=<n>] [--confidence=<c>] [--seed=<s>]
+                                     [--pos_tags=<dir>] [--profile] [--shard=<i/n> | --stories=<file>] [--partial=<file>]
+                                     [--tasks=<t>] [--annotations=<dir>]
+        compute_baseline_subtasks.py --merge <partial_file>... [--bootstrap=<n>] [--confidence=<c>] [--seed=<s>]
 
         <val_set_folder> = the validation set file
         <test_set_folder> = the test set file
-    """)
+        <partial_file> = the partial results files of the shards (see --partial)
+
+    Options:
+        --bootstrap=<n>   number of bootstrap samples over stories for confidence intervals (0 = none) [default: 0]
+        --confidence=<c>  the confidence level of the intervals [default: 0.95]
+        --seed=<s>        the random seed of the bootstrap samples [default: 0]
+        --pos_tags=<dir>  persist the POS tags of the test sentences in this directory, and reuse them in later runs
+        --profile         print the calls and time of each subtask and heavy helper (also enabled by the OKR_PROFILE
+                          environment variable, see profiling)
+        --shard=<i/n>     evaluate only the i-th of n shards of the test stories (0 <= i < n), selected by the hash
+                          of the file name
+        --stories=<file>  evaluate only the test stories whose file names are listed in this file (one per line)
+        --partial=<file>  write the results of each test story to this partial results file, to be merged with the
+                          other shards' files by --merge
+        --merge           merge the partial results files of the shards into the results of the full run
+        --tasks=<t>       comma separated tasks to run, the others are reported as nan [default: all]. Only the
+                          resources of the selected tasks are loaded (e.g. the validation set is loaded only for
+                          the entailment graph). The tasks are:
+                          %s
+        --annotations=<dir>  store the spaCy annotations of the sentences in this directory, and parse only the
+                          sentences missing from it (also set by the OKR_ANNOTATION_CACHE environment variable)
+    """ % ', '.join(TASK_NAMES))
+
+    num_samples = int(args['--bootstrap'])
+
+    if args['--annotations'] is not None:
+        set_cache_dir(args['--annotations'])
+
+    if args['--profile']:
+        enable_profiling()
+
+    if args['--merge']:
+        story_results = merge_partial_results(args['<partial_file>'], 'baseline', SUBTASK_METRICS)
+    else:
+        story_results = story_baselines(args['<val_set_folder>'], args['<test_set_folder>'],
+                                        parse_tasks(args['--tasks']), args['--shard'], args['--stories'],
+                                        args['--pos_tags'])
+
+    # Aggregate the results as each story finishes. The per story results are kept only for the bootstrap
+    # and the partial results.
+    aggregator = ScoreAggregator(SUBTASK_METRICS)
+    kept_results = []
+
+    for result in story_results:
+        aggregator.add(result['scores'], result['counts'])
+
+        if num_samples > 0 or args['--partial'] is not None:
+            kept_results.append(result)
+
+    if args['--partial'] is not None:
+        write_partial_results(args['--partial'], 'baseline', SUBTASK_METRICS,
+                              len(os.listdir(args['<test_set_folder>'])), kept_results)
+
+    print_scores(aggregator.macro_average())
+
+    print '\n\nMicro average:\n=========\n'
+    print_scores(aggregator.micro_average())
 
-    val_folder = args['<val_set_folder>']
-    test_folder = args['<test_set_folder>']
+    if num_samples > 0:
+        print_confidence_intervals(SUBTASK_METRICS, aggregator, [result['scores'] for result in kept_results],
+                                   [result['counts'] for result in kept_results], num_samples,
+                                   float(args['--confidence']), int(args['--seed']))
+
+    print_report()
+
+
+def story_baselines(val_folder, test_folder, task_names=None, shard=None, stories_file=None, pos_tags_dir=None):
+    """
+    Runs the baseline systems (tuned on the validation set) on each test story of the shard
+    :param val_folder: the validation set folder
+    :param test_folder: the test set folder
+    :param task_names: the names of the tasks to run (default: all the tasks)
+    :param shard: a hash range shard of the test stories, as '<i>/<n>' (default: all the test stories)
+    :param stories_file: a file listing the file names of the test stories to evaluate (default: all)
+    :param pos_tags_dir: the directory of the persisted POS tags (default: not persisted)
+    :return: a generator of the results of the test stories (see shards.story_result), as each story finishes
+    """
+
+    # The test stories are evaluated in the order of their file names, which is the same on every machine
+    test_files = sorted(os.listdir(test_folder))
+    stories = select_stories(test_files, shard, stories_file)
 
     # Load the annotation files to OKR objects
-    val_graphs = load_graphs_from_folder(val_folder)
-    test_graphs = load_graphs_from_folder(test_folder)
+    test_graphs = [load_graph_from_file(test_folder + '/' + test_files[story]) for story in stories]
 
-    # Run the entity mentions component and evaluate them
-    ent_score = evaluate_entity_mention(test_graphs)
-    print 'Entity mentions: %.3f' % ent_score
+    if pos_tags_dir is not None:
+        for test_graph in test_graphs:
+            load_or_tag(test_graph, pos_tags_dir)
 
-    # Run the entity coreference component and evaluate them
-    ent_muc, ent_b_cube, ent_ceaf_c, ent_mela = evaluate_entity_coref(test_graphs)
-    print 'Entity coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (ent_muc, ent_b_cube, ent_ceaf_c, ent_mela)
+    resources = BaselineResources(val_folder)
 
-    # Load a common proposition extraction model
-    logging.debug('Loading proposition extraction module')
-    prop_ex = prop_extraction()
+    for story, test_graph in zip(stories, test_graphs):
+        scores, counts = compute_baseline(test_graph, resources, task_names)
+        yield story_result(story, [test_graph.name], scores, counts)
 
-    # Run the predicate mentions component and evaluate them
-    pred_score = evaluate_predicate_mention(test_graphs, prop_ex, './nominalizations/nominalizations.reuters.txt')
-    print 'Predicate mentions(full): %.3f' % pred_score
 
-    # Split the predicate mentions into verbal and non-verbal and evaluate performance
-    pred_verbal_score = evaluate_predicate_mention_verbal(test_graphs, prop_ex)
-    print 'Predicate mentions(verbal): %.3f' % pred_verbal_score
+def print_scores(scores):
+    """
+    Print the baseline scores
+    :param scores: the scores, in the order of SUBTASK_METRICS
+    """
+    ent_score, ent_muc, ent_b_cube, ent_ceaf_c, ent_mela, \
+    pred_score, pred_verbal_score, pred_non_verbal_score, pred_muc, pred_b_cube, pred_ceaf_c, pred_mela, \
+    arg_score, muc, b_cube, ceaf_c, mela, entities_f1, propositions_f1 = list(scores)
 
-    pred_non_verbal_score = evaluate_predicate_mention_non_verbal(test_graphs, prop_ex,
-                                                                  './nominalizations/nominalizations.reuters.txt')
+    print 'Entity mentions: %.3f' % ent_score
+    print 'Entity coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (ent_muc, ent_b_cube, ent_ceaf_c, ent_mela)
+    print 'Predicate mentions(full): %.3f' % pred_score
+    print 'Predicate mentions(verbal): %.3f' % pred_verbal_score
     print 'Predicate mentions(non-verbal): %.3f' % pred_non_verbal_score
-
-    # Run the entity predicate component and evaluate them
-    macro_score = evaluate_predicate_coref(test_graphs)
-    pred_muc, pred_b_cube, pred_ceaf_c, pred_mela = macro_score
     print 'Predicate coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % \
           (pred_muc, pred_b_cube, pred_ceaf_c, pred_mela)
+    print 'Argument mentions: %.3f' % arg_score
+    print 'Argument coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (muc, b_cube, ceaf_c, mela)
+    print 'Entailment graph F1: entities=%.3f, propositions=%.3f' % (entities_f1, propositions_f1)
 
-    # Run the argument mentions component and evaluate them.
-    score = evaluate_argument_mention(test_graphs, 1)
-    print 'Argument mentions: %.3f' % score
 
-    # Compute coreference scores for alignment between arguments of the same propositions
-    muc, b_cube, ceaf_c, mela = evaluate_argument_coref(test_graphs)
-    print 'Argument coreference: MUC=%.3f, B^3=%.3f, CEAF_C=%.3f, MELA=%.3f' % (muc, b_cube, ceaf_c, mela)
+def compute_baseline(test_graph, resources, task_names=None):
+    """
+    Runs the baseline systems on a single test graph and computes the task-level evaluation metrics:
+    1) Entity mentions
+    2) Entity coreference
+    3) Predicate mentions
+    4) Predicate coreference
+    5) Argument mention within predicate chains
+    6) Entailment graph
+    :param test_graph: the gold standard OKR graph
+    :param resources: the BaselineResources
+    :param task_names: the names of the tasks to run (default: all the tasks)
+    :return: the scores of the test graph, in the same order as the agreement scores (NaN for metrics of tasks
+    that were not selected), and a dictionary of metric name to its micro counts
+    """
+    scores, counts = {}, {}
 
-    # Run the predicate, entities and arguments entailment components and evaluate them
-    entities_f1, propositions_f1 = evaluate_entailment(val_graphs, test_graphs)
-    print 'Entailment graph F1: entities=%.3f, propositions=%.3f' % (entities_f1, propositions_f1)
+    for name in task_names or TASK_NAMES:
+        with section('baseline ' + name):
+            task_scores, task_counts = TASKS_BY_NAME[name].evaluate(test_graph, resources)
+
+        scores.update(task_scores)
+        counts.update(task_counts)
+
+    return [scores.get(name, np.nan) for name in SUBTASK_METRICS], counts
+
+
+def entity_mention_task(test_graph, resources):
+    """
+    Run the entity mentions component and evaluate it
+    """
+    from eval_entity_mention import evaluate_entity_mention_graph
+    score, _, _, counts = evaluate_entity_mention_graph(test_graph)
+    return {'Entity mentions': score}, {'Entity mentions': counts}
+
+
+def entity_coref_task(test_graph, resources):
+    """
+    Run the entity coreference component and evaluate it
+    """
+    from eval_entity_coref import evaluate_entity_coref_graph
+    return coref_results('Entity coreference', *evaluate_entity_coref_graph(test_graph))
+
+
+def predicate_mention_task(test_graph, resources):
+    """
+    Run the predicate mentions component and evaluate it
+    """
+    from eval_predicate_mention import evaluate_predicate_mention_graph
+    score, counts = evaluate_predicate_mention_graph(test_graph, resources.get_prop_ex(), NOM_FILE)
+    return {'Predicate mentions': score}, {'Predicate mentions': counts}
+
+
+def predicate_mention_verbal_task(test_graph, resources):
+    """
+    Run the predicate mentions component and evaluate it on the verbal predicates
+    """
+    from eval_predicate_mention import evaluate_predicate_mention_verbal_graph
+    score, counts = evaluate_predicate_mention_verbal_graph(test_graph, resources.get_prop_ex())
+    return {'Predicate mentions verbal': score}, {'Predicate mentions verbal': counts}
+
+
+def predicate_mention_non_verbal_task(test_graph, resources):
+    """
+    Run the predicate mentions component and evaluate it on the non-verbal predicates
+    """
+    from eval_predicate_mention import evaluate_predicate_mention_non_verbal_graph
+    score, counts = evaluate_predicate_mention_non_verbal_graph(test_graph, resources.get_prop_ex(), NOM_FILE)
+    return {'Predicate mentions non-verbal': score}, {'Predicate mentions non-verbal': counts}
+
+
+def predicate_coref_task(test_graph, resources):
+    """
+    Run the predicate coreference component and evaluate it
+    """
+    from eval_predicate_coref import evaluate_predicate_coref_graph
+    return coref_results('Predicate coreference', *evaluate_predicate_coref_graph(test_graph, resources.get_parser()))
+
+
+def argument_mention_task(test_graph, resources):
+    """
+    Run the argument mentions component and evaluate it
+    """
+    from eval_argument_mention import evaluate_argument_mention_graph
+    score, counts = evaluate_argument_mention_graph(test_graph, 1)
+    return {'Argument mentions': score}, {'Argument mentions': counts}
+
+
+def argument_coref_task(test_graph, resources):
+    """
+    Compute coreference scores for alignment between arguments of the same propositions
+    """
+    from eval_argument_coref import evaluate_argument_coref_graph
+    return coref_results('Argument coreference', *evaluate_argument_coref_graph(test_graph))
+
+
+def entailment_graph_task(test_graph, resources):
+    """
+    Run the entities and predicates entailment components and evaluate them
+    """
+    from eval_entailment_graph import evaluate_entity_entailment_graph, evaluate_predicate_entailment_graph
+
+    with section('baseline entity entailment'):
+        entities_f1, entities_counts = evaluate_entity_entailment_graph(resources.get_entity_entailment(),
+                                                                        test_graph)
+
+    with section('baseline predicate entailment'):
+        propositions_f1, propositions_counts = evaluate_predicate_entailment_graph(
+            resources.get_predicate_entailment(), test_graph)
+
+    return {'Entailment graph entities F1': entities_f1, 'Entailment graph propositions F1': propositions_f1}, \
+           {'Entailment graph entities F1': entities_counts, 'Entailment graph propositions F1': propositions_counts}
+
+
+def coref_results(subtask, scores, counts):
+    """
+    Returns the results of a coreference task
+    :param subtask: the subtask name, e.g. 'Entity coreference'
+    :param scores: the MUC, B-CUBED, CEAF and MELA scores
+    :param counts: the micro counts of MUC, B-CUBED and CEAF
+    :return: a dictionary of metric name to score, and a dictionary of metric name to micro counts
+    """
+    return {subtask + ' ' + metric: score for metric, score in zip(['MUC', 'B^3', 'CEAF_C', 'MELA'], scores)}, \
+           coref_counts_by_metric(subtask, counts)
+
+
+# The baseline tasks, in the order of the scores (the same names as the agreement stages)
+TASKS = [Task('entity_mentions', entity_mention_task),
+         Task('entity_coref', entity_coref_task),
+         Task('predicate_mentions', predicate_mention_task),
+         Task('predicate_mentions_verbal', predicate_mention_verbal_task),
+         Task('predicate_mentions_non_verbal', predicate_mention_non_verbal_task),
+         Task('predicate_coref', predicate_coref_task),
+         Task('argument_mentions', argument_mention_task),
+         Task('argument_coref', argument_coref_task),
+         Task('entailment_graph', entailment_graph_task)]
+
+TASK_NAMES = [task.name for task in TASKS]
+TASKS_BY_NAME = {task.name: task for task in TASKS}
+
+
+def parse_tasks(tasks):
+    """
+    Parse the task selection
+    :param tasks: comma separated task names, or 'all'
+    :return: the names of the selected tasks, in the order of the scores
+    """
+    if tasks == 'all':
+        return TASK_NAMES
+
+    selected = set([task.strip() for task in tasks.split(',')])
+    unknown = selected.difference(TASK_NAMES)
+    if len(unknown) > 0:
+        raise ValueError('Unknown tasks: %s. The tasks are: %s' % (', '.join(sorted(unknown)), ', '.join(TASK_NAMES)))
+
+    return [name for name in TASK_NAMES if name in selected]
+
+
+class BaselineResources:
+    """
+    The resources shared by the baseline tasks, each loaded the first time a task needs it
+    """
+
+    def __init__(self, val_folder):
+        self.val_folder = val_folder
+        self.val_graphs = None
+        self.prop_ex = None
+        self.parser = None
+        self.ent_ent = None
+        self.pred_ent = None
+
+    def get_val_graphs(self):
+        """
+        Returns the validation set graphs, used to tune the entailment components
+        """
+        if self.val_graphs is None:
+            self.val_graphs = load_graphs_from_folder(self.val_folder)
+
+        return self.val_graphs
+
+    def get_prop_ex(self):
+        """
+        Returns the common proposition extraction model
+        """
+        if self.prop_ex is None:
+            logging.debug('Loading proposition extraction module')
+            from prop_extraction import prop_extraction
+            self.prop_ex = prop_extraction()
+
+        return self.prop_ex
+
+    def get_parser(self):
+        """
+        Returns the spacy wrapper object
+        """
+        if self.parser is None:
+            from parsers.spacy_wrapper import spacy_wrapper
+            self.parser = spacy_wrapper()
+
+        return self.parser
+
+    def get_entity_entailment(self):
+        """
+        Returns the entity entailment finder, tuned on the validation set
+        """
+        if self.ent_ent is None:
+            from eval_entailment_graph import tune_entity_entailment
+            self.ent_ent = tune_entity_entailment(self.get_val_graphs())
+
+        return self.ent_ent
+
+    def get_predicate_entailment(self):
+        """
+        Returns the predicate entailment finder, tuned on the validation set
+        """
+        if self.pred_ent is None:
+            from eval_entailment_graph import tune_predicate_entailment
+            self.pred_ent = tune_predicate_entailment(self.get_val_graphs())
+
+        return self.pred_ent
 
 
 if __name__ == '__main__':
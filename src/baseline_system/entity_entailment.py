@@ -1,5 +1,8 @@
+import sys
 import bsddb
+sys.path.append('../common')
 
+from profiling import profiled
 from num2words import num2words
 
 """
@@ -61,6 +64,7 @@ class EntityEntailmentBaseline:
         """
         self.ngram_threshold = threshold
 
+    @profiled()
     def is_entailing(self, entity1, entity2):
         """
         Check whether the first entity entails the second
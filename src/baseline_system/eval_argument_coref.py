@@ -13,6 +13,7 @@ from okr import *
 from entity_coref import *
 from eval_entity_coref import *
 from clustering_common import cluster_mentions
+from argument_coref import get_argument_clusters
 
 
 def evaluate_argument_coref(test_graphs):
@@ -21,27 +22,30 @@ def evaluate_argument_coref(test_graphs):
     :param test_graphs: the OKR test graphs
     :return: the coreference scores: MUC, B-CUBED, CEAF and MELA (CoNLL F1).
     """
-    scores = []
-
-    for graph in test_graphs:
+    scores = [evaluate_argument_coref_graph(graph)[0] for graph in test_graphs]
+    scores = np.mean(scores, axis=0).tolist()
 
-        arg_clustering = {}
-        for prop_id, prop in graph.propositions.iteritems():
+    return scores
 
-            # Cluster the arguments
-            all_args = [arg for mention in prop.mentions.values() for arg in mention.argument_mentions.values()]
-            score = lambda mention, cluster : same_entity(cluster, mention, graph)
-            clusters = cluster_mentions(all_args, score)
-            clusters = [set([str(mention) for mention in cluster]) for cluster in clusters]
-            arg_clustering[prop_id] = clusters
 
-        # Evaluate
-        curr_scores = eval_clusters(graph, arg_clustering)
-        scores.append(curr_scores)
+def evaluate_argument_coref_graph(graph):
+    """
+    Receives a single OKR test graph and evaluates it for argument coreference
+    :param graph: the OKR test graph
+    :return: the coreference scores: MUC, B-CUBED, CEAF and MELA (CoNLL F1), and the micro counts
+    """
+    arg_clustering = {}
+    for prop_id, prop in graph.propositions.iteritems():
 
-    scores = np.mean(scores, axis=0).tolist()
+        # Cluster the arguments
+        all_args = [arg for mention in prop.mentions.values() for arg in mention.argument_mentions.values()]
+        score = lambda mention, cluster : same_entity(cluster, mention, graph)
+        clusters = cluster_mentions(all_args, score)
+        clusters = [set([str(mention) for mention in cluster]) for cluster in clusters]
+        arg_clustering[prop_id] = clusters
 
-    return scores
+    # Evaluate
+    return eval_clusters(graph, arg_clustering)
 
 
 def eval_clusters(gold, arg_clustering):
@@ -51,28 +55,18 @@ def eval_clusters(gold, arg_clustering):
     :param gold: the gold standard OKR graph
     :param arg_clusters: predicted argument clustering - as a dictionary of
     proposition_id:argument_clusters (list of sets)
-    :return: MUC, B-CUBED, CEAF and MELA scores.
+    :return: MUC, B-CUBED, CEAF and MELA scores, and the micro counts of MUC, B-CUBED and CEAF, summed over
+    the propositions
     """
 
-    # Get argument mentions
-    gold_arg_mentions_dicts = { prop_id : [{ m_id : str(mention)
-                                               for m_id, mention in mention.argument_mentions.iteritems()}
-                                             for mention in prop.mentions.values()]
-                                  for prop_id, prop in gold.propositions.iteritems() }
-
     # Clusters of arguments per proposition
-    gold_arg_mentions = { p_id : [set([mention_dict[str(arg_num)]
-                                         for mention_dict in mention_lst if str(arg_num) in mention_dict])
-                                    for arg_num in range(0, 10)]
-                            for p_id, mention_lst in gold_arg_mentions_dicts.iteritems()}
-
-    # Remove empty arguments
-    gold_arg_mentions = {k: [s for s in v if len(s) > 0] for k, v in gold_arg_mentions.iteritems()}
+    gold_arg_mentions = get_argument_clusters(gold)
 
     pred_arg_mentions = arg_clustering
 
     # Within each proposition, compute coreference scores:
     scores = []
+    counts = np.zeros((3, 1, 4))
 
     for prop_id in gold.propositions.keys():
 
@@ -86,14 +80,13 @@ def eval_clusters(gold, arg_clustering):
         if len(gold_arg_mentions[prop_id]) == 0 or len(pred_arg_mentions[prop_id]) == 0:
             continue
 
-        muc1, bcubed1, ceaf1 = muc(gold_arg_mentions[prop_id], pred_arg_mentions[prop_id]), \
-                           bcubed(gold_arg_mentions[prop_id], pred_arg_mentions[prop_id]), \
-                           ceaf(gold_arg_mentions[prop_id], pred_arg_mentions[prop_id])
+        muc1, bcubed1, ceaf1, prop_counts = coref_scores(gold_arg_mentions[prop_id], pred_arg_mentions[prop_id])
         mela1 = np.mean([muc1, bcubed1, ceaf1])
 
         scores.append([muc1, bcubed1, ceaf1, mela1])
+        counts[:, 0, :] += prop_counts
 
-    return np.mean(scores, axis=0).tolist()
+    return np.mean(scores, axis=0).tolist(), counts
 
 
 def same_entity(cluster, argument, graph):
@@ -23,9 +23,19 @@ def evaluate_argument_mention(test_graphs, threshold):
     :param threshold: the distance to the predicate under which components are considered argument mentions
     :return performance of argument mentions on a list of graphs
     """
-    pred_graphs = [predict_argument_mention(test_graph, threshold) for test_graph in test_graphs]
-    return np.mean([compute_argument_mention_agreement(test_graph, pred_graph)[0]
-                    for test_graph, pred_graph in zip(test_graphs, pred_graphs)])
+    return np.mean([evaluate_argument_mention_graph(test_graph, threshold)[0] for test_graph in test_graphs])
+
+
+def evaluate_argument_mention_graph(test_graph, threshold):
+    """
+    Compute performance of argument mentions on a single graph.
+    :param test_graph: the OKR graph
+    :param threshold: the distance to the predicate under which components are considered argument mentions
+    :return performance of argument mentions on the graph, and its micro counts
+    """
+    pred_graph = predict_argument_mention(test_graph, threshold)
+    score, _, _, counts = compute_argument_mention_agreement(test_graph, pred_graph)
+    return score, counts
 
 
 def predict_argument_mention(test_graph, threshold):
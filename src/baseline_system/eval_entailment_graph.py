@@ -38,6 +38,16 @@ def evaluate_predicate_entailment(val_graphs, test_graphs):
     :param test_graphs: the gold standard annotations for the test set
     :return: the predicate entailment F1 score
     """
+    pred_ent = tune_predicate_entailment(val_graphs)
+    return np.mean([evaluate_predicate_entailment_graph(pred_ent, test_graph)[0] for test_graph in test_graphs])
+
+
+def tune_predicate_entailment(val_graphs):
+    """
+    Load the predicate entailment resource and tune its threshold on the validation set
+    :param val_graphs: the gold standard annotations for the validation set
+    :return: the predicate entailment finder, set to the best threshold
+    """
 
     # Load the resource for predicate entailment
     print 'Loading predicate entailment resource...'
@@ -66,12 +76,19 @@ def evaluate_predicate_entailment(val_graphs, test_graphs):
     print 'best threshold for predicate entailment: %.3f' % best_threshold
     pred_ent.set_threshold(best_threshold)
 
-    propositions_f1_scores = []
-    for test_graph in test_graphs:
-        test_pred = predict_predicate_entailment(pred_ent, test_graph)
-        propositions_f1_scores.append(compute_predicate_f1(test_graph, test_pred))
+    return pred_ent
 
-    return np.mean(propositions_f1_scores)
+
+def evaluate_predicate_entailment_graph(pred_ent, test_graph):
+    """
+    Evaluation for the predicate entailment graph of a single test graph
+    :param pred_ent: the predicate entailment finder
+    :param test_graph: the gold standard annotations for the test graph
+    :return: the predicate entailment F1 score, and its micro counts
+    """
+    test_pred = predict_predicate_entailment(pred_ent, test_graph)
+    counts = compute_predicate_counts(test_graph, test_pred)
+    return mean_entailment_f1(counts), entailment_micro_counts(counts)[np.newaxis, :]
 
 
 def predict_predicate_entailment(pred_ent, gold):
@@ -102,6 +119,16 @@ def evaluate_entity_entailment(val_graphs, test_graphs):
     :param test_graphs: the gold standard annotations for the test set
     :return: the entity entailment F1 score
     """
+    ent_ent = tune_entity_entailment(val_graphs)
+    return np.mean([evaluate_entity_entailment_graph(ent_ent, test_graph)[0] for test_graph in test_graphs])
+
+
+def tune_entity_entailment(val_graphs):
+    """
+    Load the entity entailment resources and tune their thresholds on the validation set
+    :param val_graphs: the gold standard annotations for the validation set
+    :return: the entity entailment finder, set to the best thresholds
+    """
 
     # Load the resource for entity entailment
     print 'Loading entity entailment resource...'
@@ -137,13 +164,19 @@ def evaluate_entity_entailment(val_graphs, test_graphs):
     ent_ent.set_unigram_threshold(best_unigram_threshold)
     ent_ent.set_ngram_threshold(best_ngram_threshold)
 
-    entity_f1_scores = []
+    return ent_ent
 
-    for test_graph in test_graphs:
-        test_pred = predict_entity_entailment(ent_ent, test_graph)
-        entity_f1_scores.append(compute_entities_f1(test_graph, test_pred))
 
-    return np.mean(entity_f1_scores)
+def evaluate_entity_entailment_graph(ent_ent, test_graph):
+    """
+    Evaluation for the entity entailment graph of a single test graph
+    :param ent_ent: the entity entailment finder
+    :param test_graph: the gold standard annotations for the test graph
+    :return: the entity entailment F1 score, and its micro counts
+    """
+    test_pred = predict_entity_entailment(ent_ent, test_graph)
+    counts = compute_entities_counts(test_graph, test_pred)
+    return mean_entailment_f1(counts), entailment_micro_counts(counts)[np.newaxis, :]
 
 
 def predict_entity_entailment(ent_ent, gold):
@@ -7,32 +7,42 @@ Author: Rachel Wities
 """
 
 import sys
+import itertools
 
+sys.path.append('../common')
 sys.path.append('../agreement')
 
-import spacy
 import numpy as np
 
 from munkres import *
 from entity_coref import *
 from fuzzywuzzy import fuzz
-from spacy.en import English
+from profiling import profiled
+from annotation_cache import get_stop_words
 from num2words import num2words
 from nltk.corpus import wordnet as wn
-from clustering_common import cluster_mentions
-
-# Don't use spacy tokenizer, because we originally used NLTK to tokenize the files and they are already tokenized
-nlp = spacy.load('en')
+from collections import Counter, defaultdict
+from fuzzy_matching import ratio_at_least, partial_ratio_is_100
+from clustering_common import cluster_mentions, SimilarityScorer, Blocker
+
+# Mentions at least this long share a key with all the long mentions: the partial ratio of two mentions is 100
+# only if the shorter one is a substring of the longer one (and then they share a token) if it is shorter than that
+LONG_MENTION = 50
+
+# Bounds on the similarity of mentions with a fuzzy ratio >= 85 (rounded, so at least 0.845), slightly loosened
+# against rounding errors: the longest common subsequence is at least MIN_LCS * (total length)
+MIN_LCS = 0.42
+
+# Align the words of multi-word mentions by their synonyms in partial_match. The alignment was originally computed by
+# Munkres, and its average score was read from the cost matrix after Munkres.compute, which reduces the (NumPy)
+# matrix in place, leaving zeros in the assignment. The average was therefore always 0 and multi-word mentions were
+# never aligned. The reported baseline scores were computed this way, so the alignment is disabled by default.
+ALIGN_WORDS = False
+MIN_ALIGNMENT_SCORE = 0.75  # The minimal average score of the alignment of the words
+MAX_PERMUTATION_SIZE = 4  # Alignments of up to this number of words are enumerated instead of solved by Munkres
 
 def is_stop(w):
-	return w in spacy.en.STOP_WORDS
-
-
-def replace_tokenizer(nlp):
-    old_tokenizer = nlp.tokenizer
-    nlp.tokenizer = lambda string: old_tokenizer.tokens_from_list(string.split())
-
-replace_tokenizer(nlp)
+	return w in get_stop_words()
 
 
 def evaluate_entity_coref(test_graphs):
@@ -41,23 +51,50 @@ def evaluate_entity_coref(test_graphs):
     :param test_graphs: the OKR test graphs
     :return: the coreference scores: MUC, B-CUBED, CEAF and MELA (CoNLL F1).
     """
-    scores = []
+    scores = [evaluate_entity_coref_graph(graph)[0] for graph in test_graphs]
+    scores = np.mean(scores, axis=0).tolist()
 
-    for graph in test_graphs:
+    return scores
 
-        # Cluster the entities
-        entities = [(str(mention), unicode(mention.terms)) for entity in graph.entities.values() for mention in
-                    entity.mentions.values()]
-        clusters = cluster_mentions(entities, score)
-        clusters = [set([item[0] for item in cluster]) for cluster in clusters]
 
-        # Evaluate
-        curr_scores = eval_clusters(clusters, graph)
-        scores.append(curr_scores)
+def evaluate_entity_coref_graph(graph, blocking=True):
+    """
+    Receives a single OKR test graph and evaluates it for entity coreference
+    :param graph: the OKR test graph
+    :param blocking: whether to score each mention only against the clusters with mentions that may be
+    similar to it (see EntityBlocker). The clusters are the same.
+    :return: the coreference scores: MUC, B-CUBED, CEAF and MELA (CoNLL F1), and the micro counts
+    """
 
-    scores = np.mean(scores, axis=0).tolist()
+    # Cluster the entities
+    clusters = cluster_entity_mentions(graph, blocking)
 
-    return scores
+    # Evaluate
+    return eval_clusters(clusters, graph)
+
+
+def cluster_entity_mentions(graph, blocking=True):
+    """
+    Cluster the entity mentions of the graph by their lexical similarity
+    :param graph: the OKR graph
+    :param blocking: whether to score each mention only against the clusters with mentions that may be
+    similar to it (see EntityBlocker)
+    :return: the clusters of mention IDs
+    """
+    entities = [(str(mention), unicode(mention.terms)) for entity in graph.entities.values() for mention in
+                entity.mentions.values()]
+
+    # Compute the features of each distinct mention terms once
+    features = get_mention_features([terms for _, terms in entities])
+
+    # (the score is computed from the distinct terms in each cluster, comparing the mention to each of them once,
+    # in batches)
+    scorer = SimilarityScorer(lambda mention: mention[1], lambda x, y: similar_words(features[x], features[y]),
+                              lambda xs, y: similar_words_batch([features[x] for x in xs], features[y]))
+    blocker = EntityBlocker(features) if blocking else None
+    clusters = cluster_mentions(entities, scorer, blocker)
+
+    return [set([item[0] for item in cluster]) for cluster in clusters]
 
 
 def eval_clusters(clusters, graph):
@@ -66,111 +103,444 @@ def eval_clusters(clusters, graph):
     coreferences
     :param clusters: the predicted clusters
     :param graph: the gold standard graph
-    :return: the predicate coreference metrics and the number of singletons
+    :return: the entity coreference metrics, and their micro counts (see entity_coref.coref_scores)
     """
     graph1_ent_mentions = [set(map(str, entity.mentions.values())) for entity in graph.entities.values()]
     graph2_ent_mentions = clusters
 
     # Evaluate
-    muc1, bcubed1, ceaf1 = muc(graph1_ent_mentions, graph2_ent_mentions), \
-                           bcubed(graph1_ent_mentions, graph2_ent_mentions), \
-                           ceaf(graph1_ent_mentions, graph2_ent_mentions)
+    muc1, bcubed1, ceaf1, counts = coref_scores(graph1_ent_mentions, graph2_ent_mentions)
 
     mela1 = np.mean([muc1, bcubed1, ceaf1])
-    return np.array([muc1, bcubed1, ceaf1, mela1])
+    return np.array([muc1, bcubed1, ceaf1, mela1]), counts[:, np.newaxis, :]
+
+
+class MentionFeatures:
+    """
+    The features of an entity mention used by the similarity functions, computed once for each mention
+    rather than for each pair of mentions
+    """
+
+    def __init__(self, text, synonyms_cache=None):
+        """
+        :param text: the mention terms
+        :param synonyms_cache: dictionary of string to its synonyms, shared by the mentions of a graph
+        """
+        if synonyms_cache is None:
+            synonyms_cache = {}
+
+        self.text = text
+
+        # The WordNet synonyms of the mention, and the words of the mention (without stop words) and their
+        # synonyms. The synonyms are stored without stop words, which are ignored in the intersections.
+        self.synonyms = get_synonyms(text, synonyms_cache)
+        self.words = [w for w in text.split() if not is_stop(w)]
+        self.word_synonyms = [get_synonyms(w, synonyms_cache) for w in self.words]
+
+        self.numbers_as_words = None
+
+    def get_numbers_as_words(self):
+        """
+        Returns the mention with the numbers converted to words (converted the first time it is needed)
+        """
+        if self.numbers_as_words is None:
+            self.numbers_as_words = ' '.join([num2words(int(w)).replace('-', ' ') if w.isdigit() else w
+                                              for w in self.text.split()])
+
+        return self.numbers_as_words
+
+
+def get_mention_features(terms_list):
+    """
+    Returns the features of each distinct mention terms
+    :param terms_list: the terms of the mentions
+    :return: dictionary of terms to their features (see MentionFeatures)
+    """
+    synonyms_cache = {}
+    return {terms: MentionFeatures(terms, synonyms_cache) for terms in set(terms_list)}
+
+
+def get_synonyms(w, synonyms_cache):
+    """
+    Returns the WordNet synonyms of a string, without stop words
+    :param w: the string
+    :param synonyms_cache: dictionary of string to its synonyms
+    :return: the set of synonyms
+    """
+    if w not in synonyms_cache:
+        synonyms = set([lemma.lower().replace('_', ' ') for synset in wn.synsets(w) for lemma in synset.lemma_names()])
+        synonyms_cache[w] = set([synonym for synonym in synonyms if not is_stop(synonym)])
+
+    return synonyms_cache[w]
+
+
+class EntityBlocker(Blocker):
+    """
+    Candidate generation for the entity mentions, with a key for each way in which two mentions can be similar
+    (see similar_words), so the clusters are the same as without blocking:
+    1) WordNet synonyms of the mention (same_synset) and of its words (partial_match).
+    2) Tokens: the shorter of two mentions with a partial ratio of 100 is a substring of the longer one, so its
+    tokens are tokens of the longer one.
+    3) Character bigrams (fuzzy_fit): two strings with a fuzzy ratio >= 85 have similar lengths and a long common
+    subsequence, so they share many bigrams. Since common bigrams are not enough, the candidates are the strings
+    that share more bigrams than the bound of their lengths (see is_fuzzy_candidate). Common bigrams such as "e "
+    are in almost every string, so the strings are indexed by a prefix filter: the bigrams of each string are
+    ordered from the rarest (over all the mentions), and two strings that share at least T bigrams share one of
+    the first (number of bigrams - T + 1) bigrams of each. Only these prefixes are indexed, by the length of the
+    string, and a mention looks up only the lengths that may be similar to its own.
+    Mentions without tokens (which may have a partial ratio of 100 with any mention with consecutive spaces) are
+    not blocked.
+    """
+
+    def __init__(self, features):
+        """
+        :param features: dictionary of mention terms to their features (see MentionFeatures)
+        """
+        Blocker.__init__(self, self.get_keys)
+        self.features = features
+        self.keys_cache = {}  # Dictionary of mention terms to their keys
+        self.prefixes = defaultdict(list)  # Dictionary of (length, bigram) to the indexed strings with it in the prefix
+        self.string_clusters = defaultdict(set)  # Dictionary of indexed string to the clusters of its mentions
+        self.string_bigrams = {}  # Dictionary of string to its bigrams (Counter), ordered bigrams and length
+
+        # The bigrams (with their occurrence number, so that repeated bigrams are counted) are ordered by the
+        # number of strings of all the mentions that contain them
+        frequency = Counter()
+        strings = set([string for x in features.values() for string in get_fuzzy_strings(x)])
+        for string in strings:
+            frequency.update(bigram_occurrences(string))
+
+        self.order = { bigram : (count, bigram) for bigram, count in frequency.iteritems() }
+
+    def get_keys(self, mention):
+        """
+        Returns the synonym and token keys of the mention, or None if it has no tokens
+        :param mention: the mention (ID, terms)
+        """
+        terms = mention[1]
+
+        if terms not in self.keys_cache:
+            x = self.features[terms]
+            tokens = x.text.split()
+
+            if len(tokens) == 0:
+                keys = None
+            else:
+                keys = set([('synonym', synonym) for synonym in x.synonyms] +
+                           [('word_synonym', synonym) for synonyms in x.word_synonyms for synonym in synonyms] +
+                           [('token', token) for token in tokens])
+
+                if len(x.text) >= LONG_MENTION:
+                    keys.add(('long',))
+
+            self.keys_cache[terms] = keys
+
+        return self.keys_cache[terms]
+
+    def candidates(self, mention):
+        """
+        Returns the candidate clusters of the mention: the clusters of mentions that share a key with it, or with
+        a fuzzy string that may be similar to one of its fuzzy strings
+        :param mention: the mention (ID, terms)
+        :return: the indices of the clusters, in the order in which they were created
+        """
+        if self.get_keys(mention) is None:
+            return Blocker.candidates(self, mention)
+
+        candidates = set(Blocker.candidates(self, mention))
+
+        for string in get_fuzzy_strings(self.features[mention[1]]):
+            bigrams, ordered, length = self.get_string_bigrams(string)
+            others = set()
+
+            # The strings of each possible length that share a bigram of the prefixes
+            for other_length in similar_lengths(length):
+                prefix_length = len(ordered) - int(np.ceil(min_common_bigrams(length, other_length))) + 1
+                for bigram in ordered[:prefix_length]:
+                    others.update(self.prefixes.get((other_length, bigram), ()))
+
+            for other in others:
+                other_bigrams = self.string_bigrams[other][0]
+                num_common = sum([min(count, other_bigrams[bigram]) for bigram, count in bigrams.iteritems()
+                                  if bigram in other_bigrams])
+
+                if is_fuzzy_candidate(length, len(other), num_common):
+                    candidates.update(self.string_clusters[other])
+
+        return sorted(candidates)
+
+    def get_string_bigrams(self, string):
+        """
+        Returns the bigrams of a fuzzy string
+        :param string: the string
+        :return: the bigrams with their counts (Counter), the bigram occurrences ordered from the rarest (see
+        bigram_occurrences) and the string's length
+        """
+        if string not in self.string_bigrams:
+            ordered = sorted(bigram_occurrences(string), key=lambda bigram: self.order.get(bigram, (0, bigram)))
+            self.string_bigrams[string] = (Counter(get_bigrams(string)), ordered, len(string))
+
+        return self.string_bigrams[string]
+
+    def add(self, mention, cluster_index):
+        """
+        Index a mention that was added to a cluster
+        :param mention: the mention (ID, terms)
+        :param cluster_index: the index of the cluster
+        """
+        Blocker.add(self, mention, cluster_index)
+
+        if self.get_keys(mention) is None:
+            return
+
+        for string in get_fuzzy_strings(self.features[mention[1]]):
+            if string not in self.string_clusters:
+                _, ordered, length = self.get_string_bigrams(string)
+
+                # The longest prefix needed by the strings of any similar length
+                min_common = min([min_common_bigrams(length, other_length) for other_length in similar_lengths(length)])
+                for bigram in ordered[:len(ordered) - int(np.ceil(min_common)) + 1]:
+                    self.prefixes[(length, bigram)].append(string)
+
+            self.string_clusters[string].add(cluster_index)
+
+
+def get_fuzzy_strings(x):
+    """
+    Returns the strings compared by fuzzy_fit, lowercased (which only makes them more similar)
+    :param x: the mention features
+    :return: the set of strings
+    """
+    strings = set([x.text.lower()])
+
+    # The numbers are converted to words only if there are numbers (as in fuzzy_fit, the string is re-tokenized)
+    if any([w.isdigit() for w in x.text.split()]):
+        strings.add(x.get_numbers_as_words().lower())
+    else:
+        strings.add(' '.join(x.text.split()).lower())
+
+    return strings
+
+
+def get_bigrams(string):
+    """
+    Returns the character bigrams of the string, padded with a space on each side
+    :param string: the string
+    :return: the list of bigrams
+    """
+    padded = ' ' + string + ' '
+    return [padded[i:i + 2] for i in range(len(padded) - 1)]
+
+
+def bigram_occurrences(string):
+    """
+    Returns the padded bigrams of the string, each with its occurrence number in the string (e.g. the second
+    "e " is ("e ", 2)), so that the number of common occurrences of two strings is the number of common bigrams
+    with repetitions
+    :param string: the string
+    :return: the list of (bigram, occurrence number)
+    """
+    occurrences = Counter()
+    result = []
+
+    for bigram in get_bigrams(string):
+        occurrences[bigram] += 1
+        result.append((bigram, occurrences[bigram]))
+
+    return result
+
+
+def similar_lengths(length):
+    """
+    Returns the lengths of the strings that may have a fuzzy ratio >= 85 with a string of this length
+    (see is_fuzzy_candidate)
+    :param length: the string's length
+    """
+    return [other_length for other_length in range(int(length * MIN_LCS), int(length / MIN_LCS) + 1)
+            if min(length, other_length) >= MIN_LCS * (length + other_length)]
+
+
+def min_common_bigrams(length1, length2):
+    """
+    Returns the minimal number of common padded bigrams of two strings with a fuzzy ratio >= 85, given their lengths
+    (see is_fuzzy_candidate)
+    :param length1: the length of the first string
+    :param length2: the length of the second string
+    """
+    total = length1 + length2
+    max_distance = total - 2 * MIN_LCS * total
+
+    return max(length1, length2) + 1 - 2 * max_distance
 
 
-def score(mention, cluster):
+def is_fuzzy_candidate(length1, length2, num_common):
     """
-    Receives an entity mention (mention, head_lemma, head_pos)
-    and a cluster of entity mentions, and returns a numeric value denoting the
-    similarity between the mention to the cluster (% of similar head lemma mentions in the cluster)
-    :param mention: the mention
-    :param cluster: the cluster
-    :return: a numeric value denoting the similarity between the mention to the cluster
+    Returns whether two strings may have a fuzzy ratio >= 85, given their lengths and number of common bigrams.
+    The fuzzy ratio is at most 2 * LCS / (length1 + length2), where LCS is the length of their longest common
+    subsequence, so LCS >= MIN_LCS * (length1 + length2). The shorter string is at least as long as the LCS, and
+    each of the (length1 + length2 - 2 * LCS) insertions and deletions that transform one string into the other
+    removes at most two of its (length + 1) padded bigrams, and the rest are common.
+    :param length1: the length of the first string
+    :param length2: the length of the second string
+    :param num_common: the number of common padded bigrams (with repetitions)
     """
-    return len([other for other in cluster if similar_words(other[1], mention[1])]) / (1.0 * len(cluster))
+    return min(length1, length2) >= MIN_LCS * (length1 + length2) and \
+           num_common >= min_common_bigrams(length1, length2)
 
 
+def as_features(x):
+    """
+    Returns the features of a mention
+    :param x: the mention terms or features
+    :return: the mention features (see MentionFeatures)
+    """
+    return x if isinstance(x, MentionFeatures) else MentionFeatures(x)
+
+
+@profiled()
 def similar_words(x, y):
     """
     Returns whether x and y are similar
-    :param x: the first mention
-    :param y: the second mention
+    :param x: the first mention (terms or MentionFeatures)
+    :param y: the second mention (terms or MentionFeatures)
     :return: whether x and y are similar
     """
+    x, y = as_features(x), as_features(y)
     return same_synset(x, y) or fuzzy_fit(x, y) or partial_match(x, y)
 
 
+@profiled()
+def similar_words_batch(xs, y):
+    """
+    Returns whether each of xs is similar to y (as similar_words), comparing the strings of all of them
+    with y together
+    :param xs: the first mentions (MentionFeatures)
+    :param y: the second mention (MentionFeatures)
+    :return: a list of booleans
+    """
+    similar = [same_synset(x, y) for x in xs]
+
+    # Each test is applied to the mentions that didn't pass the previous tests, as in similar_words
+    for test in [fuzzy_ratio_batch, fuzzy_numbers_ratio_batch, partial_ratio_batch]:
+        undecided = [index for index, is_similar in enumerate(similar) if not is_similar]
+        if len(undecided) == 0:
+            break
+
+        for index, is_similar in zip(undecided, test([xs[index] for index in undecided], y)):
+            similar[index] = is_similar
+
+    return [is_similar or aligned_synonyms(x, y) for x, is_similar in zip(xs, similar)]
+
+
+def fuzzy_ratio_batch(xs, y):
+    """
+    Returns whether each of xs is similar to y in fuzzy string matching (the first test of fuzzy_fit)
+    """
+    return ratio_at_least([x.text for x in xs], y.text, 90)
+
+
+def fuzzy_numbers_ratio_batch(xs, y):
+    """
+    Returns whether each of xs is similar to y in fuzzy string matching with numbers converted to words
+    (the second test of fuzzy_fit)
+    """
+    return ratio_at_least([x.get_numbers_as_words() for x in xs], y.get_numbers_as_words(), 85)
+
+
+def partial_ratio_batch(xs, y):
+    """
+    Returns whether each of xs partially matches y (the first test of partial_match)
+    """
+    return partial_ratio_is_100([' ' + x.text + ' ' for x in xs], ' ' + y.text + ' ')
+
+
 def same_synset(x, y):
     """
     Returns whether x and y share a WordNet synset
-    :param x: the first mention
-    :param y: the second mention
+    :param x: the first mention features
+    :param y: the second mention features
     :return: whether x and y share a WordNet synset
     """
-    x_synonyms = set([lemma.lower().replace('_', ' ') for synset in wn.synsets(x) for lemma in synset.lemma_names()])
-    y_synonyms = set([lemma.lower().replace('_', ' ') for synset in wn.synsets(y) for lemma in synset.lemma_names()])
-
-    return len([w for w in x_synonyms.intersection(y_synonyms) if not is_stop(w)]) > 0
+    return not x.synonyms.isdisjoint(y.synonyms)
 
 
 def fuzzy_fit(x, y):
     """
     Returns whether x and y are similar in fuzzy string matching
-    :param x: the first mention
-    :param y: the second mention
+    :param x: the first mention features
+    :param y: the second mention features
     :return: whether x and y are similar in fuzzy string matching
     """
-    if fuzz.ratio(x, y) >= 90:
+    if fuzz.ratio(x.text, y.text) >= 90:
         return True
 
     # Convert numbers to words
-    x_words = [num2words(int(w)).replace('-', ' ') if w.isdigit() else w for w in x.split()]
-    y_words = [num2words(int(w)).replace('-', ' ') if w.isdigit() else w for w in y.split()]
-
-    return fuzz.ratio(' '.join(x_words), ' '.join(y_words)) >= 85
+    return fuzz.ratio(x.get_numbers_as_words(), y.get_numbers_as_words()) >= 85
 
 
 def partial_match(x, y):
     """
     Return whether these two mentions have a partial match in WordNet synset.
-    :param x: the first mention
-    :param y: the second mention
+    :param x: the first mention features
+    :param y: the second mention features
     :return: Whether they are aligned
     """
 
     # Allow partial matching
-    if fuzz.partial_ratio(' ' + x + ' ', ' ' + y + ' ') == 100:
+    if fuzz.partial_ratio(' ' + x.text + ' ', ' ' + y.text + ' ') == 100:
         return True
 
-    x_words = [w for w in x.split() if not is_stop(w)]
-    y_words = [w for w in y.split() if not is_stop(w)]
+    return aligned_synonyms(x, y)
+
 
-    if len(x_words) == 0 or len(y_words) == 0:
+def aligned_synonyms(x, y):
+    """
+    Return whether the words of these two mentions can be aligned by their WordNet synsets.
+    :param x: the first mention features
+    :param y: the second mention features
+    :return: Whether they are aligned
+    """
+    if len(x.words) == 0 or len(y.words) == 0:
         return False
 
-    x_synonyms = [set([lemma.lower().replace('_', ' ') for synset in wn.synsets(w) for lemma in synset.lemma_names()])
-                  for w in x_words]
-    y_synonyms = [set([lemma.lower().replace('_', ' ') for synset in wn.synsets(w) for lemma in synset.lemma_names()])
-                  for w in y_words]
+    x_synonyms, y_synonyms = x.word_synonyms, y.word_synonyms
 
     # One word - check whether there is intersection between synsets
-    if len(x_synonyms) == 1 and len(y_synonyms) == 1 and \
-                    len([w for w in x_synonyms[0].intersection(y_synonyms[0]) if not is_stop(w)]) > 0:
+    if len(x_synonyms) == 1 and len(y_synonyms) == 1 and not x_synonyms[0].isdisjoint(y_synonyms[0]):
         return True
 
-    # More than one word - align words from x with words from y
-    cost = -np.vstack([np.array([len([w for w in s1.intersection(s2) if not is_stop(w)]) for s1 in x_synonyms])
-                       for s2 in y_synonyms])
-    m = Munkres()
-    cost = pad_to_square(cost)
-    indices = m.compute(cost)
+    # More than one word - align words from x with words from y (see ALIGN_WORDS)
+    if not ALIGN_WORDS:
+        return False
 
-    # Compute the average score of the alignment
-    average_score = np.mean([-cost[row, col] for row, col in indices])
+    scores = np.vstack([np.array([len(s1.intersection(s2)) for s1 in x_synonyms]) for s2 in y_synonyms])
+    return alignment_at_least(scores, MIN_ALIGNMENT_SCORE)
 
-    if average_score >= 0.75:
-        return True
 
-    return False
+def alignment_at_least(scores, threshold):
+    """
+    Returns whether the best alignment of the rows and the columns (padded to a square matrix with zero scores)
+    has an average score of at least the threshold
+    :param scores: the score matrix
+    :param threshold: the minimal average score
+    :return: whether the average score of the best alignment is at least the threshold
+    """
+    scores = pad_to_square(scores)
+    size = scores.shape[0]
+    min_total = threshold * size
+
+    # Each row (and each column) is aligned to at most its best score
+    if min(scores.max(axis=0).sum(), scores.max(axis=1).sum()) < min_total:
+        return False
+
+    # Small alignments: enumerate the permutations until one is good enough
+    if size <= MAX_PERMUTATION_SIZE:
+        for permutation in itertools.permutations(range(size)):
+            if sum([scores[row, col] for row, col in enumerate(permutation)]) >= min_total:
+                return True
+
+        return False
+
+    # Munkres minimizes the cost (of a copy of the matrix)
+    indices = Munkres().compute((-scores).tolist())
+    return sum([scores[row, col] for row, col in indices]) >= min_total
@@ -12,26 +12,19 @@ sys.path.append('../common')
 import numpy as np
 
 from okr import *
-from spacy.en import English
 from nltk.corpus import wordnet as wn
+from spacy_models import DEFAULT, WHITESPACE
+from annotation_cache import annotate, annotate_sentence
 
 NOUNS = [u'NNP', u'NN', u'NNS', u'NNPS', u'CD', u'PRP', u'PRP$']
 ADJECTIVES = [u'JJ', u'JJR', u'JJS']
 VERBS = [u'VB', u'VBN', u'VBD', u'VBG', u'VBP']
 GET_ORIGINAL_SCORE=False #set to true to recieve originaly reported score of 0.58
-
-nom_file = 'nominalizations/nominalizations.reuters.txt'
-NOM_LIST = [line.split('\t')[0] for line in open(nom_file)]
-
+BATCH_SIZE = 1000  # The number of sentences parsed together by nlp.pipe
 
 
 # Don't use spacy tokenizer, because we originally used NLTK to tokenize the files and they are already tokenized
-nlp = English()
-def replace_tokenizer(nlp):
-    old_tokenizer = nlp.tokenizer
-    nlp.tokenizer = lambda string: old_tokenizer.tokens_from_list(string.split())
-if not GET_ORIGINAL_SCORE:
-    replace_tokenizer(nlp)
+TOKENIZER = DEFAULT if GET_ORIGINAL_SCORE else WHITESPACE
 
 #the old and ugly way to fix the fact that spacy tokenization is not similar to NLTK's:
 def fix_tokenization(string_):	
@@ -43,7 +36,7 @@ def evaluate_entity_mention_single(gold_entities_set, pred_graph):
     Receives the gold standard entity mentions and the predicted OKR graph and evaluates it for entity mentions.
     :param gold_entities_set: the gold standard entity mentions
     :param pred_graph: the predicted OKR graph
-    :return: F1, recall, and precision
+    :return: F1, recall, precision, and their micro counts
     """
     graph1_ent_mentions = set.union(*[set(map(str, entity.mentions.values()))
                                       for entity in pred_graph.entities.values()])
@@ -54,57 +47,89 @@ def evaluate_entity_mention_single(gold_entities_set, pred_graph):
     precision = len(consensual_mentions) * 1.0 / len(graph2_ent_mentions)
 
     f1 = 2.00 * (recall * precision) / (recall + precision) if (recall + precision) > 0.0 else 0.0
-    return f1, recall, precision
+    counts = np.array([[len(consensual_mentions), len(graph1_ent_mentions),
+                        len(consensual_mentions), len(graph2_ent_mentions)]])
+    return f1, recall, precision, counts
 
 
-def evaluate_entity_mention(test_graphs):
+def evaluate_entity_mention(test_graphs, batch_size=BATCH_SIZE):
     """
     Receives the predicted test graphs and the gold standard entity mentions for them and evaluates them
     for entity mentions.
     :param test_graphs: the predicted OKR graphs
+    :param batch_size: the number of sentences parsed together (the sentences of all the graphs are parsed
+    in a single stream)
     :return: F1, recall, and precision
     """
+    graph_docs = parse_sentences(test_graphs, batch_size)
+    scores = [evaluate_entity_mention_graph(graph, docs)[:3] for graph, docs in zip(test_graphs, graph_docs)]
 
+    # Return the average
+    score = np.mean(scores, axis=0)[0]
+    return score
 
-    scores = []
 
-    for graph in test_graphs:
+def evaluate_entity_mention_graph(graph, docs=None, batch_size=BATCH_SIZE):
+    """
+    Receives a single test graph and evaluates it for entity mentions.
+    :param graph: the gold standard OKR graph
+    :param docs: the parsed sentences of the graph, as returned by parse_sentences (default: parse them)
+    :param batch_size: the number of sentences parsed together
+    :return: F1, recall, precision, and their micro counts
+    """
+    if docs is None:
+        docs = parse_sentences([graph], batch_size)[0]
 
-	if GET_ORIGINAL_SCORE:
-        	sents = {num: unicode(uncap_sentence(fix_tokenization(' '.join(sentence)))) for num, sentence in graph.sentences.iteritems()}
-	else:
-		sents = {num: unicode(uncap_sentence(' '.join(sentence))) for num, sentence in graph.sentences.iteritems()}
+    # NER entity
+    ner_singles = [[s_num, num, tok.ent_iob, tok.tag_] for s_num, doc in docs.iteritems() for num, tok in
+                   enumerate(doc) if tok.ent_iob in [1, 3]]
+    ner_wpos = convert_iob_to_seq(ner_singles)
 
-	sents = {key: sentence for key, sentence in sents.iteritems() if len(nlp(sentence)) == len(graph.sentences[key])}
-        # NER entity
-        ner_singles = [[s_num, num, tok.ent_iob, tok.tag_] for s_num, sentence in sents.iteritems() for num, tok in
-                       enumerate(nlp(sentence)) if tok.ent_iob in [1, 3]]
-        ner_wpos = convert_iob_to_seq(ner_singles)
+    # Remove determiners and possesives
+    ner_wpos = [[mention[0], [index for num, index in enumerate(mention[1]) if not mention[2][num] == u'DT'],
+                 [pos for pos in mention[2]]] for mention in ner_wpos]
+    ner_wpos = [[mention[0], [index for num, index in enumerate(mention[1]) if not mention[2][num] == u'POS'],
+                 [pos for pos in mention[2]]] for mention in ner_wpos]
 
-        # Remove determiners and possesives
-        ner_wpos = [[mention[0], [index for num, index in enumerate(mention[1]) if not mention[2][num] == u'DT'],
-                     [pos for pos in mention[2]]] for mention in ner_wpos]
-        ner_wpos = [[mention[0], [index for num, index in enumerate(mention[1]) if not mention[2][num] == u'POS'],
-                     [pos for pos in mention[2]]] for mention in ner_wpos]
+    # Remove entities that contain verbs
+    ner_wpos = [mention for mention in ner_wpos if len(set(mention[2]).intersection(set(VERBS))) == 0]
 
-        # Remove entities that contain verbs
-        ner_wpos = [mention for mention in ner_wpos if len(set(mention[2]).intersection(set(VERBS))) == 0]
+    # Convert to string
+    ner = [str(item[0]) + str(item[1]) for item in ner_wpos]
 
-        # Convert to string
-        ner = [str(item[0]) + str(item[1]) for item in ner_wpos]
+    # Every noun or adjective is an entity, except nominalizations
+    nouns_wword = [[str(s_num) + "[" + str(num) + "]", tok, tok.tag_] for s_num, doc in docs.iteritems() for
+                   num, tok in enumerate(doc) if tok.tag_ in NOUNS or tok.tag_ in ADJECTIVES]
 
-        # Every noun or adjective is an entity, except nominalizations
-        nouns_wword = [[str(s_num) + "[" + str(num) + "]", tok, tok.tag_] for s_num, sentence in sents.iteritems() for
-                       num, tok in enumerate(nlp(sentence)) if tok.tag_ in NOUNS or tok.tag_ in ADJECTIVES]
+    nouns = set([noun[0] for noun in nouns_wword])
 
-        nouns = set([noun[0] for noun in nouns_wword])
+    # Exclude indices collected by NER
+    nouns = nouns - set([str(mention[0]) + "[" + str(index) + "]" for mention in ner_wpos for index in mention[1]])
+    return evaluate_entity_mention_single(nouns.union(ner), graph)
 
-        # Exclude indices collected by NER
-        nouns = nouns - set([str(mention[0]) + "[" + str(index) + "]" for mention in ner_wpos for index in mention[1]])
-        scores.append(evaluate_entity_mention_single(nouns.union(ner), graph))
-    # Return the average
-    score = np.mean(scores, axis=0)[0]
-    return score
+
+def parse_sentences(graphs, batch_size=BATCH_SIZE):
+    """
+    Parse the sentences of the graphs once, in batches, to be used by all the entity mention passes
+    :param graphs: the OKR graphs
+    :param batch_size: the number of sentences parsed together
+    :return: for each graph, a dictionary of sentence number to its parsed sentence, without sentences
+    whose spaCy tokenization differs from the graph's tokenization
+    """
+    sents = [(graph_index, num, sentence) for graph_index, graph in enumerate(graphs)
+             for num, sentence in graph.sentences.iteritems()]
+
+    if GET_ORIGINAL_SCORE:
+        texts = [unicode(uncap_sentence(fix_tokenization(' '.join(sentence)))) for _, _, sentence in sents]
+    else:
+        texts = [unicode(uncap_sentence(' '.join(sentence))) for _, _, sentence in sents]
+
+    graph_docs = [{} for _ in graphs]
+    for (graph_index, num, sentence), doc in zip(sents, annotate(texts, TOKENIZER, batch_size)):
+        if len(doc) == len(sentence):
+            graph_docs[graph_index][num] = doc
+
+    return graph_docs
 
 
 def is_nominalization(word):
@@ -130,7 +155,7 @@ def pred_to_nom(pred_string):
     :param pred_string: the noun phrase
     :return: the lemmatized nouns
     """
-    gold_nom_list = [word.lemma_ for word in nlp(unicode(pred_string))
+    gold_nom_list = [word.lemma_ for word in annotate_sentence(unicode(pred_string), TOKENIZER)
                      if not word.is_stop and not word.tag_ == u'IN' and word.tag_ in NOUNS]
     return gold_nom_list
 
@@ -11,8 +11,10 @@ sys.path.append('../common')
 import numpy as np
 
 from okr import *
+from collections import defaultdict
 from entity_coref import *
-from clustering_common import cluster_mentions
+from profiling import profiled
+from clustering_common import cluster_mentions, HistogramScorer
 from parsers.spacy_wrapper import spacy_wrapper
 
 
@@ -24,43 +26,45 @@ def evaluate_predicate_coref(test_graphs):
     """
     parser = spacy_wrapper()
 
-    scores = []
-
-    for graph in test_graphs:
+    scores = [evaluate_predicate_coref_graph(graph, parser)[0] for graph in test_graphs]
+    scores = np.mean(scores, axis=0).tolist()
 
-        # Cluster the mentions
-        prop_mentions = []
-        for prop in graph.propositions.values():
-            for mention in prop.mentions.values():
+    return scores
 
-                if mention.indices == [-1]:
-                    continue
 
-                head_lemma, head_pos = get_mention_head(mention, parser, graph)
-                prop_mentions.append((mention, head_lemma, head_pos))
+def evaluate_predicate_coref_graph(graph, parser):
+    """
+    Receives a single OKR test graph and evaluates it for predicate coreference
+    :param graph: the OKR test graph
+    :param parser: the spacy wrapper object
+    :return: the coreference scores: MUC, B-CUBED, CEAF and MELA (CoNLL F1), and the micro counts
+    """
 
-        clusters = cluster_mentions(prop_mentions, score)
-        clusters = [set([item[0] for item in cluster]) for cluster in clusters]
+    mentions = [mention for prop in graph.propositions.values() for mention in prop.mentions.values()
+                if mention.indices != [-1]]
 
-        # Evaluate
-        curr_scores, _ = eval_clusters(clusters, graph)
-        scores.append(curr_scores)
+    # Parse each sentence once, and find the heads of all its mentions
+    sentence_mentions = defaultdict(list)
+    for index, mention in enumerate(mentions):
+        sentence_mentions[mention.sentence_id].append(index)
 
-    scores = np.mean(scores, axis=0).tolist()
+    mention_heads = [None] * len(mentions)
+    for sentence_id, indices in sentence_mentions.iteritems():
+        parser.parse(' '.join(graph.sentences[sentence_id]))
+        depths = get_depths(parser)
 
-    return scores
+        for index in indices:
+            mention_heads[index] = get_mention_head(mentions[index], parser, graph, depths)
 
+    # Cluster the mentions (in their original order)
+    prop_mentions = [(mention, head_lemma, head_pos) for mention, (head_lemma, head_pos) in zip(mentions, mention_heads)]
+    # (the score is computed from the histogram of the head lemmas in each cluster)
+    clusters = cluster_mentions(prop_mentions, HistogramScorer(lambda prop: prop[1]))
+    clusters = [set([item[0] for item in cluster]) for cluster in clusters]
 
-def score(prop, cluster):
-    """
-    Receives a proposition mention (mention, head_lemma, head_pos)
-    and a cluster of proposition mentions, and returns a numeric value denoting the
-    similarity between the mention to the cluster (% of same head lemma mentions in the cluster)
-    :param prop: the mention
-    :param cluster: the cluster
-    :return: a numeric value denoting the similarity between the mention to the cluster
-    """
-    return len([other for other in cluster if other[1] == prop[1]]) / (1.0 * len(cluster))
+    # Evaluate
+    curr_scores, _, counts = eval_clusters(clusters, graph)
+    return curr_scores, counts
 
 
 def eval_clusters(clusters, graph):
@@ -69,7 +73,7 @@ def eval_clusters(clusters, graph):
     coreferences
     :param clusters: the predicted clusters
     :param graph: the gold standard graph
-    :return: the predicate coreference metrics and the number of singletons
+    :return: the predicate coreference metrics, the number of singletons, and the micro counts of the metrics
     """
     graph1_ent_mentions = []
     graph2_ent_mentions = clusters
@@ -84,43 +88,58 @@ def eval_clusters(clusters, graph):
     graph2_ent_mentions = [set(map(str, cluster)) for cluster in graph2_ent_mentions]
 
     # Evaluate
-    muc1, bcubed1, ceaf1 = muc(graph1_ent_mentions, graph2_ent_mentions), \
-                           bcubed(graph1_ent_mentions, graph2_ent_mentions), \
-                           ceaf(graph1_ent_mentions, graph2_ent_mentions)
+    muc1, bcubed1, ceaf1, counts = coref_scores(graph1_ent_mentions, graph2_ent_mentions)
     mela1 = np.mean([muc1, bcubed1, ceaf1])
 
     singletons = len([cluster for cluster in graph1_ent_mentions if len(cluster) == 1])
-    return np.array([muc1, bcubed1, ceaf1, mela1]), singletons
+    return np.array([muc1, bcubed1, ceaf1, mela1]), singletons, counts[:, np.newaxis, :]
 
 
-def get_distance_to_root(token, parser):
+def get_depths(parser):
     """
-    Receives a token and returns its distance from the root
-    :param token: the token
-    :param parser: the spacy wrapper object
-    :return: the distance from the token to the root
+    Returns the distance of each token of the parsed sentence from the root. Each token's distance is computed
+    once, from the distance of its head.
+    :param parser: the spacy wrapper object, after parsing the sentence
+    :return: a list of the distance of each token from the root
     """
-    dist = 0
-    while parser.get_head(token) != token:
-        token = parser.get_head(token)
-        dist += 1
-    return dist
+    heads = [parser.get_head(token) for token in range(parser.get_len())]
+    depths = [None] * len(heads)
+
+    for token in range(len(heads)):
+
+        # Walk up to the root or to a token whose distance is known
+        path = []
+        node = token
+        while depths[node] is None and heads[node] != node:
+            path.append(node)
+            node = heads[node]
+
+        if depths[node] is None:
+            depths[node] = 0
+
+        for depth, path_node in enumerate(reversed(path), depths[node] + 1):
+            depths[path_node] = depth
+
+    return depths
 
 
-def get_mention_head(mention, parser, graph):
+@profiled()
+def get_mention_head(mention, parser, graph, depths=None):
     """
     Gets a mention and returns its head
     :param mention: the mention
     :param parser: the spacy wrapper object
     :param graph: the OKR graph
+    :param depths: the distance of each token from the root, if the mention's sentence was already parsed
+    (default: parse the sentence)
     :return: the mention head
     """
     distances_to_root = []
     curr_head_and_pos = []
-    sentence = graph.sentences[mention.sentence_id]
 
-    joined_sentence = ' '.join(sentence)
-    parser.parse(joined_sentence)
+    if depths is None:
+        parser.parse(' '.join(graph.sentences[mention.sentence_id]))
+        depths = get_depths(parser)
 
     for index in mention.indices:
         child = parser.get_word(index)
@@ -131,7 +150,7 @@ def get_mention_head(mention, parser, graph):
         if parser.get_head(index) in mention.indices and head != child:
             continue
 
-        distances_to_root.append(get_distance_to_root(index, parser))
+        distances_to_root.append(depths[index])
         curr_head_and_pos.append((child_lemma, child_pos))
 
     # Get the closest to the root
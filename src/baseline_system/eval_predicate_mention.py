@@ -9,10 +9,10 @@ import sys
 sys.path.append('../common')
 sys.path.append('../agreement')
 
-import nltk
 import logging
 import numpy as np
 
+from pos_tags import get_pos_tags
 from constants import NULL_VALUE
 from filter_propositions import cram_proposition_mentions
 from filter_propositions import filter_verbal, filter_non_verbal
@@ -23,6 +23,8 @@ from okr import PropositionMention, Proposition, load_graphs_from_folder
 
 logging.basicConfig(level = logging.INFO)
 
+nom_lexicons = {}  # Dictionary of nominalizations file to its lexicon, loaded the first time it is needed
+
 
 def evaluate_predicate_mention(test_graphs, prop_ex, nom_file):
     """
@@ -31,9 +33,7 @@ def evaluate_predicate_mention(test_graphs, prop_ex, nom_file):
     :param prop_ex: the proposition extraction object
     :return the average predicate mention metric on the test graphs
     """
-    pred_graphs = [predict_predicate_mention(test_graph, prop_ex, nom_file) for test_graph in test_graphs]
-    return np.mean([compute_predicate_mention_agreement(test_graph, pred_graph)[0]
-                    for test_graph, pred_graph in zip(test_graphs, pred_graphs)])
+    return np.mean([evaluate_predicate_mention_graph(test_graph, prop_ex, nom_file)[0] for test_graph in test_graphs])
 
 
 def evaluate_predicate_mention_verbal(test_graphs, prop_ex):
@@ -43,11 +43,7 @@ def evaluate_predicate_mention_verbal(test_graphs, prop_ex):
     :param prop_ex: the proposition extraction object
     :return the average predicate mention metric on the verbal propositions in test graphs
     """
-    verbal_graphs = map(filter_verbal, test_graphs)
-    pred_graphs = [predict_predicate_mention(verbal_graph, prop_ex, apply_non_verbal=False)
-                   for verbal_graph in verbal_graphs]
-    return np.mean([compute_predicate_mention_agreement(test_graph, pred_graph)[0]
-                    for test_graph, pred_graph in zip(verbal_graphs, pred_graphs)])
+    return np.mean([evaluate_predicate_mention_verbal_graph(test_graph, prop_ex)[0] for test_graph in test_graphs])
 
 
 def evaluate_predicate_mention_non_verbal(test_graphs, prop_ex, nom_file):
@@ -57,11 +53,46 @@ def evaluate_predicate_mention_non_verbal(test_graphs, prop_ex, nom_file):
     :param prop_ex: the proposition extraction object
     :return the average predicate mention metric on the non-verbal propositions in test graphs
     """
-    non_verbal_graphs = map(filter_non_verbal, test_graphs)
-    pred_graphs = [predict_predicate_mention(non_verbal_graph, prop_ex, apply_verbal=False, nom_file=nom_file)
-                   for non_verbal_graph in non_verbal_graphs]
-    return np.mean([compute_predicate_mention_agreement(test_graph, pred_graph)[0]
-                    for test_graph, pred_graph in zip(non_verbal_graphs, pred_graphs)])
+    return np.mean([evaluate_predicate_mention_non_verbal_graph(test_graph, prop_ex, nom_file)[0]
+                    for test_graph in test_graphs])
+
+
+def evaluate_predicate_mention_graph(test_graph, prop_ex, nom_file):
+    """
+    Calculate the predicate mention metric on a single test graph.
+    :param test_graph: the graph for the test set
+    :param prop_ex: the proposition extraction object
+    :return the predicate mention metric on the test graph, and its micro counts
+    """
+    pred_graph = predict_predicate_mention(test_graph, prop_ex, nom_file)
+    score, _, _, counts = compute_predicate_mention_agreement(test_graph, pred_graph)
+    return score, counts
+
+
+def evaluate_predicate_mention_verbal_graph(test_graph, prop_ex):
+    """
+    Calculate the predicate mention metric on the verbal propositions in a single test graph
+    :param test_graph: the graph for the test set
+    :param prop_ex: the proposition extraction object
+    :return the predicate mention metric on the verbal propositions in the test graph, and its micro counts
+    """
+    verbal_graph = filter_verbal(test_graph)
+    pred_graph = predict_predicate_mention(verbal_graph, prop_ex, apply_non_verbal=False)
+    score, _, _, counts = compute_predicate_mention_agreement(verbal_graph, pred_graph)
+    return score, counts
+
+
+def evaluate_predicate_mention_non_verbal_graph(test_graph, prop_ex, nom_file):
+    """
+    Calculate the predicate mention metric on the non-verbal propositions in a single test graph
+    :param test_graph: the graph for the test set
+    :param prop_ex: the proposition extraction object
+    :return the predicate mention metric on the non-verbal propositions in the test graph, and its micro counts
+    """
+    non_verbal_graph = filter_non_verbal(test_graph)
+    pred_graph = predict_predicate_mention(non_verbal_graph, prop_ex, apply_verbal=False, nom_file=nom_file)
+    score, _, _, counts = compute_predicate_mention_agreement(non_verbal_graph, pred_graph)
+    return score, counts
 
 
 def predict_predicate_mention(test_graph, prop_ex, nom_file=None, apply_verbal=True, apply_non_verbal=True):
@@ -78,13 +109,10 @@ def predict_predicate_mention(test_graph, prop_ex, nom_file=None, apply_verbal=T
 
     pred = test_graph.clone()
     proposition_mentions = []
+    pos_tags = get_pos_tags(test_graph) if apply_verbal else None
 
     if nom_file:
-
-        # Load nomlex
-        logging.debug('Loading nomlex')
-        nom_lexicon = [line.split('\t')[0] for line in open(nom_file)]
-        logging.debug('Nomlex[:10] = {}'.format(nom_lexicon[:10]))
+        nom_lexicon = load_nom_lexicon(nom_file)
 
     for sent_id, sent in test_graph.sentences.iteritems():
 
@@ -97,7 +125,7 @@ def predict_predicate_mention(test_graph, prop_ex, nom_file=None, apply_verbal=T
             indices_and_terms += filter(lambda (indices, terms): all([(ind < len(sent)) and (sent[ind] == term)
                                                                       for (ind, term) in zip(indices, terms.split(" "))]),
                                        prop_ex.get_extractions(' '.join(sent)))
-            indices_and_terms += [([ind], word) for (ind, [word, pos]) in enumerate(nltk.pos_tag(sent))
+            indices_and_terms += [([ind], word) for (ind, [word, pos]) in enumerate(zip(sent, pos_tags[sent_id]))
                                   if pos.startswith('V')]
             logging.debug('Verbal: {}'.format(indices_and_terms))
 
@@ -120,6 +148,23 @@ def predict_predicate_mention(test_graph, prop_ex, nom_file=None, apply_verbal=T
     return pred
 
 
+def load_nom_lexicon(nom_file):
+    """
+    Returns the nominalizations lexicon, loading the file only the first time it is needed
+    :param nom_file: the file containing nominalizations
+    :return the set of nominalizations
+    """
+    if nom_file not in nom_lexicons:
+
+        # Load nomlex
+        logging.debug('Loading nomlex')
+        nom_lexicon = [line.split('\t')[0] for line in open(nom_file)]
+        logging.debug('Nomlex[:10] = {}'.format(nom_lexicon[:10]))
+        nom_lexicons[nom_file] = set(nom_lexicon)
+
+    return nom_lexicons[nom_file]
+
+
 def create_proposition_mention(sent_id, indices, terms):
     """
     Instansiate only proposition_mention's fields which are required for predicate mention agreement computation
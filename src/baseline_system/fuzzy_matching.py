@@ -0,0 +1,135 @@
+"""
+Batched fuzzy string matching -- used by the entity coreference to compare a mention with many cluster members.
+
+fuzz.ratio(s1, s2) is 2 * M / (len(s1) + len(s2)) (rounded percents), where M is the number of matching characters:
+the length of the longest common subsequence (LCS) with python-Levenshtein, and at most that with difflib. The LCS
+lengths of a query against many strings are computed together, with a bit-parallel LCS algorithm (Hyyro, 2004)
+vectorized over the strings: the query is a bit mask, and each character of the strings updates the masks of all
+the strings with a few NumPy operations. The LCS ratio is an upper bound of fuzz.ratio, so only the strings whose
+bound passes the threshold are compared with fuzz.ratio, and the results are exactly those of fuzz.ratio.
+
+Similarly, fuzz.partial_ratio of a short string and a longer one is 100 only if the short one is a substring of
+the longer one, so only these strings are compared with fuzz.partial_ratio.
+
+Identical strings are compared once, and a few strings are compared one at a time (the NumPy operations have a
+fixed overhead).
+"""
+
+import numpy as np
+
+from fuzzywuzzy import fuzz
+
+MAX_QUERY_LENGTH = 64  # The bit masks are 64 bit integers. Longer queries are compared one string at a time.
+MIN_VECTORIZED = 8  # The minimal number of distinct strings compared with the vectorized LCS
+
+# Strings this long or longer may have a partial ratio of 100 with strings that don't contain them (the partial
+# ratio is rounded, and a substring shorter by one character has a ratio of at least 99.5)
+MAX_PARTIAL_LENGTH = 100
+
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(axis=1)
+
+
+def ratio_at_least(strings, query, threshold):
+    """
+    Returns whether fuzz.ratio(s, query) >= threshold for each string s
+    :param strings: the strings
+    :param query: the query string
+    :param threshold: the threshold (percents)
+    :return: a list of booleans
+    """
+    distinct = list(set(strings))
+
+    if len(query) > MAX_QUERY_LENGTH or len(distinct) < MIN_VECTORIZED:
+        candidates = distinct
+    else:
+        bounds = lcs_ratios(distinct, query)
+        candidates = [s for s, bound in zip(distinct, bounds) if bound >= threshold]
+
+    passed = set([s for s in candidates if fuzz.ratio(s, query) >= threshold])
+    return [s in passed for s in strings]
+
+
+def partial_ratio_is_100(strings, query):
+    """
+    Returns whether fuzz.partial_ratio(s, query) == 100 for each string s
+    :param strings: the strings
+    :param query: the query string
+    :return: a list of booleans
+    """
+    distinct = set(strings)
+
+    # A short string must be a substring of the other one (which doesn't need a vectorized kernel)
+    candidates = [s for s in distinct if min(len(s), len(query)) >= MAX_PARTIAL_LENGTH or
+                  (s in query if len(s) <= len(query) else query in s)]
+
+    passed = set([s for s in candidates if fuzz.partial_ratio(s, query) == 100])
+    return [s in passed for s in strings]
+
+
+def lcs_ratios(strings, query):
+    """
+    Returns the LCS ratio of each string with the query: fuzz.ratio with python-Levenshtein, and an upper bound of it
+    with difflib
+    :param strings: the strings
+    :param query: the query string (at most MAX_QUERY_LENGTH characters)
+    :return: a NumPy array of the ratios (rounded percents, as fuzz.ratio)
+    """
+    lengths = np.array([len(s) + len(query) for s in strings], dtype=float)
+    lcs = lcs_lengths(strings, query)
+
+    # Equal strings (including two empty strings) have a ratio of 100
+    ratios = np.where(lengths > 0, 100.0 * (2.0 * lcs / np.maximum(lengths, 1)), 100.0)
+
+    # fuzz.ratio rounds half up
+    return np.floor(ratios + 0.5).astype(int)
+
+
+def lcs_lengths(strings, query):
+    """
+    Returns the length of the longest common subsequence of each string with the query
+    :param strings: the strings
+    :param query: the query string (at most MAX_QUERY_LENGTH characters)
+    :return: a NumPy array of the LCS lengths
+    """
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValueError('The query is longer than %d characters' % MAX_QUERY_LENGTH)
+
+    num_strings = len(strings)
+    max_length = max([len(s) for s in strings] or [0])
+
+    if num_strings == 0 or max_length == 0 or len(query) == 0:
+        return np.zeros(num_strings, dtype=int)
+
+    # The characters of the strings (-1 after the end of a string)
+    chars = np.full((num_strings, max_length), -1, dtype=np.int64)
+    for index, s in enumerate(strings):
+        chars[index, :len(s)] = [ord(c) for c in s]
+
+    # The match mask of each character: the bits of the query positions with this character
+    char_masks = {}
+    for position, c in enumerate(query):
+        char_masks[ord(c)] = char_masks.get(ord(c), 0) | (1 << position)
+
+    masks = np.zeros((num_strings, max_length), dtype=np.uint64)
+    for c, mask in char_masks.iteritems():
+        masks[chars == c] = np.uint64(mask)
+
+    # V has a zero bit for each query position in the LCS. A character without matches (or after the end of the
+    # string) doesn't change V.
+    query_mask = np.uint64((1 << len(query)) - 1)
+    v = np.full(num_strings, query_mask, dtype=np.uint64)
+
+    for position in range(max_length):
+        u = v & masks[:, position]
+        v = (v + u) | (v - u)
+
+    return len(query) - count_bits(v & query_mask)
+
+
+def count_bits(values):
+    """
+    Returns the number of set bits in each value
+    :param values: a NumPy array of 64 bit unsigned integers
+    :return: a NumPy array of the number of set bits
+    """
+    return BYTE_BITS[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1)
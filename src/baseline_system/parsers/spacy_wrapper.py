@@ -4,11 +4,13 @@ Author: Gabi Stanovsky
     Abstraction over the spaCy parser, all output uses word indexes. Also offers VP and NP chunking as spaCy primitives.
 """
 
+import sys
 import logging
+sys.path.append('../common')
 
-from spacy.en import English
-from spacy.tokens import Span
+from spacy_models import get_model
 from collections import defaultdict
+from annotation_cache import annotate_sentence
 
 
 logging.basicConfig(level = logging.DEBUG)
@@ -19,15 +21,16 @@ class spacy_wrapper:
     Abstraction over the spaCy parser, all output uses word indexes. Also offers VP and NP chunking as spaCy primitives.
     """
     def __init__(self):
-        self.nlp = English()
         self.idx_to_word_index = {}
          
     def parse(self, sent):
         """
-        Parse a raw sentence - shouldn't return a value, but properly change the internal status
+        Parse a raw sentence - shouldn't return a value, but properly change the internal status.
+        The parse is taken from the annotation cache, and spaCy is used only on cache misses.
         :param sent - a raw sentence
         """
-        self.toks = self.nlp(unicode(sent, errors = 'ignore'))
+        self.sent = unicode(sent, errors = 'ignore')
+        self.toks = annotate_sentence(self.sent)
         self.idx_to_word_index = self.get_idx_to_word_index()
 
     def get_sents(self):
@@ -39,8 +42,12 @@ class spacy_wrapper:
         
     def chunk(self):
         """
-        Run all chunking on the current sentence
+        Run all chunking on the current sentence. Chunking merges the tokens of the spaCy parse,
+        so the sentence is parsed again with spaCy rather than taken from the annotation cache.
         """
+        self.toks = get_model()(self.sent)
+        self.idx_to_word_index = self.get_idx_to_word_index()
+
         self.np_chunk()
         self.vp_chunk()
         self.pp_chunk()
@@ -90,6 +97,7 @@ class spacy_wrapper:
                 chunks[head].append(child)
 
         # Create Spans
+        from spacy.tokens import Span
         for head, span in chunks.iteritems():
 
             # The head itself is always part of a non-empty span
@@ -1,7 +1,10 @@
 import re
+import sys
 import bsddb
+sys.path.append('../common')
 
-from spacy.en import English
+from profiling import profiled
+from annotation_cache import annotate_sentence
 
 
 """
@@ -35,8 +38,6 @@ class PredicateEntailmentBaseline:
         # Set threshold to default as recommended
         self.threshold = 0.0
 
-        self.nlp = English()
-
     def set_threshold(self, threshold):
         """
         Set the threshold above which predicates are considered entailing.
@@ -44,6 +45,7 @@ class PredicateEntailmentBaseline:
         """
         self.threshold = threshold
 
+    @profiled()
     def is_entailing(self, pred1, pred2):
         """
         Check whether the first predicate entails the second predicate
@@ -73,8 +75,8 @@ class PredicateEntailmentBaseline:
         pred2_rule = pred2_rule[start:end + 3]
 
         # Lemmatize the predicate templates
-        pred1_rule = str(' '.join([token.lemma_.lower().strip() for token in self.nlp(unicode(pred1_rule))]))
-        pred2_rule = str(' '.join([token.lemma_.lower().strip() for token in self.nlp(unicode(pred2_rule))]))
+        pred1_rule = str(' '.join([token.lemma_.lower().strip() for token in annotate_sentence(unicode(pred1_rule))]))
+        pred2_rule = str(' '.join([token.lemma_.lower().strip() for token in annotate_sentence(unicode(pred2_rule))]))
 
         rule = '###'.join((pred1_rule, pred2_rule))
         rule = rule.replace('@x@', 'X').replace('@y@', 'Y')
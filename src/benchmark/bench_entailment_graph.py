@@ -0,0 +1,152 @@
+"""
+bench_entailment_graph
+
+    Benchmarks the entailment graph F1 computation (entities and propositions) against the previous
+    per-node implementation, which called sklearn's precision_recall_fscore_support once per node,
+    and verifies that both return the same scores.
+"""
+import os
+import sys
+import time
+sys.path.append('../common')
+sys.path.append('../agreement')
+
+import numpy as np
+
+from okr import *
+from docopt import docopt
+from sklearn.metrics import precision_recall_fscore_support
+from entailment_graph import compute_entities_f1, compute_predicate_f1
+
+
+def main():
+    """
+    Benchmarks the entailment graph F1 computation on the stories in the given directory
+    """
+    args = docopt("""Benchmarks the entailment graph F1 computation on the stories in the given directory
+
+    Usage:
+        bench_entailment_graph.py <stories_dir> [--repeat=<n>]
+
+        <stories_dir> = the directory containing the annotation files (e.g. ../../data/baseline/dev)
+
+    Options:
+        --repeat=<n>  number of times to repeat each computation [default: 10]
+    """)
+
+    stories_dir = args['<stories_dir>']
+    repeat = int(args['--repeat'])
+
+    gold_graphs = [load_graph_from_file(stories_dir + '/' + f) for f in sorted(os.listdir(stories_dir))]
+    pred_graphs = map(drop_entailment_edges, gold_graphs)
+    graphs = zip(gold_graphs, pred_graphs)
+
+    for name, new_f1, old_f1 in [('entities', compute_entities_f1, legacy_entities_f1),
+                                 ('propositions', compute_predicate_f1, legacy_predicate_f1)]:
+
+        new_time, new_scores = time_f1(new_f1, graphs, repeat)
+        old_time, old_scores = time_f1(old_f1, graphs, repeat)
+
+        assert np.allclose(new_scores, old_scores, equal_nan=True), \
+            'Different %s F1 scores: %s != %s' % (name, new_scores, old_scores)
+
+        print '%s: batched=%.4fs, per-node=%.4fs, speedup=%.1fx' % \
+              (name, new_time, old_time, old_time / new_time if new_time > 0 else np.inf)
+
+
+def time_f1(f1_func, graphs, repeat):
+    """
+    Times an entailment F1 function on all the graphs
+    :param f1_func: the F1 function
+    :param graphs: pairs of gold and predicted OKR graphs
+    :param repeat: number of times to repeat the computation
+    :return: the average time per repetition and the scores
+    """
+    start = time.time()
+    for _ in range(repeat):
+        scores = [f1_func(gold_graph, pred_graph) for gold_graph, pred_graph in graphs]
+    return (time.time() - start) / repeat, scores
+
+
+def drop_entailment_edges(graph):
+    """
+    Creates a "predicted" graph, identical to the gold standard graph except for the entailment graphs,
+    from which every other edge is removed
+    :param graph: the gold standard graph
+    :return: the predicted graph
+    """
+    pred = graph.clone()
+
+    for node in pred.entities.values() + pred.propositions.values():
+        node.entailment_graph.mentions_graph = sorted(node.entailment_graph.mentions_graph)[::2]
+
+    return pred
+
+
+def legacy_entities_f1(gold_graph, pred_graph):
+    """
+    The previous implementation of entailment_graph.compute_entities_f1
+    """
+    all_edges = {str(entity): set([(str(m1), str(m2))
+                                   for m1 in entity.mentions.values()
+                                   for m2 in entity.mentions.values() if m1 != m2])
+                 for entity in gold_graph.entities.values() if len(entity.mentions) > 1}
+
+    str_entities_gold = { entity : str(entity) for entity in gold_graph.entities.values() }
+    entity_entailments_gold = {str_entities_gold[entity]:
+                                [1 if (m1, m2) in set(entity.entailment_graph.mentions_graph) else 0
+                                 for (m1, m2) in all_edges[str_entities_gold[entity]]]
+                            for entity in gold_graph.entities.values() if str_entities_gold[entity] in all_edges.keys()}
+
+    str_entities_pred = { entity : str(entity) for entity in pred_graph.entities.values() }
+    entity_entailments_pred = {str_entities_pred[entity]:
+                                [1 if (m1, m2) in set(entity.entailment_graph.mentions_graph) else 0
+                                 for (m1, m2) in all_edges[str_entities_pred[entity]]]
+                            for entity in pred_graph.entities.values() if str_entities_pred[entity] in all_edges.keys()}
+
+    mutual_entities = list(set(entity_entailments_gold.keys()).intersection(entity_entailments_pred.keys()))
+
+    return np.mean([precision_recall_fscore_support(entity_entailments_gold[entity], entity_entailments_pred[entity],
+                                                    average='binary')[2]
+                    if np.sum(entity_entailments_gold[entity]) > 0 or np.sum(entity_entailments_pred[entity]) > 0
+                    else 1.0
+                    for entity in mutual_entities])
+
+
+def legacy_predicate_f1(gold_graph, pred_graph):
+    """
+    The previous implementation of entailment_graph.compute_predicate_f1
+    """
+    str_prop_gold = { prop : str(prop) for prop in gold_graph.propositions.values()
+                   if len(set(map(str, prop.mentions.values()))) > 1 }
+    str_prop_pred = { prop : str(prop) for prop in pred_graph.propositions.values()
+                  if len(set(map(str, prop.mentions.values()))) > 1 }
+
+    all_edges = {str(prop) : set([(str(m1), str(m2))
+                                   for m1 in prop.mentions.values()
+                                   for m2 in prop.mentions.values() if str(m1) != str(m2)])
+                 for prop in gold_graph.propositions.values()
+                 if len(set(map(str, prop.mentions.values()))) > 1}
+
+    prop_entailments_gold = {str_prop_gold[prop]:
+                              [1 if (m1, m2) in set(prop.entailment_graph.mentions_graph) else 0
+                               for (m1, m2) in all_edges[str_prop_gold[prop]]]
+                          for prop in str_prop_gold.keys()
+                          if str_prop_gold[prop] in all_edges.keys()}
+
+    prop_entailments_pred = {str_prop_pred[prop]:
+                              [1 if (m1, m2) in set(prop.entailment_graph.mentions_graph) else 0
+                               for (m1, m2) in all_edges[str_prop_pred[prop]]]
+                          for prop in str_prop_pred.keys()
+                          if str_prop_pred[prop] in all_edges.keys()}
+
+    mutual_props = list(set(prop_entailments_gold.keys()).intersection(prop_entailments_pred.keys()))
+
+    return np.mean([precision_recall_fscore_support(prop_entailments_gold[prop], prop_entailments_pred[prop],
+                                                    average='binary')[2]
+                    if np.sum(prop_entailments_gold[prop]) > 0 or np.sum(prop_entailments_pred[prop]) > 0 else 1.0
+                    for prop in mutual_props])
+
+
+if __name__ == '__main__':
+    main()
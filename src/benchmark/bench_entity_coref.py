@@ -0,0 +1,178 @@
+"""
+bench_entity_coref
+
+    Benchmarks the baseline entity coreference clustering with blocking (each mention is scored only against
+    the clusters with mentions that may be similar to it, see eval_entity_coref.EntityBlocker) against the
+    exhaustive clustering, which scores each mention against every cluster:
+    1) verify - clusters the entity mentions of the given stories (e.g. the test set) in both ways, verifies that
+    the clusters are identical, and reports the speedup.
+    2) scale - tabulates the running time of both against the number of entity mentions, on synthetic stories of
+    increasing size (see generate_synthetic_okr). The generated terms of all the entities are alike (e.g. e1t0w0 and
+    e2t0w0), so the terms of each entity are replaced by random words. The exhaustive clustering is skipped on
+    large stories. The exponent of the running time is estimated over all the scales and over the two largest ones.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+sys.path.append('../common')
+sys.path.append('../agreement')
+sys.path.append('../baseline_system')
+
+import numpy as np
+
+from okr import *
+from docopt import docopt
+from bench_scaling import estimate_exponent
+from generate_synthetic_okr import generate_stories
+from eval_entity_coref import cluster_entity_mentions
+
+# The story parameters of scale 1 (the sizes are multiplied by the scale)
+BASE_SENTENCES = 20
+BASE_ENTITIES = 100
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def main():
+    """
+    Benchmarks the entity coreference clustering with and without blocking
+    """
+    args = docopt("""Benchmarks the entity coreference clustering with and without blocking
+
+    Usage:
+        bench_entity_coref.py verify <stories_dir>
+        bench_entity_coref.py scale [--scales=<s>] [--mentions=<n>] [--vocabulary=<n>] [--max_exhaustive=<n>]
+                                    [--seed=<s>]
+
+        <stories_dir> = the directory containing the annotation files (e.g. ../../data/baseline/test)
+
+    Options:
+        --scales=<s>          comma separated scale factors of the number of sentences and entities
+                              [default: 1,2,4,8,16]
+        --mentions=<n>        average number of mentions of each entity [default: 3]
+        --vocabulary=<n>      number of distinct words in the terms of the entities [default: 10000]
+        --max_exhaustive=<n>  the maximal number of mentions on which the exhaustive clustering is timed
+                              [default: 5000]
+        --seed=<s>            the random seed [default: 0]
+    """)
+
+    if args['verify']:
+        verify_stories(args['<stories_dir>'])
+    else:
+        benchmark_scales([int(scale) for scale in args['--scales'].split(',')], int(args['--mentions']),
+                         int(args['--vocabulary']), int(args['--max_exhaustive']), int(args['--seed']))
+
+
+def verify_stories(stories_dir):
+    """
+    Verifies that the clustering with blocking is identical to the exhaustive clustering on the stories
+    :param stories_dir: the directory containing the annotation files
+    """
+    total_blocked, total_exhaustive = 0.0, 0.0
+
+    for story_file in sorted(os.listdir(stories_dir)):
+        graph = load_graph_from_file(os.path.join(stories_dir, story_file))
+        exhaustive_time, exhaustive_clusters = time_clustering(graph, False)
+        blocked_time, blocked_clusters = time_clustering(graph, True)
+
+        assert blocked_clusters == exhaustive_clusters, 'Different clusters in %s' % story_file
+
+        total_blocked += blocked_time
+        total_exhaustive += exhaustive_time
+        print '%s (%d mentions): blocked=%.4fs, exhaustive=%.4fs' % \
+              (story_file, count_mentions(graph), blocked_time, exhaustive_time)
+
+    print 'Identical clusters. Total: blocked=%.4fs, exhaustive=%.4fs, speedup=%.1fx' % \
+          (total_blocked, total_exhaustive, total_exhaustive / total_blocked if total_blocked > 0 else np.inf)
+
+
+def benchmark_scales(scales, mentions_per_entity, vocabulary_size, max_exhaustive, seed):
+    """
+    Tabulates the running time of the clustering with and without blocking on synthetic stories of increasing size
+    :param scales: the scale factors of the number of sentences and entities
+    :param mentions_per_entity: the average number of mentions of each entity
+    :param vocabulary_size: the number of distinct words in the terms of the entities
+    :param max_exhaustive: the maximal number of mentions on which the exhaustive clustering is timed
+    :param seed: the random seed
+    """
+    rand = random.Random(seed)
+    vocabulary = [''.join([rand.choice(ALPHABET) for _ in range(rand.randint(3, 10))])
+                  for _ in range(vocabulary_size)]
+    stories_dir = tempfile.mkdtemp()
+    rows = []
+
+    try:
+        for scale_factor in scales:
+            annotator_dirs = generate_stories(os.path.join(stories_dir, 'scale_%d' % scale_factor), 1, 1, seed, 0.0,
+                                              num_sentences=BASE_SENTENCES * scale_factor,
+                                              num_entities=BASE_ENTITIES * scale_factor, num_propositions=0,
+                                              mentions_per_node=mentions_per_entity)
+            graph = load_graph_from_file(os.path.join(annotator_dirs[0], 'story_1.xml'))
+            replace_terms(graph, vocabulary, rand)
+            num_mentions = count_mentions(graph)
+
+            blocked_time, blocked_clusters = time_clustering(graph, True)
+            exhaustive_time = np.nan
+
+            if num_mentions <= max_exhaustive:
+                exhaustive_time, exhaustive_clusters = time_clustering(graph, False)
+                assert blocked_clusters == exhaustive_clusters, 'Different clusters in scale %d' % scale_factor
+
+            rows.append((num_mentions, blocked_time, exhaustive_time))
+            print 'Scale %d (%d mentions): blocked=%.4fs, exhaustive=%s' % \
+                  (scale_factor, num_mentions, blocked_time,
+                   '%.4fs' % exhaustive_time if not np.isnan(exhaustive_time) else 'skipped')
+    finally:
+        shutil.rmtree(stories_dir)
+
+    num_mentions, blocked_times, exhaustive_times = [np.array(column, dtype=float) for column in zip(*rows)]
+
+    # The exponent over all the scales, and over the two largest ones (the small scales hide a superlinear growth)
+    print '\n%-12s' % 'Mentions' + ''.join(['%10d' % mentions for mentions in num_mentions]) + \
+          '  exponent   largest'
+    for name, times in [('Blocked', blocked_times), ('Exhaustive', exhaustive_times)]:
+        known = ~np.isnan(times)
+        exponents = [estimate_exponent(num_mentions[known], times[known]),
+                     estimate_exponent(num_mentions[known][-2:], times[known][-2:])]
+        print '%-12s' % name + ''.join(['%10.4f' % t if not np.isnan(t) else '%10s' % '-' for t in times]) + \
+              ''.join(['%10.2f' % exponent if not np.isnan(exponent) else '%10s' % '-' for exponent in exponents])
+
+
+def replace_terms(graph, vocabulary, rand):
+    """
+    Replace the terms of each entity with random words (the mentions of an entity share its terms)
+    :param graph: the OKR graph
+    :param vocabulary: the words
+    :param rand: the random number generator
+    """
+    for entity in graph.entities.values():
+        terms = [' '.join(rand.sample(vocabulary, rand.randint(1, 2))) for _ in range(rand.randint(1, 2))]
+
+        for mention in entity.mentions.values():
+            mention.terms = rand.choice(terms)
+
+
+def time_clustering(graph, blocking):
+    """
+    Times the entity coreference clustering of a graph
+    :param graph: the OKR graph
+    :param blocking: whether to use blocking
+    :return: the running time and the clusters
+    """
+    start = time.time()
+    clusters = cluster_entity_mentions(graph, blocking)
+    return time.time() - start, clusters
+
+
+def count_mentions(graph):
+    """
+    Returns the number of entity mentions in the graph
+    :param graph: the OKR graph
+    """
+    return sum([len(entity.mentions) for entity in graph.entities.values()])
+
+
+if __name__ == '__main__':
+    main()
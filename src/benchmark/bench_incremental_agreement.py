@@ -0,0 +1,204 @@
+"""
+bench_incremental_agreement
+
+    Verifies the incremental agreement tracker (see incremental_agreement) against the full computation
+    (compute_entity_mention_agreement followed by compute_entity_coref_agreement, or their predicate counterparts)
+    on the given story pairs (e.g. the agreement data), and compares their running times:
+    1) The scores of the tracker built from the annotators' graphs are compared with the full computation.
+    2) Random edits (moving a mention to another cluster, adding it to another cluster, removing it from a cluster,
+    and merging two clusters) are applied to a copy of the graphs and to the tracker, and the scores are compared
+    after each edit.
+"""
+import os
+import sys
+import time
+import random
+sys.path.append('../common')
+sys.path.append('../agreement')
+
+import numpy as np
+
+from okr import *
+from docopt import docopt
+from entity_coref import compute_entity_coref_agreement
+from entity_mention import compute_entity_mention_agreement
+from predicate_coref import compute_predicate_coref_agreement
+from incremental_agreement import IncrementalAgreement
+from predicate_mention import compute_predicate_mention_agreement
+
+SUBTASKS = ['Entity', 'Predicate']
+METRICS = ['mentions', 'coreference MUC', 'coreference B^3', 'coreference CEAF_C', 'coreference MELA']
+
+
+def main():
+    """
+    Verifies the incremental agreement against the full computation
+    """
+    args = docopt("""Verifies the incremental agreement against the full computation
+
+    Usage:
+        bench_incremental_agreement.py <annotator1_dir> <annotator2_dir> [--edits=<n>] [--seed=<s>]
+
+        <annotator1_dir> = the directory containing the annotation files of the first annotator
+        (e.g. ../../data/agreement/annotator_1)
+        <annotator2_dir> = the directory containing the annotation files of the second annotator
+
+    Options:
+        --edits=<n>  the number of random edits applied to each story and subtask [default: 20]
+        --seed=<s>   the random seed [default: 0]
+    """)
+
+    annotator1_dir, annotator2_dir = args['<annotator1_dir>'], args['<annotator2_dir>']
+    rand = random.Random(int(args['--seed']))
+    total_incremental, total_full = 0.0, 0.0
+
+    for annotator1_file, annotator2_file in zip(sorted(os.listdir(annotator1_dir)), sorted(os.listdir(annotator2_dir))):
+        graphs = [load_graph_from_file(os.path.join(annotator1_dir, annotator1_file)),
+                  load_graph_from_file(os.path.join(annotator2_dir, annotator2_file))]
+
+        for subtask in SUBTASKS:
+            incremental_time, full_time = verify_story(graphs, subtask, int(args['--edits']), rand)
+            total_incremental += incremental_time
+            total_full += full_time
+            print '%s, %s: incremental=%.4fs, full=%.4fs' % (annotator1_file, subtask, incremental_time, full_time)
+
+    print 'Identical scores. Total: incremental=%.4fs, full=%.4fs, speedup=%.1fx' % \
+          (total_incremental, total_full, total_full / total_incremental if total_incremental > 0 else np.inf)
+
+
+def verify_story(graphs, subtask, num_edits, rand):
+    """
+    Verifies the incremental agreement of a story against the full computation, before and after random edits
+    :param graphs: the graphs of the two annotators
+    :param subtask: 'Entity' or 'Predicate'
+    :param num_edits: the number of random edits
+    :param rand: the random number generator
+    :return: the running time of the edits and scores with the tracker and with the full computation
+    """
+    graphs = [graph.clone() for graph in graphs]
+    tracker = IncrementalAgreement(graphs[0], graphs[1], subtask)
+    compare(tracker, graphs, subtask, 'the initial graphs')
+    incremental_time, full_time = 0.0, 0.0
+
+    for edit_index in range(num_edits):
+        annotator = rand.randint(0, 1)
+        nodes = graphs[annotator].entities if subtask == 'Entity' else graphs[annotator].propositions
+        tracker_edit = random_edit(nodes, rand)
+
+        if tracker_edit is None:
+            continue
+
+        start = time.time()
+        tracker_edit(tracker, annotator)
+        incremental_scores, _ = tracker.scores()
+        incremental_time += time.time() - start
+
+        start = time.time()
+        full = full_scores(graphs, subtask)
+        full_time += time.time() - start
+
+        assert_equal(incremental_scores, full, 'edit %d' % edit_index)
+
+    return incremental_time, full_time
+
+
+def random_edit(nodes, rand):
+    """
+    Applies a random edit to the nodes of a graph, and returns the same edit of the tracker
+    :param nodes: the graph's entities or propositions
+    :param rand: the random number generator
+    :return: a function that receives the tracker and the annotator and applies the edit, or None if there is
+    no edit to apply
+    """
+    node_ids = sorted([node_id for node_id, node in nodes.iteritems() if len(node.mentions) > 0])
+
+    if len(node_ids) < 2:
+        return None
+
+    node_id, other_id = rand.sample(node_ids, 2)
+    node, other = nodes[node_id], nodes[other_id]
+    mention_id = rand.choice(sorted(node.mentions.keys()))
+    mention = node.mentions[mention_id]
+    edit = rand.choice(['move', 'add', 'remove', 'merge'])
+
+    if edit == 'merge':
+        for mention_id, mention in node.mentions.items():
+            other.mentions[new_mention_id(other, mention_id)] = mention
+        node.mentions = {}
+        return lambda tracker, annotator: tracker.merge_clusters(annotator, node_id, other_id)
+
+    if edit in ['move', 'add']:
+        other.mentions[new_mention_id(other, mention_id)] = mention
+
+    if edit in ['move', 'remove']:
+        node.mentions.pop(mention_id)
+
+    # The mention may remain in its cluster, if the cluster has another mention with the same words
+    remains = str(mention) in set(map(str, node.mentions.values()))
+
+    if edit == 'remove' and not remains:
+        return lambda tracker, annotator: tracker.remove_mention(annotator, str(mention), node_id)
+    elif edit == 'move' and not remains:
+        return lambda tracker, annotator: tracker.move_mention(annotator, str(mention), other_id, node_id)
+    elif edit in ['move', 'add']:
+        return lambda tracker, annotator: tracker.add_mention(annotator, str(mention), other_id)
+
+    return lambda tracker, annotator: None
+
+
+def new_mention_id(node, mention_id):
+    """
+    Returns an ID for a mention added to a node, which is not used by the node's mentions
+    :param node: the entity or proposition
+    :param mention_id: the mention's ID in its original node
+    """
+    new_id = mention_id
+    while new_id in node.mentions:
+        new_id = '%s_' % new_id
+
+    return new_id
+
+
+def compare(tracker, graphs, subtask, description):
+    """
+    Compares the tracker's scores with the full computation
+    :param tracker: the incremental agreement tracker
+    :param graphs: the graphs of the two annotators
+    :param subtask: 'Entity' or 'Predicate'
+    :param description: the description of the graphs, for the error message
+    """
+    incremental_scores, _ = tracker.scores()
+    assert_equal(incremental_scores, full_scores(graphs, subtask), description)
+
+
+def full_scores(graphs, subtask):
+    """
+    Computes the mention and coreference agreement from scratch
+    :param graphs: the graphs of the two annotators
+    :param subtask: 'Entity' or 'Predicate'
+    :return: a dictionary of metric name to score, as IncrementalAgreement.scores
+    """
+    if subtask == 'Entity':
+        accuracy, consensual_graph1, consensual_graph2, _ = compute_entity_mention_agreement(*graphs)
+        coref_scores = compute_entity_coref_agreement(consensual_graph1, consensual_graph2)[:4]
+    else:
+        accuracy, consensual_graph1, consensual_graph2, _ = compute_predicate_mention_agreement(*graphs)
+        coref_scores = compute_predicate_coref_agreement(consensual_graph1, consensual_graph2)[:4]
+
+    return { subtask + ' ' + metric : score for metric, score in zip(METRICS, [accuracy] + list(coref_scores)) }
+
+
+def assert_equal(incremental_scores, full, description):
+    """
+    Asserts that the tracker's scores are equal to those of the full computation
+    :param incremental_scores: the tracker's scores
+    :param full: the scores of the full computation
+    :param description: the description of the graphs, for the error message
+    """
+    for name in full.keys():
+        assert np.isclose(incremental_scores[name], full[name]), \
+            '%s after %s: incremental=%.6f, full=%.6f' % (name, description, incremental_scores[name], full[name])
+
+
+if __name__ == '__main__':
+    main()
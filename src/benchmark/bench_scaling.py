@@ -0,0 +1,269 @@
+"""
+bench_scaling
+
+    Benchmarks graph loading, each agreement stage and each baseline evaluator on synthetic stories of
+    increasing size (see generate_synthetic_okr), and tabulates the running time against the story size,
+    with the estimated complexity exponent of each step (the slope of log time against log number of mentions).
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+sys.path.append('../common')
+sys.path.append('../agreement')
+sys.path.append('../baseline_system')
+
+import numpy as np
+
+from okr import *
+from docopt import docopt
+from generate_synthetic_okr import generate_stories
+from agreement_pipeline import STAGES, LOAD_STAGE
+
+# The story parameters of scale 1 (the sizes are multiplied by the scale)
+BASE_SENTENCES = 10
+BASE_ENTITIES = 10
+BASE_PROPOSITIONS = 8
+
+
+def main():
+    """
+    Benchmarks the agreement and baseline computations on synthetic stories of increasing size
+    """
+    args = docopt("""Benchmarks the agreement and baseline computations on synthetic stories of increasing size
+
+    Usage:
+        bench_scaling.py [--scales=<s>] [--repeat=<n>] [--mentions=<n>] [--seed=<s>] [--csv=<file>] [--no_baseline]
+
+    Options:
+        --scales=<s>    comma separated scale factors of the number of sentences, entities and propositions
+                        [default: 1,2,4,8]
+        --repeat=<n>    number of times to repeat each computation (the minimal time is reported) [default: 3]
+        --mentions=<n>  average number of mentions of each entity and proposition [default: 3]
+        --seed=<s>      the random seed [default: 0]
+        --csv=<file>    write the timings to this CSV file
+        --no_baseline   benchmark only the loading and the agreement stages
+    """)
+
+    scales = [int(scale) for scale in args['--scales'].split(',')]
+    repeat = int(args['--repeat'])
+    csv_file = os.path.abspath(args['--csv']) if args['--csv'] is not None else None
+
+    # The baseline components load their resources from paths relative to the baseline_system directory
+    os.chdir('../baseline_system')
+
+    stories_dir = tempfile.mkdtemp()
+    rows = []
+    evaluators = None
+
+    try:
+        for scale in scales:
+            annotator_dirs = generate_stories(os.path.join(stories_dir, 'scale_%d' % scale), 2, 2, int(args['--seed']),
+                                              0.1, num_sentences=BASE_SENTENCES * scale,
+                                              num_entities=BASE_ENTITIES * scale,
+                                              num_propositions=BASE_PROPOSITIONS * scale,
+                                              mentions_per_node=int(args['--mentions']))
+
+            # The first story is the benchmarked one, and the second (of the first scale) is used to tune
+            # the baseline entailment
+            annotator1_file, annotator2_file, val_file = [os.path.join(annotator_dir, story_file)
+                                                          for annotator_dir, story_file in
+                                                          [(annotator_dirs[0], 'story_1.xml'),
+                                                           (annotator_dirs[1], 'story_1.xml'),
+                                                           (annotator_dirs[0], 'story_2.xml')]]
+
+            timings, graph1 = time_agreement(annotator1_file, annotator2_file, repeat)
+
+            if not args['--no_baseline']:
+                if evaluators is None:
+                    evaluators = load_baseline_evaluators(load_graph_from_file(val_file))
+
+                timings += time_baseline(graph1, evaluators, repeat)
+
+            num_mentions = sum([len(node.mentions) for node in graph1.entities.values() + graph1.propositions.values()])
+            rows.append((scale, num_mentions, timings))
+            print 'Scale %d (%d mentions): %s' % (scale, num_mentions,
+                                                  ', '.join(['%s=%.4fs' % (name, t) for name, t in timings]))
+    finally:
+        shutil.rmtree(stories_dir)
+
+    print_table(rows)
+
+    if csv_file is not None:
+        write_csv(rows, csv_file)
+
+
+def time_agreement(annotator1_file, annotator2_file, repeat):
+    """
+    Times the graph loading and each agreement stage, in the order of the agreement pipeline
+    :param annotator1_file: the first annotator's file
+    :param annotator2_file: the second annotator's file
+    :param repeat: the number of repetitions
+    :return: a list of (step name, time), and the first annotator's graph
+    """
+    load_time, (graph1, graph2) = time_function(lambda: (load_graph_from_file(annotator1_file),
+                                                         load_graph_from_file(annotator2_file)), repeat)
+    timings = [('Loading', load_time / 2.0)]
+
+    # Each stage receives the outputs (e.g. the consensual graphs) of its input stages
+    outputs = {LOAD_STAGE: {'graphs': (graph1, graph2)}}
+    for stage in STAGES:
+        inputs = [outputs[input_name] for input_name in stage.inputs]
+        stage_time, (_, outputs[stage.name]) = time_function(lambda: stage.compute(*inputs), repeat)
+        timings.append((stage.name, stage_time))
+
+    return timings, graph1
+
+
+def time_baseline(test_graph, evaluators, repeat):
+    """
+    Times each baseline evaluator
+    :param test_graph: the gold standard graph
+    :param evaluators: a list of (evaluator name, function of the test graph)
+    :param repeat: the number of repetitions
+    :return: a list of (evaluator name, time)
+    """
+    timings = []
+
+    for name, evaluator in evaluators:
+        evaluator_time, _ = time_function(lambda: evaluator(test_graph), repeat)
+        timings.append(('Baseline ' + name, evaluator_time))
+
+    return timings
+
+
+def load_baseline_evaluators(val_graph):
+    """
+    Loads the baseline evaluators. Evaluators whose dependencies (e.g. spaCy) are not installed are skipped.
+    The spaCy models and stop words are loaded lazily (see spacy_models and annotation_cache), so the loaders of the
+    evaluators that use them load them here, which also keeps the loading out of the timing.
+    :param val_graph: the graph on which the entailment components are tuned
+    :return: a list of (evaluator name, function of the test graph)
+    """
+    def entity_mention():
+        from spacy_models import get_model
+        from eval_entity_mention import evaluate_entity_mention_graph, TOKENIZER
+        get_model(TOKENIZER)
+        return evaluate_entity_mention_graph
+
+    def entity_coref():
+        from annotation_cache import get_stop_words
+        from eval_entity_coref import evaluate_entity_coref_graph
+        get_stop_words()
+        return evaluate_entity_coref_graph
+
+    def predicate_mention():
+        from spacy_models import get_model
+        from prop_extraction import prop_extraction
+        from compute_baseline_subtasks import NOM_FILE
+        from eval_predicate_mention import evaluate_predicate_mention_graph
+        get_model()
+        prop_ex = prop_extraction()
+        return lambda graph: evaluate_predicate_mention_graph(graph, prop_ex, NOM_FILE)
+
+    def predicate_coref():
+        from spacy_models import get_model
+        from parsers.spacy_wrapper import spacy_wrapper
+        from eval_predicate_coref import evaluate_predicate_coref_graph
+        get_model()
+        parser = spacy_wrapper()
+        return lambda graph: evaluate_predicate_coref_graph(graph, parser)
+
+    def argument_mention():
+        from eval_argument_mention import evaluate_argument_mention_graph
+        return lambda graph: evaluate_argument_mention_graph(graph, 1)
+
+    def argument_coref():
+        from annotation_cache import get_stop_words
+        from eval_argument_coref import evaluate_argument_coref_graph
+        get_stop_words()
+        return evaluate_argument_coref_graph
+
+    def entity_entailment():
+        from eval_entailment_graph import tune_entity_entailment, evaluate_entity_entailment_graph
+        ent_ent = tune_entity_entailment([val_graph])
+        return lambda graph: evaluate_entity_entailment_graph(ent_ent, graph)
+
+    def predicate_entailment():
+        from eval_entailment_graph import tune_predicate_entailment, evaluate_predicate_entailment_graph
+        pred_ent = tune_predicate_entailment([val_graph])
+        return lambda graph: evaluate_predicate_entailment_graph(pred_ent, graph)
+
+    evaluators = []
+    for name, load_evaluator in [('entity mentions', entity_mention), ('entity coreference', entity_coref),
+                                 ('predicate mentions', predicate_mention), ('predicate coreference', predicate_coref),
+                                 ('argument mentions', argument_mention), ('argument coreference', argument_coref),
+                                 ('entity entailment', entity_entailment),
+                                 ('predicate entailment', predicate_entailment)]:
+        try:
+            evaluators.append((name, load_evaluator()))
+        except (ImportError, IOError, OSError) as e:
+            logging.warning('Skipping the baseline %s: %s' % (name, e))
+
+    return evaluators
+
+
+def time_function(func, repeat):
+    """
+    Times a function
+    :param func: the function (without arguments)
+    :param repeat: the number of repetitions
+    :return: the minimal running time and the function's result
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        times.append(time.time() - start)
+
+    return min(times), result
+
+
+def print_table(rows):
+    """
+    Print the running time of each step in each scale, and the estimated complexity exponent of each step
+    :param rows: a list of (scale, number of mentions, list of (step name, time))
+    """
+    names = [name for name, _ in rows[0][2]]
+    num_mentions = np.array([row[1] for row in rows], dtype=float)
+    times = np.array([[t for _, t in row[2]] for row in rows])
+
+    print '\n%-32s' % 'Mentions' + ''.join(['%10d' % mentions for mentions in num_mentions]) + '  exponent'
+
+    for name, step_times in zip(names, times.T):
+        exponent = estimate_exponent(num_mentions, step_times)
+        print '%-32s' % name + ''.join(['%10.4f' % t for t in step_times]) + \
+              ('%10.2f' % exponent if not np.isnan(exponent) else '%10s' % '-')
+
+
+def estimate_exponent(sizes, times):
+    """
+    Estimate the exponent k in time ~ size^k by fitting a line to log time against log size
+    :param sizes: the input sizes
+    :param times: the running times
+    :return: the exponent, or NaN if there are less than two measurable points
+    """
+    measurable = times > 0
+    if np.sum(measurable) < 2 or len(set(sizes[measurable])) < 2:
+        return np.nan
+
+    return np.polyfit(np.log(sizes[measurable]), np.log(times[measurable]), 1)[0]
+
+
+def write_csv(rows, csv_file):
+    """
+    Write the timings to a CSV file, with a row for each scale and a column for each step
+    :param rows: a list of (scale, number of mentions, list of (step name, time))
+    :param csv_file: the CSV file
+    """
+    with open(csv_file, 'w') as f_out:
+        f_out.write(','.join(['scale', 'mentions'] + [name for name, _ in rows[0][2]]) + '\n')
+
+        for scale, num_mentions, timings in rows:
+            f_out.write(','.join([str(scale), str(num_mentions)] + ['%.6f' % t for _, t in timings]) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+"""
+generate_synthetic_okr
+
+    Generates synthetic annotation files, in the XML format read by okr.load_graph_from_file (version 5),
+    for benchmarking the agreement and baseline computations on stories larger than the annotated ones.
+
+    Each story has random sentences in which the entity and proposition mentions are placed. Every proposition
+    mention is explicit, with a single-word predicate and entity mention arguments from the same sentence.
+    The first annotator's graph is the generated story, and the graphs of the other annotators are noisy copies of it:
+    entity mentions are moved to other entities, and proposition mentions and entailment edges are dropped.
+"""
+import os
+import copy
+import random
+import xml.etree.ElementTree as ET
+
+from docopt import docopt
+
+FILLER_VOCABULARY_SIZE = 1000
+ENTAILMENT_TYPES = ['0', '1', '2']  # Equal, the second entails the first, the first entails the second
+
+
+def main():
+    """
+    Generates synthetic annotation files
+    """
+    args = docopt("""Generates synthetic annotation files (one directory for each annotator)
+
+    Usage:
+        generate_synthetic_okr.py <output_dir> [--stories=<n>] [--annotators=<n>] [--sentences=<n>]
+                                  [--sentence_length=<n>] [--entities=<n>] [--propositions=<n>] [--mentions=<n>]
+                                  [--arguments=<n>] [--entailment=<p>] [--noise=<p>] [--seed=<s>]
+
+        <output_dir> = the directory in which the annotator directories are created
+
+    Options:
+        --stories=<n>          number of stories [default: 1]
+        --annotators=<n>       number of annotators [default: 2]
+        --sentences=<n>        number of sentences in each story [default: 10]
+        --sentence_length=<n>  number of tokens in each sentence [default: 25]
+        --entities=<n>         number of entities in each story [default: 10]
+        --propositions=<n>     number of propositions in each story [default: 8]
+        --mentions=<n>         average number of mentions of each entity and proposition [default: 3]
+        --arguments=<n>        maximal number of arguments of each proposition mention [default: 2]
+        --entailment=<p>       probability of an entailment edge between two terms of the same node [default: 0.3]
+        --noise=<p>            probability of changing each annotation in the other annotators' graphs [default: 0.1]
+        --seed=<s>             the random seed [default: 0]
+    """)
+
+    generate_stories(args['<output_dir>'], int(args['--stories']), int(args['--annotators']),
+                     int(args['--seed']), float(args['--noise']),
+                     num_sentences=int(args['--sentences']), sentence_length=int(args['--sentence_length']),
+                     num_entities=int(args['--entities']), num_propositions=int(args['--propositions']),
+                     mentions_per_node=int(args['--mentions']), num_arguments=int(args['--arguments']),
+                     entailment_density=float(args['--entailment']))
+
+
+def generate_stories(output_dir, num_stories, num_annotators, seed, noise, **story_params):
+    """
+    Generates synthetic stories and writes the graph of each annotator to <output_dir>/annotator_<i>/story_<j>.xml
+    :param output_dir: the directory in which the annotator directories are created
+    :param num_stories: the number of stories
+    :param num_annotators: the number of annotators
+    :param seed: the random seed
+    :param noise: the probability of changing each annotation in the other annotators' graphs
+    :param story_params: the parameters of generate_story
+    :return: the annotator directories
+    """
+    rand = random.Random(seed)
+    annotator_dirs = [os.path.join(output_dir, 'annotator_%d' % (annotator + 1)) for annotator in range(num_annotators)]
+
+    for annotator_dir in annotator_dirs:
+        if not os.path.exists(annotator_dir):
+            os.makedirs(annotator_dir)
+
+    for story_index in range(num_stories):
+        story = generate_story(rand, **story_params)
+
+        for annotator, annotator_dir in enumerate(annotator_dirs):
+            annotator_story = story if annotator == 0 else perturb_story(story, rand, noise)
+            write_story(annotator_story, os.path.join(annotator_dir, 'story_%d.xml' % (story_index + 1)))
+
+    return annotator_dirs
+
+
+def generate_story(rand, num_sentences=10, sentence_length=25, num_entities=10, num_propositions=8,
+                   mentions_per_node=3, num_arguments=2, entailment_density=0.3):
+    """
+    Generates a random story
+    :param rand: the random number generator
+    :param num_sentences: the number of sentences
+    :param sentence_length: the number of tokens in each sentence
+    :param num_entities: the number of entities
+    :param num_propositions: the number of propositions
+    :param mentions_per_node: the average number of mentions of each entity and proposition
+    :param num_arguments: the maximal number of arguments of each proposition mention
+    :param entailment_density: the probability of an entailment edge between two terms of the same node
+    :return: the story: a dictionary with the sentences, entities and propositions. A mention is a dictionary with
+    the sentence ID, the token indices, the words and (for proposition mentions) the argument entity mentions.
+    """
+    sentences = {sent_id: ['w%d' % rand.randint(0, FILLER_VOCABULARY_SIZE - 1) for _ in range(sentence_length)]
+                 for sent_id in range(1, num_sentences + 1)}
+    free_indices = {sent_id: set(range(sentence_length)) for sent_id in sentences.keys()}
+    mentions_by_sentence = {sent_id: [] for sent_id in sentences.keys()}
+
+    # Entities: each mention is one of the entity's terms
+    entities = []
+    for entity_index in range(num_entities):
+        terms = [' '.join(['e%dt%dw%d' % (entity_index, term_index, word_index)
+                           for word_index in range(rand.randint(1, 2))])
+                 for term_index in range(max(1, mentions_per_node // 2))]
+
+        mentions = []
+        for _ in range(rand.randint(1, 2 * mentions_per_node - 1)):
+            mention = place_mention(rand, sentences, free_indices, rand.choice(terms).split())
+            if mention is not None:
+                mentions.append(mention)
+                mentions_by_sentence[mention['sentence']].append(mention)
+
+        if len(mentions) > 0:
+            entities.append({'name': terms[0], 'mentions': mentions,
+                             'entailment': random_entailment_edges(rand, terms, entailment_density)})
+
+    # Propositions: a single word predicate with arguments from the same sentence
+    propositions = []
+    for proposition_index in range(num_propositions):
+        terms = ['p%dt%d' % (proposition_index, term_index) for term_index in range(max(1, mentions_per_node // 2))]
+
+        mentions = []
+        for _ in range(rand.randint(1, 2 * mentions_per_node - 1)):
+            mention = place_mention(rand, sentences, free_indices, [rand.choice(terms)])
+            if mention is None:
+                continue
+
+            candidates = mentions_by_sentence[mention['sentence']]
+            mention['args'] = rand.sample(candidates, min(num_arguments, len(candidates)))
+            mention['template'] = get_template(mention)
+            mentions.append(mention)
+
+        if len(mentions) > 0:
+            templates = sorted(set([mention['template'] for mention in mentions]))
+            propositions.append({'name': terms[0], 'mentions': mentions,
+                                 'entailment': random_entailment_edges(rand, templates, entailment_density)})
+
+    return {'sentences': sentences, 'entities': entities, 'propositions': propositions}
+
+
+def place_mention(rand, sentences, free_indices, words, attempts=10):
+    """
+    Places a mention in consecutive free tokens of a random sentence
+    :param rand: the random number generator
+    :param sentences: the sentences (the mention words are written to the sentence)
+    :param free_indices: the free token indices of each sentence
+    :param words: the mention words
+    :param attempts: the number of sentences to try
+    :return: the mention, or None if no free place was found
+    """
+    for _ in range(attempts):
+        sent_id = rand.choice(sentences.keys())
+        starts = [start for start in range(len(sentences[sent_id]) - len(words) + 1)
+                  if all([index in free_indices[sent_id] for index in range(start, start + len(words))])]
+
+        if len(starts) == 0:
+            continue
+
+        start = rand.choice(starts)
+        indices = range(start, start + len(words))
+        for index, word in zip(indices, words):
+            sentences[sent_id][index] = word
+            free_indices[sent_id].remove(index)
+
+        return {'sentence': sent_id, 'indices': indices, 'words': words}
+
+    return None
+
+
+def get_template(prop_mention):
+    """
+    Returns the template of a proposition mention, as computed by okr.set_template, e.g. [a1] p0t0 [a2]
+    :param prop_mention: the proposition mention
+    :return: the template
+    """
+    words_list = zip(prop_mention['indices'], prop_mention['words'])
+    words_list += [(arg['indices'][0], '[a%d]' % (arg_index + 1)) for arg_index, arg in enumerate(prop_mention['args'])]
+    words_list.sort(key=lambda x: x[0])
+    return ' '.join([word for index, word in words_list])
+
+
+def random_entailment_edges(rand, terms, density):
+    """
+    Returns random entailment edges between the terms of a node
+    :param rand: the random number generator
+    :param terms: the node's terms (or templates)
+    :param density: the probability of an edge between two terms
+    :return: a list of (entailment type, term1, term2) edges
+    """
+    return [(rand.choice(ENTAILMENT_TYPES), term1, term2)
+            for i, term1 in enumerate(terms) for term2 in terms[i + 1:] if rand.random() < density]
+
+
+def perturb_story(story, rand, noise):
+    """
+    Returns a noisy copy of the story, as annotated by another annotator
+    :param story: the story
+    :param rand: the random number generator
+    :param noise: the probability of changing each annotation
+    :return: the noisy copy of the story
+    """
+    story = copy.deepcopy(story)
+    entities = story['entities']
+
+    # Move entity mentions to other entities (the proposition arguments still refer to the same mentions)
+    if len(entities) > 1:
+        for entity in entities:
+            for mention in list(entity['mentions']):
+                if rand.random() < noise:
+                    entity['mentions'].remove(mention)
+                    rand.choice([other for other in entities if other is not entity])['mentions'].append(mention)
+
+    story['entities'] = [entity for entity in entities if len(entity['mentions']) > 0]
+
+    # Drop proposition mentions
+    for proposition in story['propositions']:
+        proposition['mentions'] = [mention for mention in proposition['mentions'] if rand.random() >= noise]
+
+    story['propositions'] = [proposition for proposition in story['propositions'] if len(proposition['mentions']) > 0]
+
+    # Drop entailment edges
+    for node in story['entities'] + story['propositions']:
+        node['entailment'] = [edge for edge in node['entailment'] if rand.random() >= noise]
+
+    return story
+
+
+def write_story(story, output_file):
+    """
+    Writes the story in the annotation XML format
+    :param story: the story
+    :param output_file: the XML file
+    """
+    root = ET.Element('root', ver='5.1')
+    add_text(root, 'originalFile', output_file)
+    add_text(root, 'time', '0')
+
+    sentences_node = ET.SubElement(root, 'sentences')
+    add_text(sentences_node, 'currentSentenceID', '1')
+
+    for sent_id, tokens in sorted(story['sentences'].iteritems()):
+        sentence_node = ET.SubElement(sentences_node, 'sentence')
+        add_text(sentence_node, 'id', str(sent_id))
+        add_text(sentence_node, 'name', 'tweet%d' % sent_id)
+        add_text(sentence_node, 'progress', '0')
+        tokens_node = ET.SubElement(sentence_node, 'tokens')
+
+        for index, token in enumerate(tokens):
+            token_node = ET.SubElement(tokens_node, 'token')
+            add_text(token_node, 'id', str(index))
+            add_text(token_node, 'str', token)
+            add_text(token_node, 'isIrrelevant', 'false')
+
+    type_managers = ET.SubElement(root, 'typeManagers')
+    proposition_manager = ET.SubElement(type_managers, 'typeManager')
+    entity_manager = ET.SubElement(type_managers, 'typeManager')
+
+    # The IDs of the entity mentions, for the proposition arguments
+    mention_ids = {id(mention): (entity_id, mention_id)
+                   for entity_id, entity in enumerate(story['entities'])
+                   for mention_id, mention in enumerate(entity['mentions'])}
+
+    add_text(proposition_manager, 'typeKind', 'Proposition')
+    add_text(proposition_manager, 'lastEntailmentTypeIndex', str(len(story['propositions'])))
+    types_node = ET.SubElement(proposition_manager, 'types')
+
+    for prop_id, proposition in enumerate(story['propositions']):
+        type_node = ET.SubElement(types_node, 'type')
+        add_text(type_node, 'id', str(prop_id))
+        add_text(type_node, 'name', proposition['name'])
+        ET.SubElement(type_node, 'attributor')
+        mentions_node = ET.SubElement(type_node, 'mentions')
+
+        for mention_id, mention in enumerate(proposition['mentions']):
+            mention_node = add_mention(mentions_node, mention_id, mention)
+            add_text(mention_node, 'isExplicit', 'true')
+            args_node = ET.SubElement(mention_node, 'args')
+
+            for arg_id, arg in enumerate(mention['args']):
+                arg_node = ET.SubElement(args_node, 'arg')
+                add_text(arg_node, 'id', str(arg_id))
+                add_text(arg_node, 'description', 'argument %d' % arg_id)
+                id_node = ET.SubElement(ET.SubElement(arg_node, 'mention'), 'ID')
+                add_text(id_node, 'kind', 'Entity')
+                add_text(id_node, 'typeID', str(mention_ids[id(arg)][0]))
+                add_text(id_node, 'mentionID', str(mention_ids[id(arg)][1]))
+
+            add_text(mention_node, 'isPronoun', 'false')
+
+        templates = sorted(set([mention['template'] for mention in proposition['mentions']]))
+        add_entailment_info(type_node, templates, proposition['entailment'])
+
+    add_text(entity_manager, 'typeKind', 'Entity')
+    add_text(entity_manager, 'lastEntailmentTypeIndex', str(len(story['entities'])))
+    types_node = ET.SubElement(entity_manager, 'types')
+
+    for entity_id, entity in enumerate(story['entities']):
+        type_node = ET.SubElement(types_node, 'type')
+        add_text(type_node, 'id', str(entity_id))
+        add_text(type_node, 'name', entity['name'])
+        mentions_node = ET.SubElement(type_node, 'mentions')
+
+        for mention_id, mention in enumerate(entity['mentions']):
+            mention_node = add_mention(mentions_node, mention_id, mention)
+            add_text(mention_node, 'isPronoun', 'false')
+
+        terms = sorted(set([' '.join(mention['words']) for mention in entity['mentions']]))
+        add_entailment_info(type_node, terms, entity['entailment'])
+
+    ET.ElementTree(root).write(output_file, encoding='utf-8')
+
+
+def add_mention(mentions_node, mention_id, mention):
+    """
+    Adds the common elements of an entity or proposition mention
+    :param mentions_node: the mentions element
+    :param mention_id: the mention ID
+    :param mention: the mention
+    :return: the mention element
+    """
+    mention_node = ET.SubElement(mentions_node, 'mention')
+    add_text(mention_node, 'id', str(mention_id))
+    add_text(mention_node, 'sentenceId', str(mention['sentence']))
+    ET.SubElement(mention_node, 'comment')
+    tokens_node = ET.SubElement(mention_node, 'tokens')
+
+    for index, word in zip(mention['indices'], mention['words']):
+        token_node = ET.SubElement(tokens_node, 'token')
+        add_text(token_node, 'ind', str(index))
+        add_text(token_node, 'word', word)
+
+    return mention_node
+
+
+def add_entailment_info(type_node, terms, edges):
+    """
+    Adds the entailment graph of an entity or proposition. Edges between terms that are not in the node
+    (e.g. after moving the mentions of a term to another entity) are dropped.
+    :param type_node: the entity or proposition element
+    :param terms: the node's terms (or templates)
+    :param edges: a list of (entailment type, term1, term2) edges
+    """
+    entailment_node = ET.SubElement(type_node, 'entailmentInfo')
+    controls_node = ET.SubElement(entailment_node, 'controls')
+    connections_node = ET.SubElement(entailment_node, 'connections')
+    term_ids = {term: term_id for term_id, term in enumerate(terms)}
+
+    for term, term_id in sorted(term_ids.iteritems(), key=lambda x: x[1]):
+        control_node = ET.SubElement(controls_node, 'control')
+        add_text(control_node, 'id', str(term_id))
+        add_text(control_node, 'text', term)
+
+    for entailment_type, term1, term2 in edges:
+        if term1 in term_ids and term2 in term_ids:
+            connection_node = ET.SubElement(connections_node, 'connection')
+            add_text(connection_node, 'type', entailment_type)
+            add_text(connection_node, 'control1', str(term_ids[term1]))
+            add_text(connection_node, 'control2', str(term_ids[term2]))
+
+
+def add_text(parent, tag, text):
+    """
+    Adds a child element with text
+    :param parent: the parent element
+    :param tag: the child's tag
+    :param text: the child's text
+    :return: the child element
+    """
+    child = ET.SubElement(parent, tag)
+    child.text = text
+    return child
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,10 @@ import os
 import sys
 import itertools
 sys.path.append('../common')
-import spacy
 import numpy as np
-from spacy.en import English
 import re
-nlp = English()
-def replace_tokenizer(nlp):
-    old_tokenizer = nlp.tokenizer
-    nlp.tokenizer = lambda string: old_tokenizer.tokens_from_list(string.split())
-
-replace_tokenizer(nlp)
+from spacy_models import WHITESPACE
+from annotation_cache import annotate_sentence
 
 NOUNS=[u'NNP',u'NN', u'NNS', u'NNPS',u'CD',u'PRP',u'PRP$']
 ADJECTIVES=[u'JJ',u'JJR',u'JJS']
@@ -137,7 +131,7 @@ Proposition_Nodes={}
 Edge_Mentions=[]
 for p_id,p in okr.propositions.iteritems():
 	new_p_id="P"+str(p_id)
-	prop_mentions={m_num:[[num,pos.orth_,pos.tag_] for num,pos in enumerate(nlp(unicode(" ".join(okr.sentences[m.sentence_id])))) if num in m.indices] for m_num,m in p.mentions.iteritems() if m.is_explicit} 
+	prop_mentions={m_num:[[num,pos.orth_,pos.tag_] for num,pos in enumerate(annotate_sentence(unicode(" ".join(okr.sentences[m.sentence_id])), WHITESPACE)) if num in m.indices] for m_num,m in p.mentions.iteritems() if m.is_explicit} 
 	new_terms={m_num:" ".join([str(word[1]) for word in m if word[2] not in S_WORDS])for m_num,m in prop_mentions.iteritems()}
 	new_indices={m_num:[word[0] for word in m if word[2] not in S_WORDS ]for m_num,m in prop_mentions.iteritems()}
 	new_terms_all=set([m for m in new_terms.values()])
@@ -0,0 +1,147 @@
+"""
+Streaming aggregation of the per story results -- used both in agreement and baseline computations.
+
+Each story contributes its score vector (for the macro average) and its micro counts (for the micro average).
+Only the sums are kept, so the memory is constant in the number of stories, and aggregators computed on
+different subsets of the stories (e.g. by parallel workers) can be merged.
+
+The micro counts of a metric are an array of shape (k, 2) or (k, 4), with one row for each direction
+(e.g. each annotator taken as the gold):
+1) (numerator, denominator) - the micro score is the average ratio, e.g. mention accuracy.
+2) (recall_num, recall_den, precision_num, precision_den) - the micro score is the average F1, e.g. MUC, as
+returned by muc_micro, bcubed_micro and ceaf_micro.
+The MELA score is micro-averaged as the average of the micro MUC, B-CUBED and CEAF scores.
+"""
+
+import numpy as np
+
+COREF_METRICS = ['MUC', 'B^3', 'CEAF_C']
+
+
+class ScoreAggregator:
+    """
+    Accumulates the scores and micro counts of the stories, and computes their macro and micro averages
+    """
+
+    def __init__(self, metric_names):
+        self.metric_names = metric_names  # The names of the metrics, in the order of the score vectors
+        self.num_stories = 0
+        self.score_sums = np.zeros(len(metric_names))
+        self.count_sums = {}  # Dictionary of metric name to the sum of its micro counts
+
+    def add(self, scores, counts):
+        """
+        Add the results of a story
+        :param scores: the story's score vector
+        :param counts: dictionary of metric name to the story's micro counts
+        """
+        self.num_stories += 1
+        self.score_sums += np.asarray(scores, dtype=float)
+
+        for name, story_counts in counts.iteritems():
+            self.count_sums[name] = self.count_sums.get(name, 0.0) + np.asarray(story_counts, dtype=float)
+
+    def merge(self, other):
+        """
+        Add the results accumulated by another aggregator
+        :param other: the other aggregator
+        :return: this aggregator
+        """
+        self.num_stories += other.num_stories
+        self.score_sums += other.score_sums
+
+        for name, other_counts in other.count_sums.iteritems():
+            self.count_sums[name] = self.count_sums.get(name, 0.0) + other_counts
+
+        return self
+
+    def macro_average(self):
+        """
+        Returns the average score of each metric over the stories
+        """
+        return self.score_sums / self.num_stories
+
+    def micro_average(self):
+        """
+        Returns the score of each metric computed from the micro counts summed over the stories
+        """
+        return micro_scores(self.count_sums, self.metric_names)
+
+
+def coref_counts_by_metric(subtask, counts):
+    """
+    Split the micro counts of a coreference subtask by metric
+    :param subtask: the subtask name, e.g. 'Entity coreference'
+    :param counts: the micro counts of MUC, B-CUBED and CEAF (in this order)
+    :return: a dictionary of metric name to its micro counts
+    """
+    return {subtask + ' ' + metric: metric_counts for metric, metric_counts in zip(COREF_METRICS, counts)}
+
+
+def micro_scores(count_sums, metric_names):
+    """
+    Compute the micro scores from the summed micro counts
+    :param count_sums: dictionary of metric name to its summed micro counts. The counts may have leading
+    dimensions (e.g. bootstrap samples), in which case the scores have the same leading dimensions.
+    :param metric_names: the names of the metrics
+    :return: the micro score of each metric (NaN for metrics without counts), in the order of metric_names
+    """
+    scores = {name: micro_score(counts) for name, counts in count_sums.iteritems()}
+    shape = scores.values()[0].shape if len(scores) > 0 else ()
+
+    for name in metric_names:
+
+        # MELA is the average of the three coreference scores
+        if name.endswith(' MELA'):
+            components = [name[:-len('MELA')] + metric for metric in COREF_METRICS]
+            if all([component in scores for component in components]):
+                scores[name] = np.mean([scores[component] for component in components], axis=0)
+
+    return np.stack([scores[name] if name in scores else np.full(shape, np.nan) for name in metric_names], axis=-1)
+
+
+def micro_score(counts):
+    """
+    Compute the micro score of a metric from its summed micro counts
+    :param counts: an array of shape (..., k, 2) of (numerator, denominator) or an array of shape (..., k, 4) of
+    (recall_num, recall_den, precision_num, precision_den)
+    :return: the micro score, averaged over the k directions
+    """
+    counts = np.asarray(counts, dtype=float)
+
+    if counts.shape[-1] == 2:
+        return np.mean(safe_divide(counts[..., 0], counts[..., 1]), axis=-1)
+
+    recall = safe_divide(counts[..., 0], counts[..., 1])
+    precision = safe_divide(counts[..., 2], counts[..., 3])
+    f1 = f1_score(precision, recall)
+
+    # Nothing to predict and nothing predicted (e.g. no links) - the score should be one
+    f1[(counts[..., 1] == 0) & (counts[..., 3] == 0)] = 1.0
+
+    return np.mean(f1, axis=-1)
+
+
+def safe_divide(numerators, denominators):
+    """
+    Divide element-wise, returning 0.0 where the denominator is 0
+    :param numerators: the numerators
+    :param denominators: the denominators
+    :return: the ratios
+    """
+    numerators, denominators = np.broadcast_arrays(np.asarray(numerators, dtype=float),
+                                                   np.asarray(denominators, dtype=float))
+    ratios = np.zeros(numerators.shape)
+    nonzero = denominators > 0
+    ratios[nonzero] = numerators[nonzero] / denominators[nonzero]
+    return ratios
+
+
+def f1_score(precision, recall):
+    """
+    Compute the F1 score element-wise, returning 0.0 where both precision and recall are 0
+    :param precision: the precision scores
+    :param recall: the recall scores
+    :return: the F1 scores
+    """
+    return safe_divide(2 * precision * recall, precision + recall)
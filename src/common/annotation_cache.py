@@ -0,0 +1,377 @@
+"""
+A persistent store of the linguistic annotations of sentences -- used by the baseline components and the V2
+conversion instead of parsing with spaCy directly.
+
+Each sentence is parsed once, and its tokens, tags, lemmas, dependency heads and labels, and named entities are
+recorded. An annotation is keyed by the hash of the sentence text, the tokenizer configuration (see spacy_models)
+and the spaCy and model versions, so it is reused by all the components that parse the same sentence (e.g. the
+proposition extraction and the predicate coreference), and - with a cache directory - by later runs, which then
+don't load spaCy at all. Only the sentences missing from the cache are parsed, in batches.
+
+The cache directory contains segment files, each written by one run with the annotations it parsed, in a
+compact columnar format (NumPy .npz): the token columns of all the sentences are concatenated, and the string
+columns are encoded as indices into a table of the distinct strings. Runs on several machines can share the
+directory, and the segments are merged into one when there are too many of them (a segment that another run
+merged and removed in the meantime is skipped).
+
+spaCy's stop words (used by the entity coreference) are kept in the cache directory as well, with the same versions.
+
+The cache directory is set by set_cache_dir or by the OKR_ANNOTATION_CACHE environment variable (default:
+annotations are kept in memory only), and the new annotations are written when the process exits.
+"""
+
+import os
+import time
+import errno
+import codecs
+import atexit
+import numpy as np
+
+from result_cache import hash_strings
+from spacy_models import get_model, DEFAULT
+
+BATCH_SIZE = 1000  # The number of sentences parsed together by nlp.pipe
+MAX_SEGMENTS = 8  # The number of segment files above which they are merged into one
+SEGMENT_SUFFIX = '.npz'
+STOP_WORDS_PREFIX = 'stop_words.'
+
+# The token columns of an annotation. The string columns are stored as indices into the strings table.
+STRING_COLUMNS = ['words', 'tags', 'lemmas', 'deps', 'ent_types']
+NUMERIC_COLUMNS = [('heads', np.int32), ('ent_iob', np.int8), ('is_stop', np.bool_), ('idx', np.int32)]
+COLUMNS = STRING_COLUMNS + [name for name, _ in NUMERIC_COLUMNS]
+
+cache = None  # The process-wide annotation cache
+
+
+def annotate(texts, tokenizer=DEFAULT, batch_size=BATCH_SIZE):
+    """
+    Returns the annotations of the sentences, parsing only the sentences missing from the cache
+    :param texts: the sentences (unicode)
+    :param tokenizer: the tokenizer configuration (see spacy_models)
+    :param batch_size: the number of sentences parsed together
+    :return: the annotated sentences (see annotated_sentence)
+    """
+    return get_cache().annotate(texts, tokenizer, batch_size)
+
+
+def annotate_sentence(text, tokenizer=DEFAULT):
+    """
+    Returns the annotation of a sentence, parsing it only if it is missing from the cache
+    :param text: the sentence (unicode)
+    :param tokenizer: the tokenizer configuration (see spacy_models)
+    :return: the annotated sentence (see annotated_sentence)
+    """
+    return get_cache().annotate([text], tokenizer)[0]
+
+
+def get_stop_words():
+    """
+    Returns spaCy's stop words, from the cache directory if they were stored there
+    """
+    return get_cache().get_stop_words()
+
+
+def get_cache():
+    """
+    Returns the process-wide annotation cache, in the directory of the OKR_ANNOTATION_CACHE environment variable
+    if set_cache_dir was not called
+    """
+    if cache is None:
+        set_cache_dir(os.environ.get('OKR_ANNOTATION_CACHE'))
+
+    return cache
+
+
+def set_cache_dir(cache_dir):
+    """
+    Set the directory of the process-wide annotation cache
+    :param cache_dir: the cache directory (None to keep the annotations in memory only)
+    """
+    global cache
+
+    if cache is not None:
+        cache.save()
+
+    cache = AnnotationCache(cache_dir)
+
+
+@atexit.register
+def save_cache():
+    """
+    Write the annotations parsed by this process to the cache directory
+    """
+    if cache is not None:
+        cache.save()
+
+
+class AnnotationCache:
+    """
+    The annotations of sentences, loaded from the segment files in the cache directory and parsed on cache misses
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.version = None
+        self.segments = []  # The paths of the loaded segment files
+        self.stored = {}  # Dictionary of key to the columns of a loaded segment and the index of the sentence
+        self.new = {}  # Dictionary of key to the annotation columns of sentences parsed by this process
+        self.stop_words = None
+
+        if cache_dir is not None and os.path.isdir(cache_dir):
+            for file_name in sorted(os.listdir(cache_dir)):
+                if file_name.endswith(SEGMENT_SUFFIX):
+                    self.load_segment(os.path.join(cache_dir, file_name))
+
+    def annotate(self, texts, tokenizer=DEFAULT, batch_size=BATCH_SIZE):
+        """
+        Returns the annotations of the sentences, parsing only the sentences missing from the cache
+        :param texts: the sentences (unicode)
+        :param tokenizer: the tokenizer configuration (see spacy_models)
+        :param batch_size: the number of sentences parsed together
+        :return: the annotated sentences (see annotated_sentence)
+        """
+        keys = [self.key(text, tokenizer) for text in texts]
+
+        # Parse the missing sentences (each once, even if it appears several times)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.new and key not in self.stored:
+                missing[key] = text
+
+        if len(missing) > 0:
+            missing_keys = missing.keys()
+            docs = get_model(tokenizer).pipe([missing[key] for key in missing_keys], batch_size=batch_size)
+
+            for key, doc in zip(missing_keys, docs):
+                self.new[key] = doc_columns(doc)
+
+        return [annotated_sentence(self.get_columns(key)) for key in keys]
+
+    def get_stop_words(self):
+        """
+        Returns spaCy's stop words, importing spaCy only if they are not stored in the cache directory
+        :return: the set of stop words
+        """
+        if self.stop_words is not None:
+            return self.stop_words
+
+        if self.version is None:
+            self.version = model_version()
+
+        stop_words_file = None
+        if self.cache_dir is not None:
+            stop_words_file = os.path.join(self.cache_dir, STOP_WORDS_PREFIX + hash_strings([self.version]) + '.txt')
+
+        if stop_words_file is not None and os.path.isfile(stop_words_file):
+            with codecs.open(stop_words_file, 'r', 'utf-8') as f_in:
+                self.stop_words = set(f_in.read().splitlines())
+        else:
+            from spacy.en import STOP_WORDS
+            self.stop_words = set(STOP_WORDS)
+
+            if stop_words_file is not None:
+                write_stop_words(stop_words_file, self.stop_words)
+
+        return self.stop_words
+
+    def get_columns(self, key):
+        """
+        Returns the annotation columns of a sentence
+        :param key: the sentence key
+        :return: the values of each column (see COLUMNS)
+        """
+        if key in self.new:
+            return self.new[key]
+
+        columns, index = self.stored[key]
+        start, end = columns['offsets'][index], columns['offsets'][index + 1]
+        strings = columns['strings']
+
+        return [[strings[string_id] for string_id in columns[name][start:end]] for name in STRING_COLUMNS] + \
+               [columns[name][start:end].tolist() for name, _ in NUMERIC_COLUMNS]
+
+    def key(self, text, tokenizer):
+        """
+        Returns the key of a sentence annotation
+        :param text: the sentence
+        :param tokenizer: the tokenizer configuration
+        """
+        if self.version is None:
+            self.version = model_version()
+
+        return hash_strings([tokenizer, self.version, text.encode('utf-8')])
+
+    def load_segment(self, segment_file):
+        """
+        Load the annotations of a segment file
+        :param segment_file: the segment file
+        """
+        try:
+            with np.load(segment_file) as data:
+                columns = {name: data[name] for name in data.files}
+
+        # The segment was merged and removed by another process after the directory was listed
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return
+
+        columns['strings'] = columns['strings'].tolist()
+
+        for index, key in enumerate(columns['keys'].tolist()):
+            self.stored[key] = (columns, index)
+
+        self.segments.append(segment_file)
+
+    def save(self):
+        """
+        Write the annotations parsed by this process to a new segment file, or merge all the segments into one
+        if there are too many of them
+        """
+        if self.cache_dir is None or len(self.new) == 0:
+            return
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        segment_file = os.path.join(self.cache_dir, 'annotations.%d.%d%s' % (time.time() * 1000, os.getpid(),
+                                                                              SEGMENT_SUFFIX))
+
+        if len(self.segments) < MAX_SEGMENTS:
+            write_segment(segment_file, self.new)
+        else:
+            annotations = {key: self.get_columns(key) for key in self.stored}
+            annotations.update(self.new)
+            write_segment(segment_file, annotations)
+
+            # Another process may be merging the same segments
+            for old_segment_file in self.segments:
+                try:
+                    os.remove(old_segment_file)
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+
+            self.segments, self.stored = [], {}
+
+        self.new = {}
+        self.load_segment(segment_file)
+
+
+def doc_columns(doc):
+    """
+    Returns the annotation columns of a spaCy parse
+    :param doc: the parsed sentence
+    :return: the values of each column (see COLUMNS)
+    """
+    return [[token.orth_ for token in doc], [token.tag_ for token in doc], [token.lemma_ for token in doc],
+            [token.dep_ for token in doc], [token.ent_type_ for token in doc], [token.head.i for token in doc],
+            [token.ent_iob for token in doc], [bool(token.is_stop) for token in doc], [token.idx for token in doc]]
+
+
+def write_segment(segment_file, annotations):
+    """
+    Write annotations to a segment file
+    :param segment_file: the segment file
+    :param annotations: dictionary of key to the annotation columns of a sentence
+    """
+    keys = sorted(annotations.keys())
+    strings = {}  # Dictionary of string to its index in the strings table
+    values = {name: [] for name in COLUMNS}
+    offsets = [0]
+
+    for key in keys:
+        for name, column in zip(COLUMNS, annotations[key]):
+            if name in STRING_COLUMNS:
+                column = [strings.setdefault(string, len(strings)) for string in column]
+
+            values[name].extend(column)
+
+        offsets.append(offsets[-1] + len(annotations[key][0]))
+
+    arrays = {name: np.array(values[name], dtype=np.int32) for name in STRING_COLUMNS}
+    arrays.update({name: np.array(values[name], dtype=dtype) for name, dtype in NUMERIC_COLUMNS})
+    arrays['keys'] = np.array(keys, dtype='S40')
+    arrays['offsets'] = np.array(offsets, dtype=np.int64)
+    arrays['strings'] = np.array(sorted(strings, key=strings.get) or [u''], dtype=np.unicode_)
+
+    temp_file = '%s.%d.tmp' % (segment_file, os.getpid())
+    with open(temp_file, 'wb') as f_out:
+        np.savez_compressed(f_out, **arrays)
+
+    os.rename(temp_file, segment_file)
+
+
+def write_stop_words(stop_words_file, stop_words):
+    """
+    Write the stop words to a file, one per line
+    :param stop_words_file: the stop words file
+    :param stop_words: the stop words
+    """
+    directory = os.path.dirname(stop_words_file)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    temp_file = '%s.%d.tmp' % (stop_words_file, os.getpid())
+    with codecs.open(temp_file, 'w', 'utf-8') as f_out:
+        f_out.write('\n'.join(sorted(stop_words)))
+
+    os.rename(temp_file, stop_words_file)
+
+
+class AnnotatedToken:
+    """
+    A token of an annotated sentence, with the attributes of a spaCy token used by the baseline components
+    """
+
+    def __init__(self, i, word, tag, lemma, dep, ent_type, ent_iob, is_stop, idx):
+        self.i = i
+        self.orth_ = self.text = word
+        self.tag_ = tag
+        self.lemma_ = lemma
+        self.dep_ = dep
+        self.ent_type_ = ent_type
+        self.ent_iob = ent_iob
+        self.is_stop = is_stop
+        self.idx = idx
+        self.head = self
+        self.children = []
+
+
+def annotated_sentence(columns):
+    """
+    Returns an annotated sentence
+    :param columns: the values of each annotation column (see COLUMNS)
+    :return: the list of tokens (AnnotatedToken), whose heads and children are the tokens themselves
+    (the root is its own head, as in spaCy)
+    """
+    words, tags, lemmas, deps, ent_types, heads, ent_iob, is_stop, idx = columns
+    tokens = [AnnotatedToken(i, *token) for i, token in
+              enumerate(zip(words, tags, lemmas, deps, ent_types, ent_iob, is_stop, idx))]
+
+    for token, head in zip(tokens, heads):
+        token.head = tokens[head]
+
+        if head != token.i:
+            tokens[head].children.append(token)
+
+    return tokens
+
+
+def model_version():
+    """
+    Returns the versions of spaCy and of the installed English models, without importing spaCy
+    """
+    import pkg_resources
+
+    try:
+        distribution = pkg_resources.get_distribution('spacy')
+    except pkg_resources.DistributionNotFound:
+        return 'none'
+
+    data_dir = os.path.join(distribution.location, 'spacy', 'data')
+    models = sorted(os.listdir(data_dir)) if os.path.isdir(data_dir) else []
+    models += sorted(['%s-%s' % (package.project_name, package.version) for package in pkg_resources.working_set
+                      if package.project_name.replace('_', '-').startswith(('en-core-', 'en-depent-'))])
+
+    return ' '.join(['spacy-' + distribution.version] + models)
@@ -0,0 +1,105 @@
+"""
+Bootstrap confidence intervals for the scores averaged over stories -- used both in agreement and baseline
+computations.
+
+The metrics are not recomputed for each bootstrap sample. Each story is summarized once, either by its score
+vector (macro average) or by its micro counts (numerators and denominators, as returned by muc_micro,
+bcubed_micro and ceaf_micro). The bootstrap samples are drawn as NumPy index arrays over the stories and converted
+to a (samples x stories) count matrix, so the statistics of all the samples are computed with a single
+matrix product.
+"""
+
+import numpy as np
+
+from aggregation import micro_scores
+
+
+def resample_counts(num_stories, num_samples, seed=None):
+    """
+    Draw bootstrap samples of stories (with replacement) and return how many times each story
+    was drawn in each sample
+    :param num_stories: the number of stories
+    :param num_samples: the number of bootstrap samples
+    :param seed: the random seed
+    :return: a (num_samples x num_stories) matrix of counts
+    """
+    random = np.random.RandomState(seed)
+    indices = random.randint(0, num_stories, size=(num_samples, num_stories))
+
+    # Offset the story indices of each sample to count all the samples with a single bincount
+    offsets = np.arange(num_samples)[:, np.newaxis] * num_stories
+    counts = np.bincount((indices + offsets).ravel(), minlength=num_samples * num_stories)
+
+    return counts.reshape(num_samples, num_stories).astype(float)
+
+
+def bootstrap_macro(story_scores, num_samples=10000, confidence=0.95, seed=None):
+    """
+    Compute bootstrap confidence intervals for scores macro-averaged over stories
+    :param story_scores: a (stories x metrics) matrix of per story scores
+    :param num_samples: the number of bootstrap samples
+    :param confidence: the confidence level
+    :param seed: the random seed
+    :return: the lower and upper bounds of the confidence interval of each metric
+    """
+    story_scores = np.asarray(story_scores, dtype=float)
+    counts = resample_counts(story_scores.shape[0], num_samples, seed)
+    sample_scores = counts.dot(story_scores) / story_scores.shape[0]
+    return confidence_interval(sample_scores, confidence)
+
+
+def confidence_interval(sample_scores, confidence):
+    """
+    Compute the percentile confidence interval of each metric
+    :param sample_scores: a (samples x metrics) matrix of the scores in each bootstrap sample
+    :param confidence: the confidence level
+    :return: the lower and upper bounds of the confidence interval of each metric
+    """
+    alpha = (1.0 - confidence) / 2.0
+    lower, upper = np.percentile(sample_scores, [100.0 * alpha, 100.0 * (1.0 - alpha)], axis=0)
+    return lower, upper
+
+
+def bootstrap_micro_scores(story_counts, metric_names, num_samples=10000, confidence=0.95, seed=None):
+    """
+    Compute bootstrap confidence intervals for the micro scores of the metrics (see aggregation.micro_scores)
+    :param story_counts: a list of dictionaries, one for each story, of metric name to the story's micro counts
+    :param metric_names: the names of the metrics
+    :param num_samples: the number of bootstrap samples
+    :param confidence: the confidence level
+    :param seed: the random seed
+    :return: the lower and upper bounds of the confidence interval of each metric
+    """
+    counts = resample_counts(len(story_counts), num_samples, seed)
+
+    # Sum the counts of each metric in each sample: (samples x stories) . (stories x ...)
+    sample_count_sums = {name: np.tensordot(counts, np.array([story[name] for story in story_counts], dtype=float),
+                                            axes=1)
+                         for name in story_counts[0].keys()}
+
+    return confidence_interval(micro_scores(sample_count_sums, metric_names), confidence)
+
+
+def print_confidence_intervals(metric_names, aggregator, story_scores, story_counts, num_samples, confidence,
+                               seed=None):
+    """
+    Print the macro and micro average score of each metric with its bootstrap confidence interval
+    :param metric_names: the names of the metrics
+    :param aggregator: the ScoreAggregator of all the stories
+    :param story_scores: a (stories x metrics) matrix of per story scores
+    :param story_counts: a list of dictionaries, one for each story, of metric name to the story's micro counts
+    :param num_samples: the number of bootstrap samples
+    :param confidence: the confidence level
+    :param seed: the random seed
+    """
+    macro_lower, macro_upper = bootstrap_macro(story_scores, num_samples, confidence, seed)
+    micro_lower, micro_upper = bootstrap_micro_scores(story_counts, metric_names, num_samples, confidence, seed)
+
+    print '\n\n%d%% confidence intervals (%d bootstrap samples over %d stories):\n=========\n' % \
+          (round(100 * confidence), num_samples, len(story_scores))
+
+    for name, macro, macro_low, macro_high, micro, micro_low, micro_high in \
+            zip(metric_names, aggregator.macro_average(), macro_lower, macro_upper,
+                aggregator.micro_average(), micro_lower, micro_upper):
+        print '%s: macro=%.3f [%.3f, %.3f], micro=%.3f [%.3f, %.3f]' % \
+              (name, macro, macro_low, macro_high, micro, micro_low, micro_high)
@@ -3,6 +3,18 @@ import stop_words
 NULL_VALUE = 0
 STOP_WORDS = stop_words.get_stop_words('en')
 
+# The scores computed for each story, both in agreement and baseline computations
+SUBTASK_METRICS = ['Entity mentions',
+                   'Entity coreference MUC', 'Entity coreference B^3', 'Entity coreference CEAF_C',
+                   'Entity coreference MELA',
+                   'Predicate mentions', 'Predicate mentions verbal', 'Predicate mentions non-verbal',
+                   'Predicate coreference MUC', 'Predicate coreference B^3', 'Predicate coreference CEAF_C',
+                   'Predicate coreference MELA',
+                   'Argument mentions',
+                   'Argument coreference MUC', 'Argument coreference B^3', 'Argument coreference CEAF_C',
+                   'Argument coreference MELA',
+                   'Entailment graph entities F1', 'Entailment graph propositions F1']
+
 
 class MentionType:
     """
@@ -3,11 +3,11 @@ Functions for filtering propositions for analysis purposes -- used both in agree
 computations.
 Author: Gabi Stanovsky
 """
-import nltk
 import logging
 
 from okr import Proposition
 from constants import NULL_VALUE
+from pos_tags import get_pos_tags
 
 
 # Return a graph with only the verbal proposition in the input graph
@@ -20,23 +20,23 @@ filter_non_verbal = lambda(test_graph): \
                     filter_proposition_mentions(lambda sentence, mention: not(verbal_filter(sentence, mention)),
                                                 test_graph)
 
-verbal_filter = lambda sentence, mention: (len(mention.indices) == 1) and \
-                                            (nltk.pos_tag(sentence)[mention.indices[0]][1].startswith('V'))
+verbal_filter = lambda sentence_tags, mention: (len(mention.indices) == 1) and \
+                                                (sentence_tags[mention.indices[0]].startswith('V'))
 
 
 def filter_proposition_mentions(filter_func, test_graph):
     """
     Filter proposition mentions in test graph iff filter_func holds
-    :param filter_func: the filtering function (from OKR graph to OKR graph)
+    :param filter_func: the filtering function (from the POS tags of the mention's sentence and the mention to bool)
     :param test_graph: the OKR graph
     """
     ret = test_graph.clone()
     proposition_mentions = []
+    pos_tags = get_pos_tags(test_graph)
     logging.debug('Filtering verbal propositions')
     for prop in test_graph.propositions.values():
         for mention in prop.mentions.values():
-            sent = test_graph.sentences[mention.sentence_id]
-            if filter_func(sent, mention):
+            if filter_func(pos_tags[mention.sentence_id], mention):
                 logging.debug('Found {}'.format(mention.terms))
                 proposition_mentions.append(mention)
 
@@ -6,9 +6,11 @@ import os
 import copy
 import logging
 import itertools
+import numpy as np
 import xml.etree.ElementTree as ET
 
 from constants import *
+from profiling import profiled
 
 
 class OKR:
@@ -20,6 +22,8 @@ class OKR:
         self.name = name  # XML file name
         self.sentences = sentences  # Dictionary of sentence ID (starts from 1) to tokenized sentence
         self.ignored_indices = ignored_indices  # set of words to ignore, in format sentence_id[index_id]
+        self.ignored_mask = get_ignored_mask(sentences, ignored_indices)  # Sentence ID to boolean array of ignored words
+        self.pos_tags = {}  # Sentence ID to the POS tags of its words, tagged on demand (see pos_tags.py)
         self.tweet_ids = tweet_ids  # Dictionary of sentence ID to tweet ID
         self.entities = entities  # Dictionary of entity ID to Entity object
         self.propositions = propositions  # Dictionary of proposition id to Proposition object
@@ -47,11 +51,12 @@ class OKR:
         self.ent_mentions_by_key = {str(mention): mention
                                     for ent in self.entities.values() for mention in ent.mentions.values()}
 
+    @profiled()
     def clone(self):
         """
-        Returns a deep copy of the graph
+        Returns a deep copy of the graph. The POS tags layer is shared, since the sentences are not modified.
         """
-        return copy.deepcopy(self)
+        return copy.deepcopy(self, {id(self.pos_tags): self.pos_tags})
 
     def get_sentence_by_id(self, sent_id_str):
         """
@@ -215,6 +220,30 @@ class ArgumentMention:
         return str(proposition_mention) + '_' + str(self)
 
 
+def get_ignored_mask(sentences, ignored_indices):
+    """
+    Receives the sentences and the ignored words and returns a boolean array of the ignored words in each sentence
+    :param sentences: dictionary of sentence ID to tokenized sentence
+    :param ignored_indices: set of words to ignore, in format sentence_id[index_id], or None for old versions
+    :return: dictionary of sentence ID to a boolean array (True for ignored words), or None for old versions
+    """
+    if ignored_indices is None:
+        return None
+
+    # Group the ignored words by sentence
+    ignored_words = {}
+    for word in ignored_indices:
+        ignored_words.setdefault(int(word.split('[')[0]), []).append(int(word.split('[')[1][:-1]))
+
+    ignored_mask = {}
+    for sent_id, sentence in sentences.iteritems():
+        indices = ignored_words.get(sent_id, [])
+        ignored_mask[sent_id] = np.zeros(max([len(sentence)] + [index + 1 for index in indices]), dtype=bool)
+        ignored_mask[sent_id][indices] = True
+
+    return ignored_mask
+
+
 def load_graphs_from_folder(input_folder):
     """
     Load OKR files from a given folder
@@ -399,6 +428,7 @@ def load_graph_from_file(input_file):
     return okr
 
 
+@profiled()
 def transitive_closure(graph):
     """
     Compute the transitive closure of the graph
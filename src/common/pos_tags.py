@@ -0,0 +1,104 @@
+"""
+A sentence-level part-of-speech tag layer of the OKR graph -- used both in agreement and baseline computations.
+
+The sentences of a graph are tagged once, in a single batch, the first time any tag is needed, and the
+tags are stored in graph.pos_tags, which is shared by all the clones of the graph. The tags can also be
+persisted in a directory, in a file named by the hash of the sentences, so the annotators' graphs of the same
+story (which have the same sentences) and later runs reuse them.
+"""
+
+import os
+import nltk
+
+from result_cache import hash_strings
+
+TAGS_SUFFIX = '.pos'
+
+
+def get_pos_tags(graph):
+    """
+    Returns the POS tags of the graph's sentences, tagging all of them if they were not tagged yet
+    :param graph: the OKR graph
+    :return: dictionary of sentence ID to the list of POS tags of its words
+    """
+    if len(graph.pos_tags) < len(graph.sentences):
+        graph.pos_tags.update(tag_sentences(graph.sentences))
+
+    return graph.pos_tags
+
+
+def tag_sentences(sentences):
+    """
+    POS tag the sentences in a single batch
+    :param sentences: dictionary of sentence ID to tokenized sentence
+    :return: dictionary of sentence ID to the list of POS tags of its words
+    """
+    sent_ids = sorted(sentences.keys())
+    tagged_sentences = nltk.pos_tag_sents([sentences[sent_id] for sent_id in sent_ids])
+    return {sent_id: [tag for _, tag in tagged_sentence] for sent_id, tagged_sentence in zip(sent_ids, tagged_sentences)}
+
+
+def load_or_tag(graph, tags_dir):
+    """
+    Set the POS tags of the graph from its file in the directory, or tag the graph and save them
+    :param graph: the OKR graph
+    :param tags_dir: the directory of the persisted tags
+    :return: dictionary of sentence ID to the list of POS tags of its words
+    """
+    if not load_pos_tags(graph, tags_dir):
+        save_pos_tags(graph, tags_dir)
+
+    return graph.pos_tags
+
+
+def load_pos_tags(graph, tags_dir):
+    """
+    Set the POS tags of the graph from its file in the directory
+    :param graph: the OKR graph
+    :param tags_dir: the directory of the persisted tags
+    :return: whether the tags file exists and matches the graph's sentences
+    """
+    tags_file = pos_tags_path(graph, tags_dir)
+    if not os.path.exists(tags_file):
+        return False
+
+    with open(tags_file) as f_in:
+        pos_tags = {int(sent_id): tags.split(' ') if len(tags) > 0 else []
+                    for sent_id, tags in [line.rstrip('\n').split('\t') for line in f_in]}
+
+    if any([len(pos_tags.get(sent_id, [])) != len(sentence) for sent_id, sentence in graph.sentences.iteritems()]):
+        return False
+
+    graph.pos_tags.update(pos_tags)
+    return True
+
+
+def save_pos_tags(graph, tags_dir):
+    """
+    Save the POS tags of the graph (tagging it if needed) to its file in the directory
+    :param graph: the OKR graph
+    :param tags_dir: the directory of the persisted tags
+    """
+    pos_tags = get_pos_tags(graph)
+
+    if not os.path.exists(tags_dir):
+        os.makedirs(tags_dir)
+
+    tags_file = pos_tags_path(graph, tags_dir)
+    temp_file = '%s.%d.tmp' % (tags_file, os.getpid())
+
+    with open(temp_file, 'w') as f_out:
+        for sent_id in sorted(graph.sentences.keys()):
+            f_out.write('%d\t%s\n' % (sent_id, ' '.join(pos_tags[sent_id])))
+
+    os.rename(temp_file, tags_file)
+
+
+def pos_tags_path(graph, tags_dir):
+    """
+    Returns the path of the graph's tags file, named by the hash of its sentences
+    :param graph: the OKR graph
+    :param tags_dir: the directory of the persisted tags
+    """
+    sentences = [u'%d\t%s' % (sent_id, u' '.join(graph.sentences[sent_id])) for sent_id in sorted(graph.sentences)]
+    return os.path.join(tags_dir, hash_strings([sentence.encode('utf-8') for sentence in sentences]) + TAGS_SUFFIX)
@@ -0,0 +1,164 @@
+"""
+Opt-in profiling of the stages and the heavy helpers -- used both in agreement and baseline computations.
+
+Profiling is enabled by setting the OKR_PROFILE environment variable, or by the command lines (through
+enable_profiling) when --profile is passed. The profiled functions are wrapped when their modules are imported,
+before the command line is parsed, so when profiling is disabled the wrappers only check the flag and call the
+function.
+
+For each profiled function and section, the number of calls, the cumulative time and the self time (excluding
+the time of profiled functions and sections called from it) are recorded, and printed by print_report.
+If the OKR_PROFILE_PSTATS environment variable is set to a directory, each section (e.g. each agreement stage or
+baseline subtask) is also profiled with cProfile, and its statistics are dumped to <dir>/<section>.pstats
+(to be read with the pstats module).
+"""
+
+import os
+import sys
+import cProfile
+import functools
+
+from timeit import default_timer
+
+ENABLED = 'OKR_PROFILE' in os.environ
+PSTATS_DIR = os.environ.get('OKR_PROFILE_PSTATS') if ENABLED else None
+
+stats = {}  # Dictionary of name to [number of calls, cumulative time, self time]
+child_times = []  # The time spent in profiled callees of each active call
+profilers = {}  # Dictionary of section name to its cProfile profiler
+active_profiler = []  # The section profiler currently enabled (cProfile profilers can't be nested)
+
+
+def enable_profiling():
+    """
+    Enable profiling (e.g. when --profile is passed on the command line)
+    """
+    global ENABLED, PSTATS_DIR
+    ENABLED = True
+    PSTATS_DIR = os.environ.get('OKR_PROFILE_PSTATS')
+
+
+def profiled(name=None):
+    """
+    A decorator that records the calls and the running time of the function when profiling is enabled
+    :param name: the name in the report (default: module.function)
+    :return: the decorator
+    """
+    def decorator(func):
+        stat_name = name or '%s.%s' % (func.__module__, func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+
+            start_time = start()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stop(stat_name, start_time)
+
+        return wrapper
+
+    return decorator
+
+
+class Section:
+    """
+    A context manager that records the running time of a block (e.g. an agreement stage), and profiles it
+    with cProfile if OKR_PROFILE_PSTATS is set
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.start_time = None
+        self.profiler = None
+
+    def __enter__(self):
+        if PSTATS_DIR is not None and len(active_profiler) == 0:
+            self.profiler = profilers.setdefault(self.name, cProfile.Profile())
+            active_profiler.append(self.profiler)
+            self.profiler.enable()
+
+        self.start_time = start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stop(self.name, self.start_time)
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            active_profiler.pop()
+
+        return False
+
+
+class NullSection:
+    """
+    The section used when profiling is disabled
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SECTION = NullSection()
+
+
+def section(name):
+    """
+    Returns a context manager that profiles a block when profiling is enabled
+    :param name: the name in the report
+    """
+    return Section(name) if ENABLED else NULL_SECTION
+
+
+def start():
+    """
+    Start timing a call
+    :return: the start time
+    """
+    child_times.append(0.0)
+    return default_timer()
+
+
+def stop(name, start_time):
+    """
+    Stop timing a call, and add its time to its caller's time in profiled callees
+    :param name: the name in the report
+    :param start_time: the start time
+    """
+    elapsed = default_timer() - start_time
+    child_time = child_times.pop()
+
+    name_stats = stats.setdefault(name, [0, 0.0, 0.0])
+    name_stats[0] += 1
+    name_stats[1] += elapsed
+    name_stats[2] += elapsed - child_time
+
+    if len(child_times) > 0:
+        child_times[-1] += elapsed
+
+
+def print_report(out=sys.stderr):
+    """
+    Print the calls, cumulative time and self time of each profiled function and section (sorted by the
+    cumulative time), and dump the cProfile statistics of the sections if OKR_PROFILE_PSTATS is set
+    :param out: the output stream
+    """
+    if not ENABLED:
+        return
+
+    out.write('\n%-60s%10s%12s%12s\n' % ('Profiled', 'calls', 'cumulative', 'self'))
+    for name, (calls, cumulative_time, self_time) in sorted(stats.iteritems(), key=lambda item: -item[1][1]):
+        out.write('%-60s%10d%12.4f%12.4f\n' % (name, calls, cumulative_time, self_time))
+
+    if PSTATS_DIR is not None:
+        if not os.path.exists(PSTATS_DIR):
+            os.makedirs(PSTATS_DIR)
+
+        for name, profiler in profilers.iteritems():
+            profiler.dump_stats(os.path.join(PSTATS_DIR, name.replace(' ', '_') + '.pstats'))
@@ -0,0 +1,112 @@
+"""
+A content-addressed cache of per story results -- used in agreement computation.
+
+The results of a story are stored under a key computed from the hashes of its input files and the code version
+(a hash of the source files that compute the results), so a story is recomputed only if one of its files
+or the code changed. Each entry is a separate pickle file, written atomically.
+"""
+
+import os
+import glob
+import hashlib
+import cPickle as pickle
+
+CACHE_SUFFIX = '.result.pkl'
+
+
+class ResultCache:
+    """
+    A directory of cached results, keyed by the contents of the input files and the code version
+    """
+
+    def __init__(self, cache_dir, version):
+        self.cache_dir = cache_dir
+        self.version = version  # The code / configuration version
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, *input_files):
+        """
+        Returns the key of the results computed from the input files
+        :param input_files: the paths of the input files, in the order they are passed to the computation
+        :return: the key
+        """
+        return hash_strings([self.version] + [hash_file(input_file) for input_file in input_files])
+
+    def get(self, key):
+        """
+        Returns the cached results of the key, or None if they are not in the cache
+        :param key: the key
+        :return: the results, or None
+        """
+        try:
+            with open(self.entry_path(key), 'rb') as f_in:
+                return pickle.load(f_in)
+        except (IOError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, results):
+        """
+        Store the results of the key in the cache
+        :param key: the key
+        :param results: the results
+        """
+        entry_path = self.entry_path(key)
+        temp_path = '%s.%d.tmp' % (entry_path, os.getpid())
+
+        with open(temp_path, 'wb') as f_out:
+            pickle.dump(results, f_out, pickle.HIGHEST_PROTOCOL)
+
+        os.rename(temp_path, entry_path)
+
+    def invalidate(self):
+        """
+        Remove all the cached results
+        """
+        for entry_path in glob.glob(os.path.join(self.cache_dir, '*' + CACHE_SUFFIX)):
+            os.remove(entry_path)
+
+    def entry_path(self, key):
+        """
+        Returns the path of the key's entry
+        :param key: the key
+        :return: the path
+        """
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+
+def code_version(source_dirs, config=''):
+    """
+    Returns the code version: a hash of the Python source files in the directories and the configuration
+    :param source_dirs: the directories of the code that computes the results
+    :param config: a string describing the configuration that affects the results
+    :return: the code version
+    """
+    source_files = sorted([source_file for source_dir in source_dirs
+                           for source_file in glob.glob(os.path.join(source_dir, '*.py'))])
+    return hash_strings([config] + [hash_file(source_file) for source_file in source_files])
+
+
+def hash_file(path):
+    """
+    Returns the SHA-1 hash of the file's contents
+    :param path: the file path
+    :return: the hash
+    """
+    sha1 = hashlib.sha1()
+
+    with open(path, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(1 << 20), ''):
+            sha1.update(block)
+
+    return sha1.hexdigest()
+
+
+def hash_strings(strings):
+    """
+    Returns the SHA-1 hash of a list of strings
+    :param strings: the strings
+    :return: the hash
+    """
+    return hashlib.sha1('\n'.join(strings)).hexdigest()
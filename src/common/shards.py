@@ -0,0 +1,157 @@
+"""
+Shard-and-merge evaluation -- used both in agreement and baseline computations.
+
+The stories can be split across machines. Each run computes a shard of the stories, selected either by a file
+listing the story file names or by a hash range (shard i of n contains the stories whose file name hash is i
+modulo n, so every machine selects the same shards), and writes the results of each story to a partial results
+file: its score vector (the macro average components), its micro counts and its report.
+
+The partial results files of all the shards are merged by adding the stories to a ScoreAggregator in their order
+in the full run, so the averages and the bootstrap confidence intervals are exactly those of a single run.
+"""
+
+import json
+import numpy as np
+
+from result_cache import hash_strings
+
+
+def parse_shard(shard):
+    """
+    Parse a hash range shard
+    :param shard: the shard, as '<i>/<n>' (the i-th of n shards, 0 <= i < n)
+    :return: the index of the shard and the number of shards
+    """
+    try:
+        index, num_shards = [int(part) for part in shard.split('/')]
+    except ValueError:
+        raise ValueError('Invalid shard: %s (expected <i>/<n>)' % shard)
+
+    if not 0 <= index < num_shards:
+        raise ValueError('Invalid shard: %s (expected 0 <= i < n)' % shard)
+
+    return index, num_shards
+
+
+def in_shard(story_file, index, num_shards):
+    """
+    Returns whether the story belongs to the shard. The hash doesn't depend on the machine or on the other stories.
+    :param story_file: the story file name
+    :param index: the index of the shard
+    :param num_shards: the number of shards
+    """
+    return int(hash_strings([story_file]), 16) % num_shards == index
+
+
+def select_stories(story_files, shard=None, stories_file=None):
+    """
+    Returns the indices of the stories in the shard
+    :param story_files: the file names of all the stories, in the order of the run
+    :param shard: a hash range shard, as '<i>/<n>' (default: no hash range)
+    :param stories_file: a file listing the file names of the stories in the shard, one per line
+    (default: no list)
+    :return: the indices of the stories in the shard, in the order of the run (all the stories if neither
+    the shard nor the file is given)
+    """
+    if shard is not None:
+        index, num_shards = parse_shard(shard)
+        return [story for story, story_file in enumerate(story_files) if in_shard(story_file, index, num_shards)]
+
+    if stories_file is not None:
+        with open(stories_file) as f_in:
+            shard_files = set([line.strip() for line in f_in if len(line.strip()) > 0])
+
+        missing = shard_files.difference(story_files)
+        if len(missing) > 0:
+            raise ValueError('Stories not found: %s' % ', '.join(sorted(missing)))
+
+        return [story for story, story_file in enumerate(story_files) if story_file in shard_files]
+
+    return range(len(story_files))
+
+
+def story_result(index, story, scores, counts, report=None):
+    """
+    Returns the partial result of a story
+    :param index: the index of the story in the full run
+    :param story: the story files
+    :param scores: the story's score vector
+    :param counts: dictionary of metric name to the story's micro counts
+    :param report: the story's report (default: none)
+    :return: a dictionary of the story's result
+    """
+    return {'index': index, 'story': story, 'scores': scores, 'counts': counts, 'report': report}
+
+
+def write_partial_results(partial_file, kind, metric_names, num_stories, story_results):
+    """
+    Write the results of the stories of a shard
+    :param partial_file: the partial results file
+    :param kind: the kind of the results ('agreement' or 'baseline'), to avoid merging results of different kinds
+    :param metric_names: the names of the metrics, in the order of the score vectors
+    :param num_stories: the number of stories in the full run
+    :param story_results: the results of the stories of the shard (see story_result)
+    """
+    stories = [{'index': result['index'], 'story': result['story'], 'report': result['report'],
+                'scores': [None if np.isnan(score) else float(score) for score in result['scores']],
+                'counts': {name: np.asarray(counts, dtype=float).tolist()
+                           for name, counts in result['counts'].iteritems()}}
+               for result in story_results]
+
+    with open(partial_file, 'w') as f_out:
+        json.dump({'kind': kind, 'metrics': metric_names, 'num_stories': num_stories, 'stories': stories}, f_out)
+
+
+def load_partial_results(partial_file):
+    """
+    Load the results of the stories of a shard
+    :param partial_file: the partial results file
+    :return: a dictionary with the kind of the results, the metric names, the number of stories in the full run
+    and the results of the stories (see story_result)
+    """
+    with open(partial_file) as f_in:
+        partial_results = json.load(f_in)
+
+    for result in partial_results['stories']:
+        result['scores'] = np.array([np.nan if score is None else score for score in result['scores']])
+        result['counts'] = {name: np.array(counts) for name, counts in result['counts'].iteritems()}
+
+    return partial_results
+
+
+def merge_partial_results(partial_files, kind, metric_names):
+    """
+    Merge the results of the shards
+    :param partial_files: the partial results files of the shards
+    :param kind: the kind of the results ('agreement' or 'baseline')
+    :param metric_names: the names of the metrics, in the order of the score vectors
+    :return: the results of all the stories (see story_result), in the order of the full run
+    """
+    story_results = {}
+    num_stories = None
+
+    for partial_file in partial_files:
+        partial_results = load_partial_results(partial_file)
+
+        if partial_results['kind'] != kind:
+            raise ValueError('%s contains %s results, not %s' % (partial_file, partial_results['kind'], kind))
+
+        if partial_results['metrics'] != metric_names:
+            raise ValueError('%s contains results of different metrics' % partial_file)
+
+        if num_stories is not None and partial_results['num_stories'] != num_stories:
+            raise ValueError('%s is a shard of a different run' % partial_file)
+
+        num_stories = partial_results['num_stories']
+
+        for result in partial_results['stories']:
+            if result['index'] in story_results:
+                raise ValueError('Story %s appears in more than one shard' % ', '.join(result['story']))
+
+            story_results[result['index']] = result
+
+    missing = [index for index in range(num_stories or 0) if index not in story_results]
+    if len(missing) > 0:
+        raise ValueError('%d of %d stories are missing from the shards' % (len(missing), num_stories))
+
+    return [story_results[index] for index in range(num_stories or 0)]
@@ -0,0 +1,63 @@
+"""
+A process-wide registry of the spaCy models -- used by the baseline components and the V2 conversion.
+
+Loading a spaCy model is slow and takes a lot of memory, so each configuration is loaded once, the first time
+it is needed (not when the modules are imported), and shared by all the components:
+1) DEFAULT - spaCy's tokenizer, for raw text.
+2) WHITESPACE - a tokenizer of already tokenized (space separated) sentences. The OKR sentences were tokenized
+with NLTK, so spaCy's tokenization would not match their word indices.
+The components should not modify the models they get (e.g. replace their tokenizer).
+"""
+
+DEFAULT = 'default'
+WHITESPACE = 'whitespace'
+
+models = {}  # Dictionary of tokenizer configuration to its loaded model
+
+
+def get_model(tokenizer=DEFAULT):
+    """
+    Returns the shared spaCy model of the tokenizer configuration, loading it if it was not loaded yet
+    :param tokenizer: the tokenizer configuration (DEFAULT or WHITESPACE)
+    :return: the spaCy model
+    """
+    if tokenizer not in models:
+        models[tokenizer] = load_model(tokenizer)
+
+    return models[tokenizer]
+
+
+def load_model(tokenizer):
+    """
+    Load a spaCy model
+    :param tokenizer: the tokenizer configuration (DEFAULT or WHITESPACE)
+    :return: the spaCy model
+    """
+    if tokenizer not in [DEFAULT, WHITESPACE]:
+        raise ValueError('Unknown tokenizer: %s' % tokenizer)
+
+    # spaCy is imported only when a model is needed
+    from spacy.en import English
+    nlp = English()
+
+    if tokenizer == WHITESPACE:
+        nlp.tokenizer = WhitespaceTokenizer(nlp.tokenizer)
+
+    return nlp
+
+
+class WhitespaceTokenizer:
+    """
+    A spaCy tokenizer of already tokenized (space separated) sentences, which can also tokenize a stream of
+    sentences for nlp.pipe
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, string):
+        return self.tokenizer.tokens_from_list(string.split())
+
+    def pipe(self, strings, batch_size=1000, n_threads=1):
+        for string in strings:
+            yield self(string)